@@ -0,0 +1,242 @@
+"""Background screen capture process with a shared-memory frame ring.
+
+The capture process keeps one mss/X connection open, grabs the primary
+monitor every `interval` seconds, downscales it and publishes the raw RGB
+into the next slot of a ring in shared memory.  Once the raw frame is
+visible it encodes the image (JPEG by default, see agent/encoders.py)
+into the same slot, so readers usually find it ready; if they get there
+first, Frame.encoded encodes on demand.
+
+Each slot is guarded by a seqlock: the writer makes the slot's generation
+odd, writes, then makes it even again.  A reader copies the slot and
+retries if the generation moved or was odd, so neither side ever blocks.
+
+    with CaptureService(interval=0.25) as cap:
+        frame = cap.latest()     # newest Frame or None, never blocks
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Optional
+
+from agent.encoders import DEFAULT_ENCODER, Encoder
+from agent.screen_capture import Frame, capture_size, grab_frame
+
+MAGIC = b"AICR"
+
+# magic, slot count, rgb capacity, encoded capacity, latest frame seq
+_HEADER = struct.Struct("<4sIIIQ")
+# generation, frame seq, timestamp, width, height, source left, top,
+# width, height, rgb length, encoded length
+_SLOT = struct.Struct("<QQdIIiiIIII")
+
+READ_RETRIES = 8
+
+
+class FrameRing:
+    """Layout of the shared-memory ring; used by both writer and reader."""
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self.shm = shm
+        self.buf = shm.buf
+        magic, self.slots, self.rgb_cap, self.enc_cap, _ = _HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise RuntimeError(f"not a capture ring: {shm.name}")
+        self.slot_size = _SLOT.size + self.rgb_cap + self.enc_cap
+
+    @staticmethod
+    def size_for(slots: int, rgb_cap: int, enc_cap: int) -> int:
+        return _HEADER.size + slots * (_SLOT.size + rgb_cap + enc_cap)
+
+    @staticmethod
+    def init(shm: shared_memory.SharedMemory, slots: int, rgb_cap: int, enc_cap: int) -> "FrameRing":
+        # A fresh segment is zero-filled: every slot starts at generation 0
+        _HEADER.pack_into(shm.buf, 0, MAGIC, slots, rgb_cap, enc_cap, 0)
+        return FrameRing(shm)
+
+    def latest_seq(self) -> int:
+        return _HEADER.unpack_from(self.buf, 0)[4]
+
+    def _slot_offset(self, seq: int) -> int:
+        return _HEADER.size + (seq % self.slots) * self.slot_size
+
+    # ── writer side (capture process) ───────────────────────────────────────
+
+    def _begin(self, off: int) -> int:
+        gen = _SLOT.unpack_from(self.buf, off)[0] + 1      # odd: write in progress
+        struct.pack_into("<Q", self.buf, off, gen)
+        return gen
+
+    def write_raw(self, f: Frame) -> bool:
+        if len(f.rgb) > self.rgb_cap:
+            return False
+        off = self._slot_offset(f.seq)
+        gen = self._begin(off)
+        data = off + _SLOT.size
+        self.buf[data:data + len(f.rgb)] = f.rgb
+        _SLOT.pack_into(self.buf, off, gen + 1, f.seq, f.timestamp, f.width, f.height,
+                        f.left, f.top, f.src_width, f.src_height, len(f.rgb), 0)
+        struct.pack_into("<Q", self.buf, _HEADER.size - 8, f.seq)
+        return True
+
+    def write_encoded(self, seq: int, blob: bytes) -> bool:
+        off = self._slot_offset(seq)
+        fields = _SLOT.unpack_from(self.buf, off)
+        if fields[1] != seq or len(blob) > self.enc_cap:
+            return False
+        gen = self._begin(off)
+        data = off + _SLOT.size + self.rgb_cap
+        self.buf[data:data + len(blob)] = blob
+        _SLOT.pack_into(self.buf, off, gen + 1, *fields[1:-1], len(blob))
+        return True
+
+    # ── reader side ─────────────────────────────────────────────────────────
+
+    def read(self, seq: int, encoder: Encoder) -> Optional[Frame]:
+        """Copy frame `seq` out of the ring; None if it was overwritten."""
+        off = self._slot_offset(seq)
+        for _ in range(READ_RETRIES):
+            (gen, slot_seq, ts, w, h, left, top,
+             src_w, src_h, rgb_len, enc_len) = _SLOT.unpack_from(self.buf, off)
+            if gen & 1:
+                continue
+            if slot_seq != seq:
+                return None
+            data = off + _SLOT.size
+            rgb = bytes(self.buf[data:data + rgb_len])
+            encoded = None
+            if enc_len:
+                data += self.rgb_cap
+                encoded = bytes(self.buf[data:data + enc_len])
+            if _SLOT.unpack_from(self.buf, off)[0] == gen:
+                return Frame(seq=seq, timestamp=ts, width=w, height=h,
+                             rgb=rgb, encoder=encoder, left=left, top=top,
+                             src_width=src_w, src_height=src_h, _encoded=encoded)
+        return None
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: registration lands in the parent's resource
+        # tracker (shared with spawned children), where it is a no-op
+        return shared_memory.SharedMemory(name=name)
+
+
+def _capture_main(name: str, interval: float, max_width: int, encoder: Encoder, stop) -> None:
+    from mss import mss
+
+    shm = _attach(name)
+    ring = FrameRing(shm)
+    seq = 0
+    try:
+        with mss() as sct:
+            while not stop.is_set():
+                t0 = time.monotonic()
+                seq += 1
+                frame = grab_frame(sct, seq, max_width, encoder)
+                if not ring.write_raw(frame):
+                    print(f"[capture] frame {frame.width}x{frame.height} "
+                          f"larger than ring slot, skipped")
+                else:
+                    ring.write_encoded(seq, frame.encoded)
+                stop.wait(max(0.0, interval - (time.monotonic() - t0)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del ring
+        shm.close()
+
+
+class CaptureService:
+    """Owns the ring and the capture process; reads never block."""
+
+    def __init__(self, interval: float = 0.25, max_width: int = 1280,
+                 encoder: Encoder = DEFAULT_ENCODER, slots: int = 4):
+        self.interval = interval
+        self.max_width = max_width
+        self.encoder = encoder
+        self.slots = max(2, slots)
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._ring: Optional[FrameRing] = None
+        self._proc = None
+        self._stop = None
+        self._last: Optional[Frame] = None
+
+    def start(self) -> "CaptureService":
+        if self._proc is not None:
+            return self
+        w, h = capture_size()
+        if w > self.max_width:
+            h = int(h * self.max_width / w) + 1
+            w = self.max_width
+        # Headroom for a resolution change while running
+        rgb_cap = w * h * 3 * 2
+        enc_cap = rgb_cap // 2
+
+        size = FrameRing.size_for(self.slots, rgb_cap, enc_cap)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._ring = FrameRing.init(self._shm, self.slots, rgb_cap, enc_cap)
+
+        ctx = mp.get_context("spawn")
+        self._stop = ctx.Event()
+        self._proc = ctx.Process(
+            target=_capture_main, name="screen-capture", daemon=True,
+            args=(self._shm.name, self.interval, self.max_width, self.encoder, self._stop),
+        )
+        self._proc.start()
+        print(f"[capture] service started (interval={self.interval}s, "
+              f"slots={self.slots}, ring={size / 1e6:.1f}MB)")
+        return self
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.is_alive()
+
+    def latest(self) -> Optional[Frame]:
+        """Newest published frame, or None before the first grab."""
+        if self._ring is None:
+            return None
+        seq = self._ring.latest_seq()
+        if seq == 0:
+            return None
+        if self._last is not None and self._last.seq == seq:
+            return self._last
+        frame = self._ring.read(seq, self.encoder)
+        if frame is not None:
+            self._last = frame
+        return self._last
+
+    def wait_first(self, timeout: float = 5.0) -> Optional[Frame]:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and self.alive:
+            frame = self.latest()
+            if frame is not None:
+                return frame
+            time.sleep(0.01)
+        return self.latest()
+
+    def stop(self) -> None:
+        if self._proc is not None:
+            self._stop.set()
+            self._proc.join(timeout=2.0)
+            if self._proc.is_alive():
+                self._proc.terminate()
+            self._proc = None
+        self._ring = None
+        self._last = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self) -> "CaptureService":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -8,10 +8,48 @@ class AgentConfig:
     model_api_base: str = os.getenv("MODEL_API_BASE", "http://127.0.0.1:8000/v1")
     model_name: str = os.getenv("MODEL_NAME", "Qwen/Qwen2.5-VL-7B-Instruct")
     model_api_key: str = os.getenv("MODEL_API_KEY", "EMPTY")
+    daemon_pool_size: int = int(os.getenv("DAEMON_POOL_SIZE", "4"))
+    daemon_retries: int = int(os.getenv("DAEMON_RETRIES", "2"))
+    model_pool_size: int = int(os.getenv("MODEL_POOL_SIZE", "2"))
+    model_retries: int = int(os.getenv("MODEL_RETRIES", "2"))
+    model_stream: bool = os.getenv("MODEL_STREAM", "0") == "1"
+    # model_stream: 流式读取模型输出，action 一完整就立即执行并断开（不等后续 token）
+    prompt_format: str = os.getenv("PROMPT_FORMAT", "compact")
+    prompt_state_diff: bool = os.getenv("PROMPT_STATE_DIFF", "0") == "1"
+    prompt_keyframe_changes: int = int(os.getenv("PROMPT_KEYFRAME_CHANGES", "8"))
+    # prompt_format: compact=窗口表格（稳定内容在前，易命中前缀缓存）| json=旧版整段 /state JSON
+    # prompt_state_diff: 窗口表保持不变，之后只列出变化的行；变化超过 prompt_keyframe_changes 行时重建表
+    # daemon_base_url 也可以是 unix:///path/to/daemon.sock（守护进程需设置 DAEMON_UDS）
     capture_interval_sec: float = float(os.getenv("CAPTURE_INTERVAL_SEC", "1.0"))
     max_steps: int = int(os.getenv("AGENT_MAX_STEPS", "40"))
     screenshot_max_width: int = int(os.getenv("SCREENSHOT_MAX_WIDTH", "1280"))
     screenshot_quality: int = int(os.getenv("SCREENSHOT_QUALITY", "80"))
+    image_encoder: str = os.getenv("IMAGE_ENCODER", "pillow")
+    image_resample: str = os.getenv("IMAGE_RESAMPLE", "bilinear")
+    image_reduce: bool = os.getenv("IMAGE_REDUCE", "1") == "1"
+    # image_encoder: pillow | pillow-legacy | turbojpeg | png | webp（见 agent/encoders.py）
+
+    # ── step history ─────────────────────────────────────────────────────
+    history_steps: int = int(os.getenv("HISTORY_STEPS", "8"))
+    history_full_images: int = int(os.getenv("HISTORY_FULL_IMAGES", "1"))
+    history_small_images: int = int(os.getenv("HISTORY_SMALL_IMAGES", "2"))
+    history_small_width: int = int(os.getenv("HISTORY_SMALL_WIDTH", "320"))
+    history_token_budget: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "4000"))
+    history_epoch: int = int(os.getenv("HISTORY_EPOCH", "4"))
+    # history_steps: 提示词中保留的历史步骤数（0=关闭，每步独立推理）
+    # 最近 history_full_images 步带原图，其后 history_small_images 步带缩略图，更早的只留文字摘要；
+    # 各档最多超出 history_epoch 条后才整体降级一次，期间前缀保持不变以命中前缀缓存
+    # history_token_budget: 历史部分的估算 token 上限（硬上限，超出立即降级/丢弃最旧步骤）
+
+    # ── decision cache ───────────────────────────────────────────────────
+    decision_cache: bool = os.getenv("DECISION_CACHE", "0") == "1"
+    decision_cache_size: int = int(os.getenv("DECISION_CACHE_SIZE", "256"))
+    decision_cache_ttl: float = float(os.getenv("DECISION_CACHE_TTL", "86400"))
+    decision_cache_distance: int = int(os.getenv("DECISION_CACHE_DISTANCE", "4"))
+    decision_cache_path: str = os.getenv("DECISION_CACHE_PATH", "")
+    # decision_cache: 目标、窗口状态签名相同且截图感知哈希（256 位 dHash）相差不超过
+    # decision_cache_distance 位时，直接复用上次执行成功的动作，跳过推理；复用失败即删除该条
+    # decision_cache_path: 非空时跨次运行持久化（JSON 文件）
 
     # ── realtime mode ────────────────────────────────────────────────────
     realtime: bool = False
@@ -19,3 +57,47 @@ class AgentConfig:
     action_cooldown_sec: float = float(os.getenv("ACTION_COOLDOWN_SEC", "1.0"))
     idle_skip_threshold: float = float(os.getenv("IDLE_SKIP_THRESHOLD", "0.02"))
     # idle_skip_threshold: 如果两帧之间像素差异比例低于此值，跳过推理
+    change_tile_threshold: float = float(os.getenv("CHANGE_TILE_THRESHOLD", "0.04"))
+    change_min_region: float = float(os.getenv("CHANGE_MIN_REGION", "0.02"))
+    # 帧被划分为 16x9 个图块：图块平均差异超过 change_tile_threshold 记为变化；
+    # 整体差异低于 idle_skip_threshold 且最大变化区域面积占比低于 change_min_region
+    # （如光标闪烁）时跳过推理
+
+    # ── capture service ─────────────────────────────────────────────────
+    capture_service: bool = os.getenv("CAPTURE_SERVICE", "0") == "1"
+    capture_service_interval: float = float(os.getenv("CAPTURE_SERVICE_INTERVAL", "0.25"))
+    capture_ring_slots: int = int(os.getenv("CAPTURE_RING_SLOTS", "4"))
+    # capture_service: 在独立进程中持续截屏，帧写入共享内存环形缓冲区，主循环只读取最新帧
+
+    # ── region of interest ──────────────────────────────────────────────
+    capture_roi: str = os.getenv("CAPTURE_ROI", "off")
+    roi_margin: int = int(os.getenv("ROI_MARGIN", "48"))
+    roi_max_fraction: float = float(os.getenv("ROI_MAX_FRACTION", "0.6"))
+    roi_context_width: int = int(os.getenv("ROI_CONTEXT_WIDTH", "480"))
+    # capture_roi: off=整屏 | window=只截焦点窗口 | dirty=只截变化区域
+    # 区域超过屏幕面积的 roi_max_fraction 时退回整屏；roi_context_width>0 时附带一张整屏小缩略图
+
+    # ── pipelined mode ──────────────────────────────────────────────────
+    pipelined: bool = False
+    pipeline_settle_sec: float = float(os.getenv("PIPELINE_SETTLE_SEC", "0.15"))
+    pipeline_max_restarts: int = int(os.getenv("PIPELINE_MAX_RESTARTS", "2"))
+    # pipeline_settle_sec: 动作完成后等待界面稳定再截图的时间
+    # pipeline_max_restarts: 推理期间屏幕变化时最多丢弃并重新推理的次数
+
+    # ── metrics ─────────────────────────────────────────────────────────
+    metrics_port: int = int(os.getenv("AGENT_METRICS_PORT", "0"))
+    metrics_host: str = os.getenv("AGENT_METRICS_HOST", "127.0.0.1")
+    # metrics_port>0 时在该端口提供 GET /metrics（Prometheus 文本格式）：各阶段耗时直方图、动作成败计数
+
+    # ── tracing ─────────────────────────────────────────────────────────
+    trace: bool = os.getenv("AGENT_TRACE", "0") == "1"
+    trace_path: str = os.getenv("AGENT_TRACE_PATH", "agent-trace.jsonl")
+    trace_max_mb: int = int(os.getenv("AGENT_TRACE_MAX_MB", "64"))
+    trace_backups: int = int(os.getenv("AGENT_TRACE_BACKUPS", "3"))
+    # trace: 每步每个阶段写一条 JSONL 记录（耗时、请求字节数、token 数、跳帧原因），
+    # 文件超过 trace_max_mb 后轮转，保留 trace_backups 个旧文件；用 python -m agent.tracing 汇总
+
+    # ── session recording ───────────────────────────────────────────────
+    record_dir: str = os.getenv("AGENT_RECORD_DIR", "")
+    # record_dir 非空时每次运行在其下新建一个会话目录，记录截图（去重、内存映射存储）、/state、
+    # 模型输出与动作结果；用 python -m agent.replay 离线重放并比对
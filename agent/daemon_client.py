@@ -1,10 +1,28 @@
-from typing import Any, Dict, List
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
 import requests
 
+from agent.http_session import make_session
+
+# Event stream reconnects wait this long, doubling per attempt up to the
+# max (with jitter); the delay resets once an event arrives
+EVENTS_BACKOFF_MIN = 0.5
+EVENTS_BACKOFF_MAX = 30.0
+
 
 class DaemonClient:
-    def __init__(self, base_url: str):
-        self.base_url = base_url.rstrip("/")
+    def __init__(self, base_url: str, pool_size: int = 4, retries: int = 2,
+                 client_id: str = ""):
+        """base_url is http://host:port or unix:///path/to/daemon.sock.
+
+        client_id names this client's input queue on the daemon.
+        """
+        self.session, self.base_url = make_session(base_url, pool_size, retries)
+        self.session.headers["X-Client-Id"] = client_id or f"agent-{os.getpid()}"
 
     def health(self) -> Dict[str, Any]:
         return self._get("/health")
@@ -12,16 +30,81 @@ class DaemonClient:
     def get_state(self) -> Dict[str, Any]:
         return self._get("/state")
 
+    # ── event stream ────────────────────────────────────────────────────────
+
+    def events(self, since: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yield {"id", "event", "data"} dicts from GET /events.
+
+        Reconnects on connection loss, HTTP errors or eviction, resuming
+        after the last event seen, with capped exponential backoff.  A
+        "resync" event means events were missed and the caller should
+        refetch get_state().
+        """
+        delay = 0.0
+        while True:
+            params = {"since": since} if since is not None else None
+            try:
+                with self.session.get(f"{self.base_url}/events", params=params,
+                                      stream=True, timeout=(8, 60)) as r:
+                    r.raise_for_status()
+                    for event in _parse_sse(r.iter_lines(decode_unicode=True)):
+                        since = event["id"]
+                        delay = 0.0
+                        yield event
+                reason = "stream ended"
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                reason = f"event stream dropped: {e}"
+            delay = min(EVENTS_BACKOFF_MAX, max(EVENTS_BACKOFF_MIN, 2 * delay))
+            wait = delay * random.uniform(0.5, 1.0)
+            print(f"[daemon_client] {reason}; reconnecting in {wait:.1f}s")
+            time.sleep(wait)
+
+    def subscribe(
+        self,
+        callback: Callable[[Dict[str, Any]], None],
+        since: Optional[int] = None,
+    ) -> threading.Thread:
+        """Run callback for every event on a background daemon thread."""
+        def pump() -> None:
+            for event in self.events(since):
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"[daemon_client] event callback error: {e}")
+
+        t = threading.Thread(target=pump, name="daemon-events", daemon=True)
+        t.start()
+        return t
+
     def _get(self, path: str) -> Dict[str, Any]:
-        r = requests.get(f"{self.base_url}{path}", timeout=8)
+        r = self.session.get(f"{self.base_url}{path}", timeout=8)
         r.raise_for_status()
         return r.json()
 
     def _post(self, path: str, json_data: Dict[str, Any] | None = None) -> Dict[str, Any]:
-        r = requests.post(f"{self.base_url}{path}", json=json_data, timeout=8)
+        r = self.session.post(f"{self.base_url}{path}", json=json_data, timeout=8)
         r.raise_for_status()
         return r.json()
 
+    def run_batch(
+        self,
+        actions: List[Dict[str, Any]],
+        stop_on_failure: bool = True,
+        step_delay_ms: int = 0,
+    ) -> Dict[str, Any]:
+        """Run several actions in one round-trip via POST /actions/batch.
+
+        A step's own "pause_ms" overrides step_delay_ms after that step;
+        "delay_ms" on type_text steps is the per-keystroke delay.
+        """
+        if not actions:
+            raise ValueError("batch requires non-empty actions list")
+        return self._post("/actions/batch", {
+            "actions": actions,
+            "stop_on_failure": stop_on_failure,
+            "step_delay_ms": step_delay_ms,
+        })
+
     def run_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
         action_type = action.get("type", "wait")
 
@@ -29,6 +112,12 @@ class DaemonClient:
             return {"success": True, "detail": "wait"}
         if action_type == "finish":
             return {"success": True, "detail": "finish"}
+        if action_type == "batch":
+            return self.run_batch(
+                action.get("actions", []),
+                stop_on_failure=bool(action.get("stop_on_failure", True)),
+                step_delay_ms=int(action.get("step_delay_ms", 0)),
+            )
         if action_type == "launch":
             return self._post("/apps/launch", {"command": action["command"]})
         if action_type == "focus_window":
@@ -36,10 +125,10 @@ class DaemonClient:
         if action_type == "close_window":
             return self._post(f"/windows/{int(action['window_id'])}/close")
         if action_type == "type_text":
-            return self._post("/input/keyboard/type", {
-                "text": action["text"],
-                "delay_ms": int(action.get("delay_ms", 12)),
-            })
+            body = {"text": action["text"], "delay_ms": int(action.get("delay_ms", 12))}
+            if action.get("strategy") in ("auto", "type", "paste"):
+                body["strategy"] = action["strategy"]
+            return self._post("/input/keyboard/type", body)
         if action_type == "hotkey":
             keys = action.get("keys", [])
             if not isinstance(keys, list) or not keys:
@@ -66,3 +155,20 @@ class DaemonClient:
             })
 
         raise ValueError(f"Unsupported action type: {action_type}")
+
+
+def _parse_sse(lines: Iterator[str]) -> Iterator[Dict[str, Any]]:
+    """Minimal SSE parser: one dict per event, keep-alive comments dropped."""
+    event: Dict[str, Any] = {}
+    for line in lines:
+        if not line:
+            if "data" in event:
+                yield {
+                    "id": int(event.get("id", 0)),
+                    "event": event.get("event", "message"),
+                    "data": json.loads(event["data"]),
+                }
+            event = {}
+        elif not line.startswith(":"):
+            key, _, value = line.partition(":")
+            event[key] = value[1:] if value.startswith(" ") else value
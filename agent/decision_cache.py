@@ -0,0 +1,258 @@
+"""Decision cache: reuse the model's action on a screen it has seen before.
+
+An entry is keyed on the goal, a normalized signature of the desktop state
+(window classes/titles/flags, focus, active workspace, screen size – no
+window ids, no geometry) and a perceptual difference hash of the frame.  A
+lookup hits when an entry under the same key has a hash within
+`max_distance` bits and is younger than `ttl_sec`.
+
+Only actions that executed successfully are stored, and an entry is
+dropped as soon as a replay of it fails.  Actions are stored in screen
+coordinates; window ids are rewritten to positions in the signature's
+window list so that entries stay valid across runs (ids are not stable).
+
+The hash sees layout, not small text: two screens that differ only in a
+few characters collide, which is what the state signature (window titles)
+and the failure invalidation are there to catch.
+
+The model's answer also depends on the step history, which the cache
+ignores: a hit replays what the model did the first time it saw the screen.
+
+With a path set, entries are loaded at start and written back by save().
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from agent.screen_capture import Frame
+
+
+def dhash(img: Image.Image, size: int = 16) -> int:
+    """Difference hash: size*size bits, one per horizontally adjacent pixel pair."""
+    small = img.convert("L").resize((size + 1, size), Image.Resampling.BOX)
+    px = np.asarray(small, dtype=np.int16)
+    bits = (px[:, 1:] > px[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _window_key(w: Dict[str, Any]) -> Tuple[str, str, bool]:
+    return (str(w.get("wm_class", "")), str(w.get("title", "")), bool(w.get("minimized")))
+
+
+def state_signature(state: Dict[str, Any]) -> Tuple[str, List[int]]:
+    """(signature, window ids in signature order) for a /state snapshot."""
+    windows = sorted(state.get("windows", []), key=_window_key)
+    focused = next((i for i, w in enumerate(windows)
+                    if w.get("id") == state.get("focused_window_id")), -1)
+    active = next((ws.get("index") for ws in state.get("workspaces", []) if ws.get("active")), None)
+    sig = json.dumps([
+        [list(_window_key(w)) for w in windows],
+        focused, active, state.get("screen_width"), state.get("screen_height"),
+    ], ensure_ascii=False)
+    return sig, [w.get("id") for w in windows]
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    phash: int
+    action: Dict[str, Any]              # screen coordinates, window ids as positions
+    reason: str
+    created: float
+    hits: int = 0
+
+
+@dataclass
+class CacheProbe:
+    """One lookup; handed back to store()/invalidate() after the action ran."""
+    key: str
+    phash: int
+    window_ids: List[int]
+    entry: Optional[CacheEntry] = None
+    distance: int = 0
+
+    @property
+    def hit(self) -> bool:
+        return self.entry is not None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expired: int = 0
+    invalidated: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return (f"hits={self.hits} misses={self.misses} ({self.hit_rate:.0%}) "
+                f"stores={self.stores} evicted={self.evictions} expired={self.expired} "
+                f"invalidated={self.invalidated}")
+
+
+class DecisionCache:
+    def __init__(self, max_entries: int = 256, ttl_sec: float = 86400.0,
+                 max_distance: int = 4, hash_size: int = 16, path: str = ""):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.path = path
+        self.stats = CacheStats()
+        self._lru: "OrderedDict[Tuple[str, int], CacheEntry]" = OrderedDict()
+        self._buckets: Dict[str, Dict[int, CacheEntry]] = {}
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def lookup(self, goal: str, state: Dict[str, Any], frame: Frame) -> CacheProbe:
+        sig, window_ids = state_signature(state)
+        probe = CacheProbe(
+            key=hashlib.sha1(f"{' '.join(goal.split())}\0{sig}".encode()).hexdigest()[:20],
+            phash=dhash(frame.image(), self.hash_size),
+            window_ids=window_ids,
+        )
+        now = time.time()
+        with self._lock:
+            best: Optional[CacheEntry] = None
+            for entry in list(self._buckets.get(probe.key, {}).values()):
+                if self.ttl_sec > 0 and now - entry.created > self.ttl_sec:
+                    self._remove(entry)
+                    self.stats.expired += 1
+                    continue
+                distance = bin(entry.phash ^ probe.phash).count("1")
+                if distance <= self.max_distance and (best is None or distance < probe.distance):
+                    best, probe.distance = entry, distance
+            if best is None:
+                self.stats.misses += 1
+                return probe
+            self._lru.move_to_end((best.key, best.phash))
+            best.hits += 1
+            self.stats.hits += 1
+            probe.entry = best
+        return probe
+
+    def action(self, probe: CacheProbe) -> Optional[Dict[str, Any]]:
+        """The hit's action with window positions mapped back to current ids."""
+        if probe.entry is None:
+            return None
+        return _map_windows(probe.entry.action, lambda pos: probe.window_ids[pos])
+
+    def store(self, probe: CacheProbe, action: Dict[str, Any], reason: str) -> None:
+        if action.get("type") in ("wait", "finish"):
+            return
+        try:
+            portable = _map_windows(action, probe.window_ids.index)
+        except ValueError:
+            return                      # refers to a window that is not in the state
+        entry = CacheEntry(probe.key, probe.phash, portable, reason, time.time())
+        with self._lock:
+            self._remove(entry)
+            self._insert(entry)
+            self.stats.stores += 1
+
+    def invalidate(self, probe: CacheProbe) -> None:
+        """Drop the entry a probe hit, e.g. because replaying it failed."""
+        if probe.entry is None:
+            return
+        with self._lock:
+            if (probe.entry.key, probe.entry.phash) in self._lru:
+                self._remove(probe.entry)
+                self.stats.invalidated += 1
+        probe.entry = None
+
+    # ── persistence ─────────────────────────────────────────────────────────
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            entries = [{**asdict(e), "phash": f"{e.phash:x}"} for e in self._lru.values()]
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"hash_size": self.hash_size, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"[cache] ignoring unreadable decision cache {self.path}: {e}")
+            return
+        if data.get("hash_size") != self.hash_size:
+            return
+        now = time.time()
+        skipped = 0
+        for raw in data.get("entries", []):
+            try:
+                entry = CacheEntry(**{**raw, "phash": int(raw["phash"], 16)})
+                fresh = self.ttl_sec <= 0 or now - entry.created <= self.ttl_sec
+            except (KeyError, TypeError, ValueError):
+                # Written by another version, or edited by hand
+                skipped += 1
+                continue
+            if fresh:
+                self._insert(entry)
+        if skipped:
+            print(f"[cache] skipped {skipped} malformed entries in {self.path}")
+        print(f"[cache] loaded {len(self._lru)} decisions from {self.path}")
+
+    # ── internals (lock held) ───────────────────────────────────────────────
+
+    def _insert(self, entry: CacheEntry) -> None:
+        self._lru[(entry.key, entry.phash)] = entry
+        self._buckets.setdefault(entry.key, {})[entry.phash] = entry
+        while len(self._lru) > self.max_entries:
+            _, oldest = self._lru.popitem(last=False)
+            self._drop_from_bucket(oldest)
+            self.stats.evictions += 1
+
+    def _remove(self, entry: CacheEntry) -> None:
+        self._lru.pop((entry.key, entry.phash), None)
+        self._drop_from_bucket(entry)
+
+    def _drop_from_bucket(self, entry: CacheEntry) -> None:
+        bucket = self._buckets.get(entry.key)
+        if bucket is not None:
+            bucket.pop(entry.phash, None)
+            if not bucket:
+                del self._buckets[entry.key]
+
+
+def _map_windows(action: Dict[str, Any], fn) -> Dict[str, Any]:
+    """Copy of `action` with window_id fields (also inside batches) passed through fn.
+
+    Raises ValueError for X window ids, which have no place in the signature.
+    """
+    out = dict(action)
+    if "xid" in out:
+        raise ValueError("xid is not portable")
+    if "window_id" in out:
+        out["window_id"] = fn(int(out["window_id"]))
+    if out.get("type") == "batch":
+        out["actions"] = [_map_windows(a, fn) for a in out.get("actions", [])]
+    return out
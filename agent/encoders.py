@@ -0,0 +1,154 @@
+"""Screenshot downscaling and encoding backends.
+
+Every backend resizes with a configurable Pillow filter and turns a PIL
+image into bytes plus a MIME type for the model request:
+
+  pillow         JPEG via Pillow, optimize off (default)
+  pillow-legacy  LANCZOS + JPEG optimize=True – the original, slowest path
+  turbojpeg      JPEG via PyTurboJPEG / libjpeg-turbo; falls back to pillow
+                 when the binding or the library is missing
+  png            lossless, fast compression level; good for text-heavy screens
+  webp           lossy WebP at the same quality; smaller than JPEG on UI content
+
+With reduce enabled, downscales of 2x or more first shrink by the integer
+factor (Image.reduce, a cheap box filter) and only resample the remainder;
+the result can be slightly narrower than max_width.
+
+Encoders are small picklable objects so the capture process can be handed
+the same configuration as the agent.
+"""
+
+from __future__ import annotations
+
+import io
+from typing import Dict, Optional, Type
+
+from PIL import Image
+
+RESAMPLE = {
+    "nearest":  Image.Resampling.NEAREST,
+    "box":      Image.Resampling.BOX,
+    "bilinear": Image.Resampling.BILINEAR,
+    "hamming":  Image.Resampling.HAMMING,
+    "bicubic":  Image.Resampling.BICUBIC,
+    "lanczos":  Image.Resampling.LANCZOS,
+}
+
+
+class Encoder:
+    name = ""
+    mime = "image/jpeg"
+
+    def __init__(self, quality: int = 80, resample: str = "bilinear", reduce: bool = True):
+        if resample not in RESAMPLE:
+            raise ValueError(f"unknown resample filter: {resample}")
+        self.quality = quality
+        self.resample = resample
+        self.reduce = reduce
+
+    def __repr__(self) -> str:
+        return (f"{type(self).__name__}(quality={self.quality}, "
+                f"resample={self.resample!r}, reduce={self.reduce})")
+
+    def resize(self, img: Image.Image, max_width: int) -> Image.Image:
+        if img.width <= max_width:
+            return img
+        size = (max_width, int(img.height * max_width / img.width))
+        if self.reduce and img.width // max_width >= 2:
+            # Integer box reduction first; resample only what is left
+            img = img.reduce(img.width // max_width)
+            if img.width <= max_width:
+                return img
+        return img.resize(size, RESAMPLE[self.resample])
+
+    def encode(self, img: Image.Image) -> bytes:
+        raise NotImplementedError
+
+    def _save(self, img: Image.Image, fmt: str, **params) -> bytes:
+        buf = io.BytesIO()
+        img.save(buf, format=fmt, **params)
+        return buf.getvalue()
+
+
+class PillowJpegEncoder(Encoder):
+    name = "pillow"
+
+    def encode(self, img: Image.Image) -> bytes:
+        return self._save(img, "JPEG", quality=self.quality)
+
+
+class LegacyJpegEncoder(Encoder):
+    name = "pillow-legacy"
+
+    def __init__(self, quality: int = 80, resample: str = "lanczos", reduce: bool = False):
+        super().__init__(quality, "lanczos", False)
+
+    def encode(self, img: Image.Image) -> bytes:
+        return self._save(img, "JPEG", quality=self.quality, optimize=True)
+
+
+class TurboJpegEncoder(Encoder):
+    name = "turbojpeg"
+
+    def __init__(self, quality: int = 80, resample: str = "bilinear", reduce: bool = True):
+        super().__init__(quality, resample, reduce)
+        self._tj = None
+        self._fallback: Optional[Encoder] = None
+
+    def __getstate__(self):
+        # The TurboJPEG handle wraps a ctypes library and does not pickle
+        return {**self.__dict__, "_tj": None, "_fallback": None}
+
+    def _handle(self):
+        if self._tj is None and self._fallback is None:
+            try:
+                from turbojpeg import TurboJPEG
+                self._tj = TurboJPEG()
+            except Exception as e:
+                print(f"[encoder] turbojpeg unavailable ({e}); using pillow")
+                self._fallback = PillowJpegEncoder(self.quality, self.resample, self.reduce)
+        return self._tj
+
+    def encode(self, img: Image.Image) -> bytes:
+        tj = self._handle()
+        if tj is None:
+            return self._fallback.encode(img)
+        import numpy as np
+        from turbojpeg import TJPF_RGB, TJSAMP_420
+        return tj.encode(np.asarray(img.convert("RGB")), quality=self.quality,
+                         pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420)
+
+
+class PngEncoder(Encoder):
+    name = "png"
+    mime = "image/png"
+
+    def encode(self, img: Image.Image) -> bytes:
+        return self._save(img, "PNG", compress_level=1)
+
+
+class WebpEncoder(Encoder):
+    name = "webp"
+    mime = "image/webp"
+
+    def encode(self, img: Image.Image) -> bytes:
+        return self._save(img, "WEBP", quality=self.quality, method=0)
+
+
+ENCODERS: Dict[str, Type[Encoder]] = {
+    cls.name: cls for cls in (
+        PillowJpegEncoder, LegacyJpegEncoder, TurboJpegEncoder, PngEncoder, WebpEncoder)
+}
+
+
+def get_encoder(name: str = "pillow", quality: int = 80,
+                resample: str = "bilinear", reduce: bool = True) -> Encoder:
+    try:
+        cls = ENCODERS[name]
+    except KeyError:
+        raise ValueError(f"unknown image encoder {name!r}; "
+                         f"choose from {', '.join(ENCODERS)}") from None
+    return cls(quality, resample, reduce)
+
+
+DEFAULT_ENCODER = PillowJpegEncoder()
@@ -0,0 +1,157 @@
+"""Tile-based change detection on raw frame pixels.
+
+ChangeDetector keeps a small grayscale thumbnail of the previous frame and
+compares each new frame against it with NumPy, before any JPEG encoding:
+
+  * ratio – mean absolute difference over the whole thumbnail (0.0–1.0),
+    the same measure the old JPEG-based frame_diff_ratio produced;
+  * dirty – a rows x cols grid of tiles whose own mean difference exceeds
+    tile_threshold;
+  * boxes – bounding boxes (frame pixels) of connected groups of dirty
+    tiles, largest first.
+
+A blinking cursor dirties one tile with a tiny box; a dialog opening
+dirties a connected block of tiles even when the global ratio stays low.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from agent.screen_capture import Frame
+
+Box = Tuple[int, int, int, int]     # x1, y1, x2, y2 (exclusive) in frame pixels
+
+# ITU-R BT.601 luma, scaled to sum to 256
+_LUMA = np.array([77, 150, 29], dtype=np.uint16)
+
+
+@dataclass
+class ChangeReport:
+    ratio: float
+    dirty: np.ndarray                   # bool[rows, cols]
+    boxes: List[Box] = field(default_factory=list)
+    frame_size: Tuple[int, int] = (0, 0)
+    first: bool = False                 # no previous frame to compare with
+
+    @property
+    def dirty_tiles(self) -> int:
+        return int(self.dirty.sum())
+
+    @property
+    def largest_box_fraction(self) -> float:
+        """Area of the largest dirty region relative to the whole frame."""
+        if not self.boxes:
+            return 0.0
+        x1, y1, x2, y2 = self.boxes[0]
+        w, h = self.frame_size
+        return (x2 - x1) * (y2 - y1) / max(1, w * h)
+
+    def summary(self) -> str:
+        if self.first:
+            return "first frame"
+        box = f", largest={self.boxes[0]} ({self.largest_box_fraction:.1%})" if self.boxes else ""
+        return f"ratio={self.ratio:.3f}, dirty={self.dirty_tiles}/{self.dirty.size} tiles{box}"
+
+
+class ChangeDetector:
+    def __init__(self, cols: int = 16, rows: int = 9, thumb_width: int = 320,
+                 tile_threshold: float = 0.04):
+        self.cols = cols
+        self.rows = rows
+        self.thumb_width = thumb_width
+        self.tile_threshold = tile_threshold
+        self._prev: Optional[np.ndarray] = None
+        self._prev_size: Tuple[int, int] = (0, 0)
+
+    def reset(self) -> None:
+        self._prev = None
+
+    def update(self, frame: Frame) -> ChangeReport:
+        """Compare `frame` with the previous one and make it the new reference."""
+        report, self._prev = self._compare(frame)
+        self._prev_size = report.frame_size
+        return report
+
+    def compare(self, frame: Frame) -> ChangeReport:
+        """Compare `frame` with the reference without replacing it."""
+        return self._compare(frame)[0]
+
+    def _compare(self, frame: Frame) -> Tuple[ChangeReport, np.ndarray]:
+        thumb = self._thumbnail(frame)
+        size = (frame.width, frame.height)
+        return self._diff(self._prev, self._prev_size, thumb, size), thumb
+
+    def _diff(self, prev: Optional[np.ndarray], prev_size: Tuple[int, int],
+              thumb: np.ndarray, size: Tuple[int, int]) -> ChangeReport:
+        if prev is None or prev.shape != thumb.shape or prev_size != size:
+            return ChangeReport(ratio=1.0, dirty=np.ones((self.rows, self.cols), bool),
+                                boxes=[(0, 0, *size)], frame_size=size, first=True)
+
+        diff = np.abs(thumb - prev)
+        ratio = float(diff.mean()) / 255
+
+        th, tw = diff.shape
+        ys = np.linspace(0, th, self.rows + 1).astype(int)
+        xs = np.linspace(0, tw, self.cols + 1).astype(int)
+        # Mean per tile: sum over row bands, then column bands
+        band = np.add.reduceat(diff, ys[:-1], axis=0)
+        sums = np.add.reduceat(band, xs[:-1], axis=1)
+        areas = np.maximum(np.outer(np.diff(ys), np.diff(xs)), 1)
+        dirty = sums / (areas * 255) > self.tile_threshold
+
+        width, height = size
+        sx, sy = width / tw, height / th
+        boxes = [
+            (int(xs[c1] * sx), int(ys[r1] * sy),
+             min(width, int(np.ceil(xs[c2 + 1] * sx))),
+             min(height, int(np.ceil(ys[r2 + 1] * sy))))
+            for r1, c1, r2, c2 in _components(dirty)
+        ]
+        boxes.sort(key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)
+        return ChangeReport(ratio=ratio, dirty=dirty, boxes=boxes, frame_size=size)
+
+    def _thumbnail(self, frame: Frame) -> np.ndarray:
+        """Grayscale thumbnail (int16): stride-sample the raw RGB, then block-average."""
+        px = np.frombuffer(frame.rgb, dtype=np.uint8).reshape(frame.height, frame.width, 3)
+        f = max(1, frame.width // self.thumb_width)
+        step = max(1, f // 2)           # sampled pixels per thumbnail pixel side: f // step
+        k = f // step
+        h, w = (frame.height // f) * f, (frame.width // f) * f
+        s = px[:h:step, :w:step]
+        # Weights sum to 256, so this stays within uint16
+        gray = (s[..., 0].astype(np.uint16) * _LUMA[0]
+                + s[..., 1].astype(np.uint16) * _LUMA[1]
+                + s[..., 2].astype(np.uint16) * _LUMA[2]) >> 8
+        if k > 1:
+            # step need not divide f, so the sampled size is not always a multiple of k
+            gh, gw = gray.shape
+            gray = gray[:gh - gh % k, :gw - gw % k]
+            gray = gray.reshape(gh // k, k, gw // k, k).sum(axis=(1, 3), dtype=np.uint32) // (k * k)
+        return gray.astype(np.int16)
+
+
+def _components(grid: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """Bounding boxes (r1, c1, r2, c2 inclusive) of 8-connected True cells."""
+    rows, cols = grid.shape
+    seen = np.zeros_like(grid, dtype=bool)
+    out = []
+    for r, c in zip(*np.nonzero(grid)):
+        if seen[r, c]:
+            continue
+        seen[r, c] = True
+        stack = [(r, c)]
+        r1, c1, r2, c2 = r, c, r, c
+        while stack:
+            y, x = stack.pop()
+            r1, c1, r2, c2 = min(r1, y), min(c1, x), max(r2, y), max(c2, x)
+            for ny in range(max(0, y - 1), min(rows, y + 2)):
+                for nx in range(max(0, x - 1), min(cols, x + 2)):
+                    if grid[ny, nx] and not seen[ny, nx]:
+                        seen[ny, nx] = True
+                        stack.append((ny, nx))
+        out.append((int(r1), int(c1), int(r2), int(c2)))
+    return out
@@ -0,0 +1,174 @@
+"""Bounded multi-turn step history for the model prompt.
+
+Each executed step is kept as a record of what the model saw, what it
+decided and what happened.  Records age through three tiers:
+
+  full    the screenshot exactly as the model saw it
+  small   a low-res thumbnail of it (small_width pixels wide)
+  text    a one-line summary: action and result only
+
+and are dropped once more than max_steps are kept.  Past steps are sent
+as real chat turns (observation -> the model's own JSON -> result), with
+the text summaries folded into the first user turn after the goal.
+
+Tiers change in coarse epochs rather than on every step: a tier may run
+`epoch` records over its limit before the overflow is demoted in one go.
+Between compactions the history only grows at the end, so the rendered
+prefix stays byte-identical and the server's prefix cache keeps hitting.
+The token budget is a hard cap: going over it compacts every tier down to
+its exact limit at once (and sheds more if still needed), which again
+leaves room for several appended steps before the next compaction.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent.prompt import estimate_image_tokens, estimate_tokens, image_part
+from agent.screen_capture import Frame, context_thumbnail
+
+FULL, SMALL, TEXT = "full", "small", "text"
+
+
+@dataclass
+class StepRecord:
+    step: int
+    action: Dict[str, Any]
+    reason: str
+    result: Optional[Dict[str, Any]]        # None: not executed (e.g. wait)
+    tier: str = FULL
+    frame: Optional[Frame] = None           # kept only while tier == FULL
+    image: Optional[bytes] = None
+    mime: str = "image/jpeg"
+    image_size: Tuple[int, int] = (0, 0)
+
+    def decision_json(self) -> str:
+        return json.dumps({"reason": self.reason, "action": self.action}, ensure_ascii=False)
+
+    def result_text(self) -> str:
+        if self.result is None:
+            return "未执行"
+        status = "成功" if self.result.get("success", True) else "失败"
+        detail = self.result.get("detail")
+        return f"{status}（{detail}）" if detail else status
+
+    def summary(self) -> str:
+        return (f"第{self.step}步: {json.dumps(self.action, ensure_ascii=False)} "
+                f"→ {self.result_text()}")
+
+    def tokens(self) -> int:
+        n = estimate_tokens(self.decision_json()) + estimate_tokens(self.result_text())
+        if self.tier != TEXT:
+            n += estimate_image_tokens(*self.image_size)
+        return n
+
+
+class StepHistory:
+    def __init__(self, max_steps: int = 8, full_images: int = 1, small_images: int = 2,
+                 small_width: int = 320, token_budget: int = 4000, epoch: int = 4):
+        self.max_steps = max_steps
+        self.full_images = full_images
+        self.small_images = small_images
+        self.small_width = small_width
+        self.token_budget = token_budget
+        self.epoch = max(1, epoch)
+        self._records: List[StepRecord] = []
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_steps > 0
+
+    def add(self, step: int, action: Dict[str, Any], reason: str,
+            result: Optional[Dict[str, Any]], frame: Optional[Frame] = None) -> None:
+        """Record a finished step; `frame` is the image the model decided on."""
+        if not self.enabled:
+            return
+        record = StepRecord(step, action, reason, result, tier=TEXT)
+        if frame is not None:
+            record.tier = FULL
+            record.frame = frame
+            record.image = frame.encoded
+            record.mime = frame.mime
+            record.image_size = (frame.width, frame.height)
+        self._records.append(record)
+        self._compact()
+
+    def tokens(self) -> int:
+        return sum(r.tokens() for r in self._records)
+
+    def messages(self, head: List[Dict[str, Any]],
+                 current: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Chat turns for one request.
+
+        `head` opens the first user turn (the goal); `current` is the
+        observation being decided on and closes the last one.
+        """
+        summaries = [r.summary() for r in self._records if r.tier == TEXT]
+        user: List[Dict[str, Any]] = list(head)
+        if summaries:
+            user.append({"type": "text",
+                         "text": "较早的步骤（仅文字）:\n" + "\n".join(summaries)})
+
+        turns: List[Dict[str, Any]] = []
+        for r in self._records:
+            if r.tier == TEXT:
+                continue
+            user.append({"type": "text", "text": f"第{r.step}步截图:"})
+            user.append(image_part(r.image, r.mime))
+            turns.append({"role": "user", "content": user})
+            turns.append({"role": "assistant", "content": r.decision_json()})
+            user = [{"type": "text", "text": f"第{r.step}步执行结果: {r.result_text()}"}]
+        user.extend(current)
+        turns.append({"role": "user", "content": user})
+        return turns
+
+    # ── compaction ──────────────────────────────────────────────────────────
+
+    def _compact(self) -> None:
+        self._trim(slack=self.epoch)
+        if self.token_budget <= 0 or self.tokens() <= self.token_budget:
+            return
+        # Over budget: trim to the exact limits, then shed from the oldest end
+        # (images to text first, then whole steps)
+        self._trim(slack=1)
+        while self.tokens() > self.token_budget:
+            imaged = next((r for r in self._records if r.tier != TEXT), None)
+            if imaged is not None:
+                self._demote(imaged, TEXT)
+            elif len(self._records) > 1:
+                del self._records[0]
+            else:
+                break
+
+    def _trim(self, slack: int) -> None:
+        """Demote/drop whatever is at least `slack` records over its tier limit."""
+        full = [r for r in self._records if r.tier == FULL]
+        if len(full) >= self.full_images + slack:
+            for r in full[:len(full) - self.full_images]:
+                self._demote(r, SMALL if self.small_images > 0 else TEXT)
+
+        small = [r for r in self._records if r.tier == SMALL]
+        if len(small) >= self.small_images + slack:
+            for r in small[:len(small) - self.small_images]:
+                self._demote(r, TEXT)
+
+        if len(self._records) >= self.max_steps + slack:
+            del self._records[:len(self._records) - self.max_steps]
+
+    def _demote(self, record: StepRecord, tier: str) -> None:
+        if tier == SMALL and record.frame is not None:
+            record.image = context_thumbnail(record.frame, self.small_width)
+            record.mime = "image/jpeg"
+            w, h = record.image_size
+            if w > self.small_width:
+                record.image_size = (self.small_width, max(1, int(h * self.small_width / w)))
+        elif tier == TEXT:
+            record.image = None
+            record.image_size = (0, 0)
+        record.frame = None
+        record.tier = tier
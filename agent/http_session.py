@@ -0,0 +1,113 @@
+"""Pooled HTTP sessions shared by DaemonClient and ModelClient.
+
+make_session() returns a requests.Session with keep-alive connection pools
+and urllib3 retries.  Base URLs of the form unix:///path/to/daemon.sock
+are served by UnixSocketAdapter, which speaks HTTP over a Unix domain
+socket (see DAEMON_UDS in run_daemon.py).
+"""
+
+from __future__ import annotations
+
+import socket
+from typing import Iterable, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+UNIX_SCHEME = "unix://"
+# requests needs a host-shaped URL; every request on it goes to the socket
+UNIX_BASE = "http+unix://daemon"
+
+
+def _retry(retries: int, statuses: Iterable[int] = (), post: bool = False) -> Retry:
+    """Retry connection failures (nothing was sent yet, so always safe);
+    retry listed statuses too – for POST only when the caller says so."""
+    methods = set(Retry.DEFAULT_ALLOWED_METHODS) | ({"POST"} if post else set())
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        redirect=0,
+        status=retries if statuses else 0,
+        status_forcelist=tuple(statuses),
+        allowed_methods=frozenset(methods),
+        backoff_factor=0.2,
+        raise_on_status=False,
+    )
+
+
+class _UnixConnection(HTTPConnection):
+    def __init__(self, socket_path: str, **kw):
+        super().__init__("localhost", **kw)
+        self.socket_path = socket_path
+
+    def _new_conn(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+
+class _UnixConnectionPool(HTTPConnectionPool):
+    def __init__(self, socket_path: str, **kw):
+        super().__init__("localhost", **kw)
+        self.socket_path = socket_path
+
+    def _new_conn(self) -> _UnixConnection:
+        self.num_connections += 1
+        return _UnixConnection(self.socket_path, timeout=self.timeout.connect_timeout)
+
+
+class UnixSocketAdapter(HTTPAdapter):
+    """Send every request mounted on this adapter to one Unix socket."""
+
+    def __init__(self, socket_path: str, pool_maxsize: int = 4, max_retries=0):
+        self.socket_path = socket_path
+        self._pool = _UnixConnectionPool(socket_path, maxsize=pool_maxsize, block=False)
+        super().__init__(pool_connections=1, pool_maxsize=pool_maxsize,
+                         max_retries=max_retries)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self._pool
+
+    def get_connection(self, url, proxies=None):
+        return self._pool
+
+    def request_url(self, request, proxies):
+        return request.path_url
+
+    def close(self) -> None:
+        self._pool.close()
+        super().close()
+
+
+def make_session(
+    base_url: str,
+    pool_size: int = 4,
+    retries: int = 2,
+    retry_statuses: Iterable[int] = (),
+    retry_post: bool = False,
+) -> Tuple[requests.Session, str]:
+    """Return (session, effective base URL) for `base_url`.
+
+    A unix:// base URL is rewritten to UNIX_BASE and mounted on a
+    UnixSocketAdapter; anything else gets ordinary pooled HTTP adapters.
+    """
+    session = requests.Session()
+    max_retries = _retry(retries, retry_statuses, retry_post)
+    if base_url.startswith(UNIX_SCHEME):
+        path = base_url[len(UNIX_SCHEME):]
+        session.mount(UNIX_BASE, UnixSocketAdapter(path, pool_size, max_retries))
+        return session, UNIX_BASE
+
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=max_retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session, base_url.rstrip("/")
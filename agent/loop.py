@@ -1,24 +1,117 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import threading
 import time
-from typing import Any, Dict, Optional
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
 
 from agent.config import AgentConfig
 from agent.daemon_client import DaemonClient
 from agent.model_client import ModelClient
-from agent.screen_capture import capture_jpeg_bytes, frame_diff_ratio
+from agent.prompt import PromptBuilder, TokenReport
+from agent.capture_service import CaptureService
+from agent.decision_cache import CacheProbe, DecisionCache
+from agent.encoders import get_encoder
+from agent.history import StepHistory
+from agent.metrics import AgentMetrics
+from agent.recording import SessionRecorder
+from agent.tracing import Tracer
+from agent.frame_diff import ChangeDetector, ChangeReport
+from agent.screen_capture import (
+    Frame, Viewport, capture_frame, capture_region, context_thumbnail,
+)
+
+
+# Samples kept per stage for stage_summary()
+STAGE_SAMPLES = 4096
+
+
+@dataclass
+class Decision:
+    action: Dict[str, Any]
+    reason: str
+    latency_ms: float
+    tokens: Optional[TokenReport] = None
+    model_action: Optional[Dict[str, Any]] = None   # as the model gave it (image coordinates)
+    image: Optional[Frame] = None                   # what the model saw
+    cache_probe: Optional[CacheProbe] = None        # set when the decision cache is on
+    state: Optional[Dict[str, Any]] = None          # the /state snapshot decided on
+    region: Optional[Tuple[int, int, int, int]] = None  # screen rect of a cropped image
+    context: Optional[bytes] = None                 # whole-screen thumbnail sent with a crop
 
 
 class DesktopAgent:
     def __init__(self, config: AgentConfig):
         self.config = config
-        self.daemon = DaemonClient(config.daemon_base_url)
+        self.daemon = DaemonClient(
+            config.daemon_base_url,
+            pool_size=config.daemon_pool_size,
+            retries=config.daemon_retries,
+        )
         self.model = ModelClient(
             api_base=config.model_api_base,
             model_name=config.model_name,
             api_key=config.model_api_key,
+            pool_size=config.model_pool_size,
+            retries=config.model_retries,
+            stream=config.model_stream,
+            prompt_builder=PromptBuilder(
+                fmt=config.prompt_format,
+                diff=config.prompt_state_diff,
+                keyframe_changes=config.prompt_keyframe_changes,
+            ),
         )
+        self.encoder = get_encoder(
+            config.image_encoder,
+            quality=config.screenshot_quality,
+            resample=config.image_resample,
+            reduce=config.image_reduce,
+        )
+        self.capture: Optional[CaptureService] = None
+        if config.capture_service:
+            self.capture = CaptureService(
+                interval=config.capture_service_interval,
+                max_width=config.screenshot_max_width,
+                encoder=self.encoder,
+                slots=config.capture_ring_slots,
+            )
+        self.history = StepHistory(
+            max_steps=config.history_steps,
+            full_images=config.history_full_images,
+            small_images=config.history_small_images,
+            small_width=config.history_small_width,
+            token_budget=config.history_token_budget,
+            epoch=config.history_epoch,
+        )
+        self.cache: Optional[DecisionCache] = None
+        if config.decision_cache:
+            self.cache = DecisionCache(
+                max_entries=config.decision_cache_size,
+                ttl_sec=config.decision_cache_ttl,
+                max_distance=config.decision_cache_distance,
+                path=config.decision_cache_path,
+            )
+        # Wall time per stage in ms: capture, diff, state, cache, encode,
+        # inference, action
+        self.stage_ms: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=STAGE_SAMPLES))
+        self.metrics: Optional[AgentMetrics] = None
+        if config.metrics_port > 0:
+            self.metrics = AgentMetrics()
+        self.tracer: Optional[Tracer] = None
+        if config.trace:
+            self.tracer = Tracer(config.trace_path,
+                                 max_bytes=config.trace_max_mb << 20,
+                                 backups=config.trace_backups)
+        self.recorder: Optional[SessionRecorder] = None
+        self._frame_seq = 0
+        # _grab() runs on worker threads in pipelined mode
+        self._frame_seq_lock = threading.Lock()
+        self.detector = ChangeDetector(tile_threshold=config.change_tile_threshold)
 
     # ── normal one-shot mode ────────────────────────────────────────────────
 
@@ -27,10 +120,45 @@ class DesktopAgent:
         print(f"[agent] goal: {goal}")
         print(f"[agent] model: {self.config.model_name}")
 
-        if self.config.realtime:
-            self._run_realtime(goal)
-        else:
-            self._run_stepwise(goal)
+        if self.metrics is not None:
+            self.metrics.serve(self.config.metrics_host, self.config.metrics_port)
+        if self.config.record_dir:
+            self.recorder = SessionRecorder(self.config.record_dir, goal, self._record_settings())
+        if self.capture is not None:
+            self.capture.start()
+            self.capture.wait_first()
+        try:
+            if self.config.pipelined:
+                asyncio.run(self._run_pipelined(goal))
+            elif self.config.realtime:
+                self._run_realtime(goal)
+            else:
+                self._run_stepwise(goal)
+        finally:
+            if self.capture is not None:
+                self.capture.stop()
+            if self.cache is not None:
+                print(f"[agent] decision cache: {self.cache.stats.summary()}")
+                self.cache.save()
+            if self.metrics is not None:
+                self.metrics.stop()
+            if self.tracer is not None:
+                self.tracer.close()
+                print(f"[agent] trace written to {self.config.trace_path} "
+                      f"(run {self.tracer.run_id})")
+            if self.recorder is not None:
+                self.recorder.close()
+                print(f"[agent] recorded {self.recorder.count} steps to {self.recorder.path}")
+
+    def _record_settings(self) -> Dict[str, Any]:
+        """What a replay needs to know about how the recorded requests were built."""
+        cfg = self.config
+        keys = ("model_name", "image_encoder", "screenshot_quality", "screenshot_max_width",
+                "prompt_format", "prompt_state_diff", "prompt_keyframe_changes",
+                "history_steps", "history_full_images", "history_small_images",
+                "history_small_width", "history_token_budget", "history_epoch",
+                "capture_roi", "realtime", "pipelined", "model_stream")
+        return {k: getattr(cfg, k) for k in keys}
 
     def _preflight(self) -> None:
         health = self.daemon.health()
@@ -41,11 +169,13 @@ class DesktopAgent:
 
     def _run_stepwise(self, goal: str) -> None:
         for step in range(1, self.config.max_steps + 1):
+            self._trace_step(step)
             action = self._think_and_act(step, goal)
             if action.get("type") == "finish":
                 print("[agent] task finished")
                 return
-            time.sleep(self.config.capture_interval_sec)
+            with self._stage("sleep"):
+                time.sleep(self.config.capture_interval_sec)
         print("[agent] max steps reached")
 
     # ── realtime low-latency mode ───────────────────────────────────────────
@@ -58,35 +188,46 @@ class DesktopAgent:
               f"idle_skip={self.config.idle_skip_threshold})")
 
         step = 0
-        prev_frame: Optional[bytes] = None
+        last_seq = 0
         last_action_time: float = 0.0
 
         while step < self.config.max_steps:
             t0 = time.monotonic()
+            self._trace_step(step + 1)
 
-            # 1) capture
-            screenshot = capture_jpeg_bytes(
-                max_width=self.config.screenshot_max_width,
-                quality=self.config.screenshot_quality,
-            )
-
-            # 2) frame diff — skip inference if screen barely changed
-            diff = frame_diff_ratio(prev_frame, screenshot)
-            prev_frame = screenshot
-
-            if diff < self.config.idle_skip_threshold:
+            # 1) capture — with the capture service this is the newest frame
+            #    in the ring; nothing new yet means nothing to look at
+            frame = self._grab()
+            if frame is None or frame.seq == last_seq:
                 self._sleep_until(t0, self.config.realtime_fps_interval)
                 continue
+            last_seq = frame.seq
 
-            # 3) action cooldown — wait if last action was too recent
+            # 2) action cooldown — wait if last action was too recent.  This
+            #    comes before the diff so the reference frame stays the one
+            #    the model last saw; diffing here would absorb the action's
+            #    effect and leave every later frame looking idle
             since_last = time.monotonic() - last_action_time
             if since_last < self.config.action_cooldown_sec and last_action_time > 0:
+                self._skipped("cooldown")
+                self._sleep_until(t0, self.config.realtime_fps_interval)
+                continue
+
+            # 3) frame diff on raw pixels — skip inference unless the screen
+            #    changed overall or some region large enough (not a cursor
+            #    blink) did
+            with self._stage("diff") as span:
+                change = self.detector.update(frame)
+                span["ratio"] = round(change.ratio, 4)
+            if self._is_idle(change):
+                self._skipped("idle")
                 self._sleep_until(t0, self.config.realtime_fps_interval)
                 continue
 
             # 4) think + act
             step += 1
-            action = self._think_and_act(step, goal, screenshot_override=screenshot)
+            print(f"[step {step}] change: {change.summary()}")
+            action = self._think_and_act(step, goal, frame=frame, change=change)
             if action.get("type") == "finish":
                 print("[agent] task finished")
                 return
@@ -98,44 +239,375 @@ class DesktopAgent:
 
         print("[agent] max steps reached")
 
+    # ── pipelined mode ──────────────────────────────────────────────────────
+
+    async def _run_pipelined(self, goal: str) -> None:
+        """Overlap the stages of a step instead of running them back to back.
+
+        State and frame are fetched concurrently; while the model is
+        thinking, the screen is watched and a decision is dropped (and
+        inference restarted on a fresh observation) if the screen changes
+        underneath it.  A model request cannot be interrupted, so the
+        restart waits for the dropped one to return: at most one inference
+        is in flight.  The post-action observation is scheduled together
+        with the action, so the next inference starts as soon as the
+        action has landed and the screen has settled.
+        """
+        cfg = self.config
+        print(f"[agent] pipelined mode ON  "
+              f"(settle={cfg.pipeline_settle_sec}s, max_restarts={cfg.pipeline_max_restarts})")
+
+        step = 0
+        restarts = 0
+        state, frame = await self._observe()
+        while step < cfg.max_steps:
+            self._trace_step(step + 1)
+            with self._stage("diff"):
+                change = self.detector.update(frame)
+            infer = asyncio.create_task(
+                asyncio.to_thread(self._decide, goal, state, frame, change))
+            watch = asyncio.create_task(self._watch_for_change(frame))
+            await asyncio.wait({infer, watch}, return_when=asyncio.FIRST_COMPLETED)
+            watch.cancel()
+
+            if not infer.done():
+                if restarts < cfg.pipeline_max_restarts:
+                    restarts += 1
+                    print("[agent] screen changed during inference; discarding in-flight decision")
+                    # The request thread cannot be interrupted; wait for it rather
+                    # than stack another request on the model endpoint
+                    await asyncio.wait({infer})
+                    infer.exception()
+                    state, frame = await self._observe()
+                    continue
+                await infer
+            restarts = 0
+
+            step += 1
+            decision = infer.result()
+            action = decision.action
+            self._log_decision(step, decision)
+            if action.get("type") == "finish":
+                self._record(step, decision)
+                print("[agent] task finished")
+                return
+            if action.get("type") == "wait":
+                self._record(step, decision)
+                with self._stage("sleep"):
+                    await asyncio.sleep(cfg.realtime_fps_interval)
+                state, frame = await self._observe()
+                continue
+
+            act = asyncio.create_task(asyncio.to_thread(self._act, step, action))
+            next_obs = asyncio.create_task(self._observe(after=act))
+            result = await act
+            self._remember(step, decision, result)
+            self._record(step, decision, result)
+            state, frame = await next_obs
+
+        print("[agent] max steps reached")
+
+    async def _observe(self, after: Optional[asyncio.Task] = None) -> Tuple[Dict[str, Any], Frame]:
+        """Fetch /state and a frame concurrently, optionally once `after` is
+        done and the screen has had pipeline_settle_sec to settle."""
+        not_before = 0.0
+        if after is not None:
+            await asyncio.wait({after})
+            with self._stage("sleep"):
+                await asyncio.sleep(self.config.pipeline_settle_sec)
+            not_before = time.time()
+        state, frame = await asyncio.gather(
+            asyncio.to_thread(self._get_state),
+            self._fresh_frame(not_before),
+        )
+        return state, frame
+
+    async def _fresh_frame(self, not_before: float = 0.0) -> Frame:
+        """A frame grabbed no earlier than `not_before` (time.time())."""
+        deadline = time.monotonic() + max(1.0, self.config.capture_service_interval * 4)
+        while True:
+            frame = await asyncio.to_thread(self._grab)
+            if frame is not None and (frame.timestamp >= not_before
+                                      or time.monotonic() > deadline):
+                return frame
+            if frame is None and time.monotonic() > deadline:
+                raise RuntimeError("no screen frame available")
+            await asyncio.sleep(0.01)
+
+    async def _watch_for_change(self, reference: Frame) -> ChangeReport:
+        """Return once the screen differs meaningfully from `reference`."""
+        watcher = ChangeDetector(tile_threshold=self.config.change_tile_threshold)
+        watcher.update(reference)
+        poll = (self.config.capture_service_interval if self.capture is not None
+                else self.config.realtime_fps_interval)
+        seq = reference.seq
+        while True:
+            await asyncio.sleep(poll)
+            frame = await asyncio.to_thread(self._grab)
+            if frame is None or frame.seq == seq:
+                continue
+            seq = frame.seq
+            change = await asyncio.to_thread(watcher.compare, frame)
+            if not self._is_idle(change):
+                return change
+
     # ── shared helpers ──────────────────────────────────────────────────────
 
     def _think_and_act(
         self,
         step: int,
         goal: str,
-        screenshot_override: Optional[bytes] = None,
+        frame: Optional[Frame] = None,
+        change: Optional[ChangeReport] = None,
     ) -> Dict[str, Any]:
-        state = self.daemon.get_state()
-        screenshot = screenshot_override or capture_jpeg_bytes(
-            max_width=self.config.screenshot_max_width,
-            quality=self.config.screenshot_quality,
-        )
+        state = self._get_state()
+        if frame is None:
+            frame = self._grab()
+            if frame is None:
+                raise RuntimeError("no screen frame available")
+
+        # Streamed reason text is printed as it arrives
+        on_reason = None
+        if self.config.model_stream:
+            print(f"\n[step {step}] reason: ", end="", flush=True)
+            on_reason = lambda chunk: print(chunk, end="", flush=True)
+        decision = self._decide(goal, state, frame, change, on_reason)
+        if on_reason is not None:
+            print()
+        self._log_decision(step, decision, reason_logged=on_reason is not None)
+        action = decision.action
+        if action.get("type") == "finish":
+            self._record(step, decision)
+            return action
+
+        result = self._act(step, action)
+        self._remember(step, decision, result)
+        self._record(step, decision, result)
+        return action
+
+    def _decide(
+        self,
+        goal: str,
+        state: Dict[str, Any],
+        frame: Frame,
+        change: Optional[ChangeReport] = None,
+        on_reason: Optional[Callable[[str], None]] = None,
+    ) -> Decision:
+        """Run inference on one observation; the action is in screen coordinates.
+
+        With streaming on, latency is the time until the action was complete.
+        A decision cache hit skips inference altogether.
+        """
+        if self.metrics is not None:
+            self.metrics.step()
+        probe = None
+        if self.cache is not None:
+            t_lookup = time.monotonic()
+            with self._stage("cache"):
+                probe = self.cache.lookup(goal, state, frame)
+            if probe.hit:
+                action = self.cache.action(probe)
+                print(f"[agent] decision cache hit (distance={probe.distance}, "
+                      f"hits={probe.entry.hits})")
+                return Decision(
+                    action=action,
+                    reason=probe.entry.reason,
+                    latency_ms=(time.monotonic() - t_lookup) * 1000,
+                    model_action=frame.viewport.unmap_action(action),
+                    image=frame,
+                    cache_probe=probe,
+                    state=state,
+                )
+
+        image, viewport, cropped, context = self._region_of_interest(state, frame, change)
+        region = ((viewport.left, viewport.top, viewport.width, viewport.height)
+                  if cropped else None)
+        with self._stage("encode"):
+            screenshot = image.encoded
 
         t_infer = time.monotonic()
-        decision = self.model.next_action(goal=goal, state=state, screenshot_jpeg=screenshot)
+        with self._stage("inference") as span:
+            decision = self.model.next_action(
+                goal=goal, state=state, screenshot=screenshot, mime=image.mime,
+                region=region,
+                context_jpeg=context,
+                on_reason=on_reason,
+                history=self.history,
+            )
+            tokens = decision.get("tokens")
+            if tokens is not None:
+                span.update(request_bytes=tokens.request_bytes, image_bytes=len(screenshot),
+                            prompt_tokens=tokens.prompt, server_prompt=tokens.server_prompt,
+                            server_cached=tokens.server_cached)
         latency_ms = (time.monotonic() - t_infer) * 1000
 
-        action = decision.get("action", {"type": "wait"})
-        reason = decision.get("reason", "")
+        # Model coordinates are image pixels; the daemon wants screen pixels
+        model_action = decision.get("action", {"type": "wait"})
+        return Decision(
+            action=viewport.map_action(model_action),
+            reason=decision.get("reason", ""),
+            latency_ms=latency_ms,
+            tokens=decision.get("tokens"),
+            model_action=model_action,
+            image=image,
+            cache_probe=probe,
+            state=state,
+            region=region,
+            context=context,
+        )
 
-        print(f"\n[step {step}] reason: {reason}")
-        print(f"[step {step}] action: {json.dumps(action, ensure_ascii=False)}  ({latency_ms:.0f}ms)")
+    def _remember(self, step: int, decision: Decision,
+                  result: Dict[str, Any]) -> None:
+        """Add an executed step to the history and the decision cache.
 
-        if action.get("type") == "finish":
-            return action
+        Waits are not kept: they carry no information and would churn the
+        cached prompt prefix.  A cached decision that failed is dropped.
+        """
+        if decision.action.get("type") == "wait":
+            return
+        probe = decision.cache_probe
+        if probe is not None:
+            if not result.get("success", False):
+                self.cache.invalidate(probe)
+            elif not probe.hit:
+                self.cache.store(probe, decision.action, decision.reason)
+        self.history.add(step, decision.model_action or decision.action,
+                         decision.reason, result, decision.image)
 
+    def _record(self, step: int, decision: Decision,
+                result: Optional[Dict[str, Any]] = None) -> None:
+        if self.recorder is not None:
+            self.recorder.add(step, decision, result)
+
+    @staticmethod
+    def _log_decision(step: int, decision: Decision, reason_logged: bool = False) -> None:
+        if not reason_logged:
+            print(f"\n[step {step}] reason: {decision.reason}")
+        print(f"[step {step}] action: {json.dumps(decision.action, ensure_ascii=False)}  "
+              f"({decision.latency_ms:.0f}ms)")
+        if decision.tokens is not None:
+            print(f"[step {step}] tokens: {decision.tokens.summary()}")
+
+    def _act(self, step: int, action: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            result = self.daemon.run_action(action)
+            with self._stage("action", type=action.get("type")) as span:
+                result = self.daemon.run_action(action)
+                span["ok"] = bool(result.get("success"))
         except Exception as e:
             result = {"success": False, "detail": str(e)}
+        if self.metrics is not None:
+            self.metrics.action(str(action.get("type")), bool(result.get("success")))
 
         print(f"[step {step}] result: {json.dumps(result, ensure_ascii=False)}")
-        return action
+        return result
 
-    @staticmethod
-    def _sleep_until(t0: float, interval: float) -> None:
+    def _is_idle(self, change: ChangeReport) -> bool:
+        """True when a change is too small to be worth (re-)running inference."""
+        return (change.ratio < self.config.idle_skip_threshold
+                and change.largest_box_fraction < self.config.change_min_region)
+
+    def _region_of_interest(
+        self,
+        state: Dict[str, Any],
+        frame: Frame,
+        change: Optional[ChangeReport],
+    ) -> Tuple[Frame, Viewport, bool, Optional[bytes]]:
+        """Pick what the model sees: (image, its viewport, cropped?, context thumbnail).
+
+        Crops come from a fresh native-resolution grab of the region so that
+        small text stays legible; anything too large falls back to the frame.
+        """
+        full = frame.viewport
+        mode = self.config.capture_roi
+        rect = None
+        if mode == "window":
+            win = next((w for w in state.get("windows", [])
+                        if w.get("id") == state.get("focused_window_id")), None)
+            if win and not win.get("minimized"):
+                rect = (win["x"], win["y"], win["width"], win["height"])
+        elif mode == "dirty" and change is not None and not change.first and change.boxes:
+            x1, y1, x2, y2 = change.boxes[0]
+            (sx1, sy1), (sx2, sy2) = full.to_screen(x1, y1), full.to_screen(x2, y2)
+            m = self.config.roi_margin
+            rect = (sx1 - m, sy1 - m, sx2 - sx1 + 2 * m, sy2 - sy1 + 2 * m)
+
+        if rect is None or rect[2] * rect[3] > self.config.roi_max_fraction * full.width * full.height:
+            return frame, full, False, None
+
+        with self._stage("capture"):
+            roi = capture_region(*rect, max_width=self.config.screenshot_max_width,
+                                 encoder=self.encoder)
+        if roi is None:
+            return frame, full, False, None
+        context = None
+        if self.config.roi_context_width > 0:
+            with self._stage("encode"):
+                context = context_thumbnail(frame, self.config.roi_context_width)
+        return roi, roi.viewport, True, context
+
+    def _grab(self) -> Optional[Frame]:
+        """Latest frame: from the capture service if running, else a direct grab."""
+        with self._stage("capture"):
+            if self.capture is not None and self.capture.alive:
+                return self.capture.latest()
+            with self._frame_seq_lock:
+                self._frame_seq += 1
+                seq = self._frame_seq
+            return capture_frame(
+                seq=seq,
+                max_width=self.config.screenshot_max_width,
+                encoder=self.encoder,
+            )
+
+    def _get_state(self) -> Dict[str, Any]:
+        with self._stage("state"):
+            return self.daemon.get_state()
+
+    # ── stage timing ────────────────────────────────────────────────────────
+
+    @contextmanager
+    def _stage(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """Time a stage; the yielded dict's contents are added to its trace span."""
+        t0 = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.stage_ms[name].append(elapsed * 1000)
+            if self.metrics is not None:
+                self.metrics.observe_stage(name, elapsed)
+            if self.tracer is not None:
+                self.tracer.span(name, t0, elapsed, **attrs)
+
+    def _skipped(self, reason: str) -> None:
+        if self.metrics is not None:
+            self.metrics.skipped(reason)
+        if self.tracer is not None:
+            self.tracer.event("skip", reason=reason)
+
+    def _trace_step(self, step: int) -> None:
+        if self.tracer is not None:
+            self.tracer.step = step
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        """Per stage: count, total_ms, mean_ms, p50_ms, p95_ms over the kept samples."""
+        out = {}
+        for name, samples in self.stage_ms.items():
+            values = sorted(samples)
+            if not values:
+                continue
+            out[name] = {
+                "count":   len(values),
+                "total_ms": sum(values),
+                "mean_ms": sum(values) / len(values),
+                "p50_ms":  values[len(values) // 2],
+                "p95_ms":  values[min(len(values) - 1, int(len(values) * 0.95))],
+            }
+        return out
+
+    def _sleep_until(self, t0: float, interval: float) -> None:
         elapsed = time.monotonic() - t0
         remaining = interval - elapsed
         if remaining > 0:
-            time.sleep(remaining)
+            with self._stage("sleep"):
+                time.sleep(remaining)
@@ -0,0 +1,127 @@
+"""Optional Prometheus exporter for the agent (AGENT_METRICS_PORT).
+
+Serves GET /metrics from a background thread in the Prometheus text
+format, with the same bucket layout as the daemon's /metrics so both can
+be graphed side by side:
+
+  gnome_ai_agent_stage_duration_seconds{stage}   capture, diff, state, cache,
+                                                 encode, inference, action, sleep
+  gnome_ai_agent_actions_total{type,result}      ok | failed
+  gnome_ai_agent_steps_total                     model decisions (incl. cache hits)
+  gnome_ai_agent_skipped_frames_total{reason}    idle | cooldown
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# Same buckets as daemon/metrics.py
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class AgentMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # stage -> [count per bucket..., count above the last bucket, sum]
+        self._stages: Dict[str, List[float]] = {}
+        self._actions: Dict[Tuple[str, str], int] = {}
+        self._skipped: Dict[str, int] = {}
+        self._steps = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    # ── recording ───────────────────────────────────────────────────────────
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            s = self._stages.get(stage)
+            if s is None:
+                s = self._stages[stage] = [0] * (len(BUCKETS) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += seconds
+
+    def action(self, action_type: str, ok: bool) -> None:
+        key = (action_type, "ok" if ok else "failed")
+        with self._lock:
+            self._actions[key] = self._actions.get(key, 0) + 1
+
+    def step(self) -> None:
+        with self._lock:
+            self._steps += 1
+
+    def skipped(self, reason: str) -> None:
+        with self._lock:
+            self._skipped[reason] = self._skipped.get(reason, 0) + 1
+
+    # ── exposition ──────────────────────────────────────────────────────────
+
+    def render(self) -> str:
+        with self._lock:
+            stages = sorted((k, list(s)) for k, s in self._stages.items())
+            actions = sorted(self._actions.items())
+            skipped = sorted(self._skipped.items())
+            steps = self._steps
+
+        name = "gnome_ai_agent_stage_duration_seconds"
+        lines = [f"# HELP {name} Wall time per agent loop stage.",
+                 f"# TYPE {name} histogram"]
+        for stage, s in stages:
+            total = 0
+            for le, n in zip(BUCKETS + (float("inf"),), s[:-1]):
+                total += n
+                bound = "+Inf" if le == float("inf") else repr(le)
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {total}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {s[-1]!r}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {total}')
+
+        lines += ["# HELP gnome_ai_agent_actions_total Actions sent to the daemon.",
+                  "# TYPE gnome_ai_agent_actions_total counter"]
+        lines += [f'gnome_ai_agent_actions_total{{type="{t}",result="{r}"}} {n}'
+                  for (t, r), n in actions]
+        lines += ["# HELP gnome_ai_agent_steps_total Decisions made (model or cache).",
+                  "# TYPE gnome_ai_agent_steps_total counter",
+                  f"gnome_ai_agent_steps_total {steps}"]
+        lines += ["# HELP gnome_ai_agent_skipped_frames_total Frames not sent to the model.",
+                  "# TYPE gnome_ai_agent_skipped_frames_total counter"]
+        lines += [f'gnome_ai_agent_skipped_frames_total{{reason="{r}"}} {n}'
+                  for r, n in skipped]
+        return "\n".join(lines) + "\n"
+
+    # ── HTTP server ─────────────────────────────────────────────────────────
+
+    def serve(self, host: str, port: int) -> None:
+        """Serve /metrics on a daemon thread until stop()."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="agent-metrics",
+                         daemon=True).start()
+        print(f"[agent] metrics on http://{host}:{self._server.server_address[1]}/metrics")
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -1,79 +1,299 @@
 from __future__ import annotations
 
-import base64
+import io
 import json
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-import requests
+from PIL import Image
+
+from agent.history import StepHistory
+from agent.http_session import make_session
+from agent.prompt import PromptBuilder, TokenReport, image_part
 
 
 SYSTEM_PROMPT = """你是一个桌面自动化代理。你会看到：
 1) 当前屏幕截图（image）
-2) 当前系统状态JSON（windows/workspaces/focus）
+2) 当前系统状态（窗口列表表格、焦点窗口、当前工作区）
 3) 用户目标
 
 你必须只输出严格JSON，不要输出其他内容，格式如下：
 {
   "reason": "一句简短中文解释",
   "action": {
-    "type": "wait|finish|launch|focus_window|close_window|type_text|hotkey|mouse_click|mouse_double_click|mouse_drag",
+    "type": "wait|finish|launch|focus_window|close_window|type_text|hotkey|mouse_click|mouse_double_click|mouse_drag|batch",
     "...": "根据动作类型填写参数"
   }
 }
 
 要求：
 - 每次只执行一个最小动作。
+- 确定的连续操作（如 点击输入框→全选→输入→回车）可用 batch 一次提交：
+  {"type": "batch", "actions": [{"type": "mouse_click", "x": 1, "y": 2}, {"type": "hotkey", "keys": ["ctrl+a"]}, ...]}
 - 不确定时返回 wait。
 - 当目标完成时返回 finish。
 - 不要虚构窗口ID，必须使用 state.windows 里的 id。
+- 动作坐标（x/y、x1/y1/x2/y2）一律使用截图中的像素坐标，系统会换算成屏幕坐标。
+- 参考之前步骤的执行结果：失败或没有效果的动作不要原样重复，换一种方式。
 """
 
+JSON_HEADERS = {"Content-Type": "application/json"}
+
 
 class ModelClient:
-    def __init__(self, api_base: str, model_name: str, api_key: str = "EMPTY"):
-        self.api_base = api_base.rstrip("/")
+    def __init__(self, api_base: str, model_name: str, api_key: str = "EMPTY",
+                 pool_size: int = 2, retries: int = 2, stream: bool = False,
+                 prompt_builder: Optional[PromptBuilder] = None):
+        # Inference is side-effect free, so overloaded-server responses are
+        # retried as well as connection failures
+        self.session, self.api_base = make_session(
+            api_base, pool_size, retries,
+            retry_statuses=(429, 502, 503, 504), retry_post=True,
+        )
+        self.session.headers["Authorization"] = f"Bearer {api_key}"
         self.model_name = model_name
         self.api_key = api_key
+        self.stream = stream
+        self.prompt_builder = prompt_builder or PromptBuilder()
+
+    def next_action(
+        self,
+        goal: str,
+        state: Dict[str, Any],
+        screenshot: bytes,
+        region: Optional[Tuple[int, int, int, int]] = None,
+        context_jpeg: Optional[bytes] = None,
+        mime: str = "image/jpeg",
+        on_reason: Optional[Callable[[str], None]] = None,
+        history: Optional[StepHistory] = None,
+    ) -> Dict[str, Any]:
+        """Ask for the next action.
+
+        screenshot is encoded as `mime`.  region (left, top, width, height)
+        says it is a crop of that screen rectangle; context_jpeg is an
+        optional low-res view of the whole screen shown after it.
+
+        In streaming mode on_reason receives the reason text as it arrives,
+        and the call returns as soon as the action object is complete.
+
+        With a non-empty history the past steps are sent as chat turns
+        between the goal and this observation (see agent/history.py).
+
+        The result carries a TokenReport under "tokens".  Message parts go
+        from stable to volatile (see agent/prompt.py) to keep the server's
+        prefix cache hitting.
+        """
+        images = [_image_size(screenshot)]
+        if context_jpeg is not None:
+            images.append(_image_size(context_jpeg))
+        prompt = self.prompt_builder.build(goal, state, tuple(images))
+
+        volatile = list(prompt.volatile)
+        if region is not None:
+            left, top, width, height = region
+            volatile.append(
+                f"截图只包含屏幕区域 left={left} top={top} width={width} height={height}，"
+                f"坐标仍按这张截图的像素给出。")
+        texts = [{"type": "text", "text": text} for text in [*prompt.stable, *volatile]]
+        head, current = texts[:1], texts[1:]
+        current.append(image_part(screenshot, mime))
+        if context_jpeg is not None:
+            current.append({"type": "text", "text": "整屏缩略图（仅供参考，不要使用它的坐标）:"})
+            current.append(image_part(context_jpeg))
+        if history:
+            turns = history.messages(head, current)
+            prompt.report.history = history.tokens()
+            prompt.report.prompt += prompt.report.history
+        else:
+            turns = [{"role": "user", "content": head + current}]
 
-    def next_action(self, goal: str, state: Dict[str, Any], screenshot_jpeg: bytes) -> Dict[str, Any]:
-        image_b64 = base64.b64encode(screenshot_jpeg).decode("utf-8")
         payload = {
             "model": self.model_name,
             "temperature": 0.1,
             "max_tokens": 300,
             "messages": [
                 {"role": "system", "content": SYSTEM_PROMPT},
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": f"用户目标: {goal}"},
-                        {"type": "text", "text": f"当前状态JSON: {json.dumps(state, ensure_ascii=False)}"},
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/jpeg;base64,{image_b64}"},
-                        },
-                    ],
-                },
+                *turns,
             ],
         }
 
-        r = requests.post(
+        if self.stream:
+            payload["stream"] = True
+        # Serialized here rather than by requests so the size can be reported
+        body = json.dumps(payload, ensure_ascii=False).encode()
+        prompt.report.request_bytes = len(body)
+
+        if self.stream:
+            decision = self._next_action_streaming(body, on_reason)
+        else:
+            r = self.session.post(
+                f"{self.api_base}/chat/completions",
+                data=body,
+                headers=JSON_HEADERS,
+                timeout=60,
+            )
+            r.raise_for_status()
+            data = r.json()
+            decision = _decision_from_text(data["choices"][0]["message"]["content"])
+            _server_usage(prompt.report, data.get("usage"))
+        decision["tokens"] = prompt.report
+        return decision
+
+    def _next_action_streaming(
+        self,
+        body: bytes,
+        on_reason: Optional[Callable[[str], None]],
+    ) -> Dict[str, Any]:
+        scanner = _DecisionScanner(on_reason)
+        with self.session.post(
             f"{self.api_base}/chat/completions",
-            headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            },
-            json=payload,
+            data=body,
+            headers=JSON_HEADERS,
+            stream=True,
             timeout=60,
-        )
-        r.raise_for_status()
-        data = r.json()
-        content = data["choices"][0]["message"]["content"]
+        ) as r:
+            r.raise_for_status()
+            for delta in _stream_deltas(r.iter_lines(decode_unicode=True)):
+                action = scanner.feed(delta)
+                if action is not None:
+                    # Closing the response drops the connection, which makes
+                    # OpenAI-compatible servers abort the rest of the generation
+                    return {"reason": scanner.reason, "action": action}
+        return _decision_from_text(scanner.text)
+
 
+def _decision_from_text(content: str) -> Dict[str, Any]:
+    try:
         parsed = _safe_json_parse(content)
-        if not isinstance(parsed, dict) or "action" not in parsed:
-            return {"reason": "模型输出不可解析，降级wait", "action": {"type": "wait"}}
-        return parsed
+    except ValueError:
+        parsed = None
+    if not isinstance(parsed, dict) or "action" not in parsed:
+        return {"reason": "模型输出不可解析，降级wait", "action": {"type": "wait"}}
+    return parsed
+
+
+def _image_size(data: bytes) -> Tuple[int, int]:
+    """(width, height) from the image header; (0, 0) if unreadable."""
+    try:
+        return Image.open(io.BytesIO(data)).size
+    except Exception:
+        return (0, 0)
+
+
+def _server_usage(report: TokenReport, usage: Optional[Dict[str, Any]]) -> None:
+    if not usage:
+        return
+    report.server_prompt = usage.get("prompt_tokens")
+    details = usage.get("prompt_tokens_details") or {}
+    report.server_cached = details.get("cached_tokens")
+
+
+def _stream_deltas(lines: Iterator[str]) -> Iterator[str]:
+    """Content deltas from an OpenAI-compatible chat completion SSE stream."""
+    for line in lines:
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            choice = json.loads(data)["choices"][0]
+        except (ValueError, KeyError, IndexError):
+            continue
+        text = (choice.get("delta") or {}).get("content")
+        if text:
+            yield text
+
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f",
+            '"': '"', "\\": "\\", "/": "/"}
+
+
+class _DecisionScanner:
+    """Incremental scanner for {"reason": "...", "action": {...}} output.
+
+    Tracks just enough JSON structure (string/escape state and nesting
+    depth) to stream the top-level reason string and to cut the action
+    object out of the text the moment its closing brace arrives.  Text
+    outside the top-level object (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self, on_reason: Optional[Callable[[str], None]] = None):
+        self.on_reason = on_reason
+        self.text = ""
+        self.reason = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._unicode: Optional[str] = None     # pending \uXXXX digits
+        self._str_start = 0
+        self._last_str = ""
+        self._key: Optional[str] = None         # top-level key whose value we are in
+        self._streaming_reason = False
+        self._action_start: Optional[int] = None
+
+    def _emit(self, chunk: str) -> None:
+        self.reason += chunk
+        if self.on_reason is not None:
+            self.on_reason(chunk)
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Consume more text; return the action dict once it is complete."""
+        self.text += chunk
+        text = self.text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            self._pos = i + 1
+            if self._in_str:
+                if self._unicode is not None:
+                    self._unicode += c
+                    if len(self._unicode) == 4:
+                        if self._streaming_reason:
+                            try:
+                                self._emit(chr(int(self._unicode, 16)))
+                            except ValueError:
+                                pass
+                        self._unicode = None
+                elif self._esc:
+                    self._esc = False
+                    if c == "u":
+                        self._unicode = ""
+                    elif self._streaming_reason:
+                        self._emit(_ESCAPES.get(c, c))
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    self._streaming_reason = False
+                    self._last_str = text[self._str_start + 1:i]
+                elif self._streaming_reason:
+                    self._emit(c)
+                continue
+
+            if c == '"':
+                self._in_str = True
+                self._str_start = i
+                self._streaming_reason = self._depth == 1 and self._key == "reason"
+            elif c == ":" and self._depth == 1:
+                self._key = self._last_str
+            elif c == "," and self._depth == 1:
+                self._key = None
+            elif c in "{[":
+                self._depth += 1
+                if self._depth == 2 and c == "{" and self._key == "action":
+                    self._action_start = i
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._action_start is not None:
+                    try:
+                        action = json.loads(text[self._action_start:i + 1])
+                    except ValueError:
+                        self._action_start = None
+                        continue
+                    if isinstance(action, dict):
+                        return action
+                    self._action_start = None
+        return None
 
 
 def _safe_json_parse(text: str) -> Dict[str, Any]:
@@ -0,0 +1,160 @@
+"""Compact, prefix-cache-friendly prompt construction.
+
+The user message is laid out from most to least stable so that vLLM's
+automatic prefix cache can reuse everything up to the first change:
+
+  1. goal                       – fixed for the whole run
+  2. window table               – one line per window, sorted by id; only
+                                  rebuilt when windows come or go, or (in
+                                  diff mode) when too many rows changed
+  3. volatile line(s)           – focus, active workspace, screen size and,
+                                  in diff mode, row changes since the table
+  4. screenshot                 – changes every step
+
+In diff mode the table is kept verbatim as a keyframe and per-step changes
+are listed after it instead of rewriting rows, so the cached prefix
+survives title and geometry churn.
+
+Token counts are estimates (no tokenizer is loaded): one token per CJK
+character, one per four other characters, and one per 28x28 image patch
+as in Qwen2-VL.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+TABLE_HEADER = "窗口列表（id|wm_class|工作区|x,y,宽x高|状态|标题）:"
+PATCH = 28
+
+
+def estimate_tokens(text: str) -> int:
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    return math.ceil(width / PATCH) * math.ceil(height / PATCH)
+
+
+def image_part(data: bytes, mime: str = "image/jpeg") -> Dict[str, Any]:
+    image_b64 = base64.b64encode(data).decode("utf-8")
+    return {"type": "image_url", "image_url": {"url": f"data:{mime};base64,{image_b64}"}}
+
+
+def _flags(w: Dict[str, Any]) -> str:
+    flags = [name for key, name in (("minimized", "min"), ("maximized", "max")) if w.get(key)]
+    return ",".join(flags) or "-"
+
+
+def _row(w: Dict[str, Any]) -> str:
+    title = str(w.get("title", "")).replace("|", "/").replace("\n", " ")
+    return (f"{w.get('id')}|{w.get('wm_class', '')}|{w.get('workspace', '')}|"
+            f"{w.get('x')},{w.get('y')},{w.get('width')}x{w.get('height')}|"
+            f"{_flags(w)}|{title}")
+
+
+@dataclass
+class TokenReport:
+    prompt: int = 0                 # estimated text + image tokens of the user message
+    stable_prefix: int = 0          # tokens before the first volatile part
+    state: int = 0                  # tokens spent on desktop state
+    state_json: int = 0             # what the raw /state JSON would have cost
+    history: int = 0                # past-step turns (agent/history.py)
+    server_prompt: Optional[int] = None     # prompt_tokens reported by the server
+    server_cached: Optional[int] = None     # of which served from prefix cache
+    request_bytes: int = 0                  # size of the JSON request body
+
+    def summary(self) -> str:
+        saved = 1 - self.state / self.state_json if self.state_json else 0.0
+        out = (f"prompt≈{self.prompt} tok (stable prefix≈{self.stable_prefix}), "
+               f"state {self.state} vs json {self.state_json} tok ({saved:.0%} saved)")
+        if self.history:
+            out += f", history≈{self.history}"
+        if self.server_prompt is not None:
+            out += f", server prompt={self.server_prompt}"
+            if self.server_cached is not None:
+                out += f" cached={self.server_cached}"
+        return out
+
+
+@dataclass
+class Prompt:
+    stable: List[str]               # text parts that rarely change
+    volatile: List[str]             # text parts that change from step to step
+    report: TokenReport = field(default_factory=TokenReport)
+
+
+class PromptBuilder:
+    def __init__(self, fmt: str = "compact", diff: bool = False, keyframe_changes: int = 8):
+        if fmt not in ("compact", "json"):
+            raise ValueError(f"unknown prompt format: {fmt}")
+        self.fmt = fmt
+        self.diff = diff
+        self.keyframe_changes = keyframe_changes
+        self._table: Optional[str] = None
+        self._rows: Dict[int, str] = {}
+        # The keyframe is shared by every build(); the pipelined agent
+        # calls build() from worker threads
+        self._lock = threading.Lock()
+
+    def build(self, goal: str, state: Dict[str, Any],
+              images: Tuple[Tuple[int, int], ...] = ()) -> Prompt:
+        """Lay out goal and state; `images` are (width, height) for the estimate."""
+        state_json = f"当前状态JSON: {json.dumps(state, ensure_ascii=False)}"
+        goal_text = f"用户目标: {goal}"
+        if self.fmt == "json":
+            stable, volatile = [goal_text], [state_json]
+            state_tokens = estimate_tokens(state_json)
+        else:
+            table, changes = self._window_table(state.get("windows", []))
+            stable = [goal_text, table]
+            volatile = [self._volatile_line(state)] + ([changes] if changes else [])
+            state_tokens = sum(estimate_tokens(t) for t in [table, *volatile])
+
+        image_tokens = sum(estimate_image_tokens(w, h) for w, h in images)
+        stable_tokens = sum(estimate_tokens(t) for t in stable)
+        report = TokenReport(
+            prompt=stable_tokens + sum(estimate_tokens(t) for t in volatile) + image_tokens,
+            stable_prefix=stable_tokens,
+            state=state_tokens,
+            state_json=estimate_tokens(state_json),
+        )
+        return Prompt(stable=stable, volatile=volatile, report=report)
+
+    # ── compact format ──────────────────────────────────────────────────────
+
+    def _window_table(self, windows: List[Dict[str, Any]]) -> Tuple[str, str]:
+        """Return (table, changes since the table); changes is "" unless diffing."""
+        rows = {int(w["id"]): _row(w) for w in sorted(windows, key=lambda w: w["id"])}
+        with self._lock:
+            return self._diff(rows)
+
+    def _diff(self, rows: Dict[int, str]) -> Tuple[str, str]:
+        if not self.diff or self._table is None or rows.keys() != self._rows.keys():
+            return self._keyframe(rows), ""
+
+        changed = [row for wid, row in rows.items() if row != self._rows[wid]]
+        if len(changed) > self.keyframe_changes:
+            return self._keyframe(rows), ""
+        if not changed:
+            return self._table, ""
+        return self._table, "自上表以来变化的窗口（以此为准）:\n" + "\n".join(changed)
+
+    def _keyframe(self, rows: Dict[int, str]) -> str:
+        self._rows = rows
+        self._table = "\n".join([TABLE_HEADER, *rows.values()])
+        return self._table
+
+    @staticmethod
+    def _volatile_line(state: Dict[str, Any]) -> str:
+        workspaces = state.get("workspaces", [])
+        active = next((ws["index"] for ws in workspaces if ws.get("active")), "?")
+        return (f"焦点窗口: {state.get('focused_window_id')}  "
+                f"当前工作区: {active}/{len(workspaces)}  "
+                f"屏幕: {state.get('screen_width')}x{state.get('screen_height')}")
@@ -0,0 +1,224 @@
+"""Session recording: everything needed to replay a run without a desktop.
+
+A session is a directory:
+
+  meta.json     goal, model, the prompt/image settings in effect, start time
+  steps.jsonl   one line per decision: /state snapshot, frame ids, region,
+                the model's reason and action (image and screen
+                coordinates), token report, latency, action result
+  frames.bin    encoded images, appended back to back
+  frames.idx    fixed-size index records into frames.bin
+
+Frames are stored exactly as the model received them (screenshot or
+crop, plus the context thumbnail) and deduplicated by a 128-bit BLAKE2b
+of their bytes, so an unchanged screen costs one index lookup.  Readers
+mmap frames.bin and slice it, so replaying never copies the whole file
+into memory.  The index is written after the data it points to; a
+record past the end of frames.bin (a killed run) is ignored on load.
+
+The requests themselves are not stored: replay rebuilds them from the
+recorded inputs with the current PromptBuilder and StepHistory, which is
+what evaluating a prompt change needs (see agent/replay.py).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+from agent.screen_capture import Frame
+
+# digest, offset, length, width, height, mime code
+_INDEX = struct.Struct("<16sQIIIB3x")
+_MIMES = ("image/jpeg", "image/png", "image/webp")
+
+
+@dataclass
+class StoredFrame(Frame):
+    """A Frame backed by stored encoded bytes; pixels are decoded on demand."""
+    stored_mime: str = "image/jpeg"
+
+    def image(self) -> Image.Image:
+        return Image.open(io.BytesIO(self.encoded)).convert("RGB")
+
+    @property
+    def mime(self) -> str:
+        return self.stored_mime
+
+
+class FrameStore:
+    """Append-only, deduplicated store of encoded images."""
+
+    def __init__(self, directory: str, writable: bool = False):
+        self.data_path = os.path.join(directory, "frames.bin")
+        self.index_path = os.path.join(directory, "frames.idx")
+        self.writable = writable
+        self._lock = threading.Lock()
+        self._entries: List[Tuple[bytes, int, int, int, int, int]] = []
+        self._by_digest: Dict[bytes, int] = {}
+        self._map: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+
+        if writable:
+            os.makedirs(directory, exist_ok=True)
+            self._data = open(self.data_path, "ab")
+            self._index = open(self.index_path, "ab")
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load_index(self) -> None:
+        if not os.path.exists(self.index_path):
+            return
+        data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        with open(self.index_path, "rb") as f:
+            raw = f.read()
+        usable = len(raw) - len(raw) % _INDEX.size
+        for entry in _INDEX.iter_unpack(raw[:usable]):
+            if entry[1] + entry[2] > data_size:
+                break
+            self._by_digest.setdefault(entry[0], len(self._entries))
+            self._entries.append(entry)
+
+    def put(self, data: bytes, mime: str = "image/jpeg",
+            size: Tuple[int, int] = (0, 0)) -> int:
+        """Store `data` unless an identical frame is already stored; returns its id."""
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        with self._lock:
+            known = self._by_digest.get(digest)
+            if known is not None:
+                return known
+            offset = self._data.tell()
+            self._data.write(data)
+            self._data.flush()
+            mime_code = _MIMES.index(mime) if mime in _MIMES else 0
+            entry = (digest, offset, len(data), size[0], size[1], mime_code)
+            self._index.write(_INDEX.pack(*entry))
+            self._index.flush()
+            frame_id = len(self._entries)
+            self._entries.append(entry)
+            self._by_digest[digest] = frame_id
+            return frame_id
+
+    def get(self, frame_id: int) -> Tuple[bytes, str, Tuple[int, int]]:
+        """(encoded bytes, mime, (width, height)) of a stored frame."""
+        _, offset, length, width, height, mime_code = self._entries[frame_id]
+        with self._lock:
+            if self._map is None or offset + length > self._mapped_size:
+                self._remap()
+            data = self._map[offset:offset + length]
+        return data, _MIMES[mime_code], (width, height)
+
+    def frame(self, frame_id: int, viewport: Optional[List[int]] = None) -> StoredFrame:
+        """A StoredFrame for `frame_id`; viewport is [left, top, src_w, src_h]."""
+        data, mime, (width, height) = self.get(frame_id)
+        left, top, src_w, src_h = viewport or (0, 0, width, height)
+        return StoredFrame(seq=frame_id, timestamp=0.0, width=width, height=height, rgb=b"",
+                           left=left, top=top, src_width=src_w, src_height=src_h,
+                           _encoded=data, stored_mime=mime)
+
+    def _remap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        with open(self.data_path, "rb") as f:
+            self._mapped_size = os.fstat(f.fileno()).st_size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def bytes_stored(self) -> int:
+        return sum(e[2] for e in self._entries)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if self.writable:
+                self._data.close()
+                self._index.close()
+
+
+class SessionRecorder:
+    """Writes one session directory; add() is called once per decision."""
+
+    def __init__(self, root: str, goal: str, settings: Dict[str, Any]):
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.path = os.path.join(root, name)
+        self.frames = FrameStore(self.path, writable=True)
+        self._steps = open(os.path.join(self.path, "steps.jsonl"), "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.count = 0
+        meta = {"goal": goal, "started": time.time(), **settings}
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def add(self, step: int, decision: Any, result: Optional[Dict[str, Any]]) -> None:
+        """Record a Decision (agent/loop.py) and, if it was executed, its result."""
+        image = decision.image
+        record: Dict[str, Any] = {
+            "step": step,
+            "time": time.time(),
+            "source": "cache" if decision.cache_probe is not None and decision.cache_probe.hit
+                      else "model",
+            "state": decision.state,
+            "frame": None,
+            "viewport": None,
+            "region": list(decision.region) if decision.region else None,
+            "context": None,
+            "reason": decision.reason,
+            "model_action": decision.model_action,
+            "action": decision.action,
+            "latency_ms": round(decision.latency_ms, 1),
+            "tokens": asdict(decision.tokens) if decision.tokens is not None else None,
+            "result": result,
+        }
+        if image is not None:
+            record["frame"] = self.frames.put(image.encoded, image.mime,
+                                              (image.width, image.height))
+            vp = image.viewport
+            record["viewport"] = [vp.left, vp.top, vp.width, vp.height]
+        if decision.context is not None:
+            record["context"] = self.frames.put(decision.context)
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._steps.write(line)
+            self._steps.flush()
+            self.count += 1
+
+    def close(self) -> None:
+        self._steps.close()
+        self.frames.close()
+
+
+@dataclass
+class Session:
+    path: str
+    meta: Dict[str, Any]
+    steps: List[Dict[str, Any]]
+    frames: FrameStore
+
+    @classmethod
+    def open(cls, path: str) -> "Session":
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(path, meta, list(_read_steps(os.path.join(path, "steps.jsonl"))),
+                   FrameStore(path))
+
+
+def _read_steps(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue        # torn last line of a killed run
@@ -0,0 +1,275 @@
+"""Replay recorded sessions (AGENT_RECORD_DIR) against the model, offline.
+
+  python -m agent.replay sessions/20261017-101500-4242
+  python -m agent.replay sessions/* --parallel 8 --min-agreement 0.9 --out report.json
+
+Every recorded model decision is sent again with the current AgentConfig
+(model, prompt format, history settings from the environment) and the
+recorded state, screenshot, crop region and context thumbnail, as fast
+as the server answers.  No desktop, daemon or screen is involved.
+
+The history is teacher-forced: earlier turns always show the recorded
+action and its recorded result, never the replayed one, so the steps
+are independent and --parallel sends them concurrently.  State diffing
+(PROMPT_STATE_DIFF) depends on request order and is turned off
+when steps run in parallel.
+
+Replayed actions are compared with the recorded ones in image
+coordinates:
+
+  same    same type and arguments, coordinates within --tolerance px
+  args    same type, different arguments (text, keys, window, far click)
+  type    a different action type
+  error   the request failed
+
+The exit status is 1 when the share of "same" is below --min-agreement,
+which makes a replay usable as a CI check for prompt and model changes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+from agent.config import AgentConfig
+from agent.history import StepHistory
+from agent.model_client import ModelClient
+from agent.prompt import PromptBuilder
+from agent.recording import Session
+from agent.screen_capture import COORD_FIELDS
+
+VERDICTS = ("same", "args", "type", "error")
+
+
+@dataclass
+class ReplayStep:
+    session: Session
+    record: Dict[str, Any]
+    history: StepHistory        # as it was before this step
+
+
+def prepare(session: Session, config: AgentConfig) -> List[ReplayStep]:
+    """The session's model decisions, each with its teacher-forced history.
+
+    Mirrors DesktopAgent._remember: waits are not added to the history,
+    steps that were never executed (finish, a stale pipelined decision)
+    have no result and are not added either.
+    """
+    history = StepHistory(
+        max_steps=config.history_steps,
+        full_images=config.history_full_images,
+        small_images=config.history_small_images,
+        small_width=config.history_small_width,
+        token_budget=config.history_token_budget,
+        epoch=config.history_epoch,
+    )
+    steps = []
+    for record in session.steps:
+        if record["frame"] is None:
+            continue
+        if record["source"] == "model":
+            steps.append(ReplayStep(session, record, copy.deepcopy(history)))
+        action = record["model_action"] or record["action"]
+        if action.get("type") == "wait" or record["result"] is None:
+            continue
+        history.add(record["step"], action, record["reason"], record["result"],
+                    session.frames.frame(record["frame"], record["viewport"]))
+    return steps
+
+
+def compare(recorded: Dict[str, Any], replayed: Dict[str, Any], tolerance: float) -> str:
+    """Verdict for two actions in image coordinates (see module docstring)."""
+    if recorded.get("type") != replayed.get("type"):
+        return "type"
+    if recorded.get("type") == "batch":
+        a, b = recorded.get("actions") or [], replayed.get("actions") or []
+        if len(a) != len(b):
+            return "args"
+        return "same" if all(compare(x, y, tolerance) == "same" for x, y in zip(a, b)) else "args"
+
+    coords = {f for pair in COORD_FIELDS for f in pair}
+    for fx, fy in COORD_FIELDS:
+        p, q = (recorded.get(fx), recorded.get(fy)), (replayed.get(fx), replayed.get(fy))
+        if p == q:
+            continue
+        if None in p or None in q:
+            return "args"
+        if ((p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2) ** 0.5 > tolerance:
+            return "args"
+    keys = (recorded.keys() | replayed.keys()) - coords - {"type"}
+    return "same" if all(recorded.get(k) == replayed.get(k) for k in keys) else "args"
+
+
+def replay_step(client: ModelClient, rs: ReplayStep, tolerance: float) -> Dict[str, Any]:
+    record, frames = rs.record, rs.session.frames
+    screenshot, mime, _ = frames.get(record["frame"])
+    context = frames.get(record["context"])[0] if record["context"] is not None else None
+    recorded = record["model_action"] or record["action"]
+
+    t0 = time.perf_counter()
+    try:
+        decision = client.next_action(
+            goal=rs.session.meta["goal"],
+            state=record["state"] or {},
+            screenshot=screenshot,
+            region=tuple(record["region"]) if record["region"] else None,
+            context_jpeg=context,
+            mime=mime,
+            history=rs.history,
+        )
+        error = None
+    except Exception as e:
+        decision, error = {}, str(e)
+    latency_ms = (time.perf_counter() - t0) * 1000
+
+    action = decision.get("action", {"type": "wait"}) if error is None else None
+    tokens = decision.get("tokens")
+    return {
+        "session": rs.session.path,
+        "step": record["step"],
+        "verdict": "error" if error else compare(recorded, action, tolerance),
+        "recorded": recorded,
+        "replayed": action,
+        "reason": decision.get("reason", ""),
+        "error": error,
+        "latency_ms": round(latency_ms, 1),
+        "recorded_latency_ms": record["latency_ms"],
+        "prompt_tokens": tokens.prompt if tokens is not None else None,
+    }
+
+
+def _percentile(sorted_values: Sequence[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+
+def _client(config: AgentConfig, pool_size: int, diff: bool) -> ModelClient:
+    return ModelClient(
+        api_base=config.model_api_base,
+        model_name=config.model_name,
+        api_key=config.model_api_key,
+        pool_size=pool_size,
+        retries=config.model_retries,
+        stream=config.model_stream,
+        prompt_builder=PromptBuilder(
+            fmt=config.prompt_format,
+            diff=diff,
+            keyframe_changes=config.prompt_keyframe_changes,
+        ),
+    )
+
+
+def run(sessions: List[Session], config: AgentConfig, parallel: int = 1,
+        tolerance: float = 12.0, limit: int = 0, verbose: bool = False) -> Dict[str, Any]:
+    """Replay `sessions`; returns throughput, agreement and per-step results."""
+    diff = config.prompt_state_diff and parallel <= 1
+    if config.prompt_state_diff and not diff:
+        print("[replay] state diffing depends on request order; disabled for --parallel")
+
+    work = []
+    for session in sessions:
+        steps = prepare(session, config)
+        work.append(steps[:limit] if limit > 0 else steps)
+
+    results: List[Dict[str, Any]] = []
+
+    def report(result: Dict[str, Any]) -> None:
+        results.append(result)
+        if verbose:
+            print(f"[replay] {result['session']} step {result['step']}: {result['verdict']} "
+                  f"({result['latency_ms']:.0f}ms) "
+                  f"{json.dumps(result['replayed'], ensure_ascii=False)}")
+
+    t0 = time.perf_counter()
+    if parallel <= 1:
+        for steps in work:
+            # A fresh builder per session, so its diff keyframe is this session's
+            client = _client(config, 2, diff)
+            for rs in steps:
+                report(replay_step(client, rs, tolerance))
+    else:
+        client = _client(config, parallel, diff)
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            for result in pool.map(lambda rs: replay_step(client, rs, tolerance),
+                                   [rs for steps in work for rs in steps]):
+                report(result)
+    wall = time.perf_counter() - t0
+
+    counts = {v: sum(1 for r in results if r["verdict"] == v) for v in VERDICTS}
+    latencies = sorted(r["latency_ms"] for r in results if r["error"] is None)
+    return {
+        "model": config.model_name,
+        "sessions": [s.path for s in sessions],
+        "steps": len(results),
+        "parallel": parallel,
+        "tolerance": tolerance,
+        "wall_s": round(wall, 3),
+        "steps_per_s": round(len(results) / wall, 2) if wall > 0 else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "agreement": round(counts["same"] / len(results), 4) if results else 0.0,
+        "verdicts": counts,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded agent sessions against the model")
+    parser.add_argument("sessions", nargs="+", help="session directories (AGENT_RECORD_DIR/...)")
+    parser.add_argument("--parallel", type=int, default=1, help="concurrent requests")
+    parser.add_argument("--tolerance", type=float, default=12.0,
+                        help="max coordinate distance in image px that still counts as the same")
+    parser.add_argument("--steps", type=int, default=0, help="replay at most N steps per session")
+    parser.add_argument("--api-base", help="override MODEL_API_BASE")
+    parser.add_argument("--model", help="override MODEL_NAME")
+    parser.add_argument("--min-agreement", type=float, default=0.0,
+                        help="exit 1 when the share of matching actions is below this (0..1)")
+    parser.add_argument("--out", help="write the full report as JSON")
+    parser.add_argument("--mismatches", type=int, default=10, help="mismatches to print")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    cfg = AgentConfig()
+    if args.api_base:
+        cfg.model_api_base = args.api_base
+    if args.model:
+        cfg.model_name = args.model
+
+    sessions = [Session.open(path) for path in args.sessions]
+    try:
+        report = run(sessions, cfg, args.parallel, args.tolerance, args.steps, args.verbose)
+    finally:
+        for s in sessions:
+            s.frames.close()
+
+    counts = report["verdicts"]
+    print(f"[replay] {report['steps']} steps from {len(sessions)} session(s) in "
+          f"{report['wall_s']:.1f}s ({report['steps_per_s']:.1f} steps/s, "
+          f"parallel={report['parallel']})")
+    print(f"[replay] latency p50={report['p50_ms']:.0f}ms p95={report['p95_ms']:.0f}ms")
+    print(f"[replay] agreement {report['agreement']:.1%}: " +
+          ", ".join(f"{v}={counts[v]}" for v in VERDICTS))
+    mismatches = [r for r in report["results"] if r["verdict"] != "same"]
+    for r in mismatches[:args.mismatches]:
+        replayed = r["error"] or json.dumps(r["replayed"], ensure_ascii=False)
+        print(f"  {r['session']} step {r['step']} [{r['verdict']}] "
+              f"recorded {json.dumps(r['recorded'], ensure_ascii=False)} -> {replayed}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[replay] report written to {args.out}")
+
+    if report["agreement"] < args.min_agreement:
+        print(f"[replay] agreement below --min-agreement {args.min_agreement:.0%}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,148 @@
 import io
-from typing import Optional, Tuple
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
 
 from mss import mss
 from PIL import Image
 import hashlib
 
+from agent.encoders import DEFAULT_ENCODER, Encoder, PillowJpegEncoder
+
+
+# Action fields holding screen coordinates, as (x, y) pairs
+COORD_FIELDS = (("x", "y"), ("x1", "y1"), ("x2", "y2"))
+
+
+@dataclass
+class Viewport:
+    """The screen region an image shows; maps image pixels back to the screen."""
+    left: int
+    top: int
+    width: int                  # screen pixels covered
+    height: int
+    image_width: int
+    image_height: int
+
+    def to_screen(self, x: float, y: float) -> Tuple[int, int]:
+        return (self.left + round(x * self.width / max(1, self.image_width)),
+                self.top + round(y * self.height / max(1, self.image_height)))
+
+    def to_image(self, x: float, y: float) -> Tuple[int, int]:
+        return (round((x - self.left) * self.image_width / max(1, self.width)),
+                round((y - self.top) * self.image_height / max(1, self.height)))
+
+    def map_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of `action` with image coordinates turned into screen coordinates."""
+        return _map_coords(action, self.to_screen)
+
+    def unmap_action(self, action: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of `action` with screen coordinates turned into image coordinates."""
+        return _map_coords(action, self.to_image)
+
+
+def _map_coords(action: Dict[str, Any], fn) -> Dict[str, Any]:
+    out = dict(action)
+    for fx, fy in COORD_FIELDS:
+        if isinstance(out.get(fx), (int, float)) and isinstance(out.get(fy), (int, float)):
+            out[fx], out[fy] = fn(out[fx], out[fy])
+    if isinstance(out.get("actions"), list):
+        out["actions"] = [_map_coords(a, fn) if isinstance(a, dict) else a
+                          for a in out["actions"]]
+    return out
+
+
+@dataclass
+class Frame:
+    """One captured screen frame: raw RGB (already downscaled) plus metadata.
+
+    left/top/src_width/src_height give the screen region it was grabbed
+    from.  The image is encoded lazily on first access and cached on the frame.
+    """
+    seq: int
+    timestamp: float            # time.time() at grab
+    width: int
+    height: int
+    rgb: bytes
+    encoder: Encoder = DEFAULT_ENCODER
+    left: int = 0
+    top: int = 0
+    src_width: int = 0          # 0: same as width
+    src_height: int = 0
+    _encoded: Optional[bytes] = field(default=None, repr=False)
+
+    def image(self) -> Image.Image:
+        return Image.frombytes("RGB", (self.width, self.height), self.rgb)
+
+    @property
+    def encoded(self) -> bytes:
+        if self._encoded is None:
+            self._encoded = self.encoder.encode(self.image())
+        return self._encoded
+
+    @property
+    def mime(self) -> str:
+        return self.encoder.mime
+
+    @property
+    def viewport(self) -> Viewport:
+        return Viewport(self.left, self.top,
+                        self.src_width or self.width, self.src_height or self.height,
+                        self.width, self.height)
+
+
+def grab_frame(sct, seq: int = 0, max_width: int = 1280,
+               encoder: Encoder = DEFAULT_ENCODER,
+               region: Optional[Dict[str, int]] = None) -> Frame:
+    """Grab `region` (default: primary monitor) with an open mss instance and downscale it."""
+    region = region or sct.monitors[1]
+    shot = sct.grab(region)
+    img = encoder.resize(Image.frombytes("RGB", shot.size, shot.rgb), max_width)
+    return Frame(seq=seq, timestamp=time.time(), width=img.width, height=img.height,
+                 rgb=img.tobytes(), encoder=encoder,
+                 left=region["left"], top=region["top"],
+                 src_width=shot.width, src_height=shot.height)
+
+
+def encode_jpeg(img: Image.Image, quality: int = 80) -> bytes:
+    return PillowJpegEncoder(quality).encode(img)
+
 
 def capture_jpeg_bytes(max_width: int = 1280, quality: int = 80) -> bytes:
+    return capture_frame(max_width=max_width, encoder=PillowJpegEncoder(quality)).encoded
+
+
+def capture_frame(seq: int = 0, max_width: int = 1280,
+                  encoder: Encoder = DEFAULT_ENCODER) -> Frame:
+    """One-off grab of the primary monitor (image still encoded lazily)."""
     with mss() as sct:
-        mon = sct.monitors[1]
-        shot = sct.grab(mon)
-        img = Image.frombytes("RGB", shot.size, shot.rgb)
+        return grab_frame(sct, seq, max_width, encoder)
+
+
+def capture_region(left: int, top: int, width: int, height: int, seq: int = 0,
+                   max_width: int = 1280,
+                   encoder: Encoder = DEFAULT_ENCODER) -> Optional[Frame]:
+    """Grab one screen rectangle at native resolution (downscaled only past
+    max_width).  The rectangle is clipped to the virtual screen; None if
+    nothing is left."""
+    with mss() as sct:
+        screen = sct.monitors[0]
+        x1, y1 = max(left, screen["left"]), max(top, screen["top"])
+        x2 = min(left + width, screen["left"] + screen["width"])
+        y2 = min(top + height, screen["top"] + screen["height"])
+        if x2 - x1 < 8 or y2 - y1 < 8:
+            return None
+        region = {"left": x1, "top": y1, "width": x2 - x1, "height": y2 - y1}
+        return grab_frame(sct, seq, max_width, encoder, region)
 
-        if img.width > max_width:
-            ratio = max_width / img.width
-            img = img.resize((max_width, int(img.height * ratio)), Image.Resampling.LANCZOS)
 
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=quality, optimize=True)
-        return buf.getvalue()
+def context_thumbnail(frame: Frame, width: int = 480, quality: int = 60) -> bytes:
+    """Small low-res JPEG of a whole frame, shown alongside a crop for context."""
+    img = frame.image()
+    if img.width > width:
+        img = img.resize((width, max(1, int(img.height * width / img.width))),
+                         Image.Resampling.BILINEAR)
+    return encode_jpeg(img, quality)
 
 
 def capture_size() -> Tuple[int, int]:
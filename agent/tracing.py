@@ -0,0 +1,198 @@
+"""Structured per-step trace of the agent loop (AGENT_TRACE=1).
+
+One JSON object per line, one line per span:
+
+  {"run": "20261017-101500-4242", "step": 3, "stage": "inference",
+   "t": 12.384, "ms": 611.2, "request_bytes": 182311, "prompt_tokens": 1480}
+
+`t` is when the span started, in seconds since the run started; `ms` is
+its wall time.  Stages are the ones DesktopAgent._stage times (capture,
+encode, diff, state, cache, inference, action) plus sleep; "skip"
+records (ms=0) say why a frame was not sent to the model.  Spans are
+attributed to the step they lead up to, so idle frames and cooldown
+waits before a step count towards it.
+
+Lines go through a 64 KiB write buffer and the file rotates at
+max_bytes, keeping `backups` old files (trace.jsonl.1, .2, ...).
+
+  python -m agent.tracing agent-trace.jsonl                # percentiles + critical path
+  python -m agent.tracing agent-trace.jsonl* --slowest 10  # include rotated files
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+# Spans closer than this (seconds) still count as back to back on the critical path
+_ADJACENT = 0.0005
+
+
+class Tracer:
+    def __init__(self, path: str, max_bytes: int = 64 << 20, backups: int = 3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.step = 0
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "ab", buffering=1 << 16)
+        self._size = self._file.tell()
+
+    def span(self, stage: str, start: float, seconds: float, **attrs: Any) -> None:
+        """Record a span that started at perf_counter() time `start`."""
+        record = {"run": self.run_id, "step": self.step, "stage": stage,
+                  "t": round(start - self._t0, 6), "ms": round(seconds * 1000, 3)}
+        record.update((k, v) for k, v in attrs.items() if v is not None)
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+        with self._lock:
+            if self._file is None:
+                return
+            if self._size and self._size + len(line) > self.max_bytes:
+                self._rotate()
+            self._file.write(line)
+            self._size += len(line)
+
+    def event(self, stage: str, **attrs: Any) -> None:
+        self.span(stage, time.perf_counter(), 0.0, **attrs)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _rotate(self) -> None:
+        """Shift trace.jsonl -> .1 -> .2 ... (lock held)."""
+        self._file.close()
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab", buffering=1 << 16)
+        self._size = 0
+
+
+# ── summarizer ───────────────────────────────────────────────────────────────
+
+def load(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue        # torn last line of a killed run
+    return spans
+
+
+def _percentile(sorted_values: Sequence[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+
+def critical_path(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Chain of spans that determined a step's wall time.
+
+    Walks back from the span that ended last, each time taking the span
+    that ended latest before the current one started.  Overlapping work
+    (a screen watch during inference, an inference discarded by the
+    pipelined loop) drops out; time the path does not cover, such as
+    untimed waits or a discarded inference, is the gap between wall
+    time and the path's sum.
+    """
+    timed = sorted((s for s in spans if s["ms"] > 0), key=lambda s: s["t"] + s["ms"] / 1000)
+    if not timed:
+        return []
+    path = [timed[-1]]
+    for s in reversed(timed[:-1]):
+        if s["t"] + s["ms"] / 1000 <= path[-1]["t"] + _ADJACENT:
+            path.append(s)
+    return path[::-1]
+
+
+def summarize(spans: List[Dict[str, Any]], slowest: int = 5) -> None:
+    by_stage: Dict[str, List[float]] = defaultdict(list)
+    steps: Dict[Tuple[str, int], List[Dict[str, Any]]] = defaultdict(list)
+    skips: Dict[str, int] = defaultdict(int)
+    for s in spans:
+        if s["stage"] == "skip":
+            skips[s.get("reason", "?")] += 1
+        else:
+            by_stage[s["stage"]].append(s["ms"])
+        steps[(s["run"], s["step"])].append(s)
+
+    total = sum(sum(v) for v in by_stage.values()) or 1.0
+    print(f"{len(spans)} spans, {len(steps)} steps, "
+          f"{len({run for run, _ in steps})} run(s)\n")
+    print(f"{'stage':<10} {'count':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} {'share':>6}")
+    for stage, values in sorted(by_stage.items(), key=lambda kv: -sum(kv[1])):
+        values.sort()
+        print(f"{stage:<10} {len(values):>6} {_percentile(values, 50):>8.1f} "
+              f"{_percentile(values, 90):>8.1f} {_percentile(values, 99):>8.1f} "
+              f"{values[-1]:>8.1f} {sum(values) / total:>6.0%}")
+    if skips:
+        print("skipped frames: " + ", ".join(f"{r}={n}" for r, n in sorted(skips.items())))
+
+    # Per step: wall time and where it went along the critical path
+    rows = []
+    on_path: Dict[str, float] = defaultdict(float)
+    for key, step_spans in steps.items():
+        start = min(s["t"] for s in step_spans)
+        wall = max(s["t"] + s["ms"] / 1000 for s in step_spans) - start
+        path = critical_path(step_spans)
+        for s in path:
+            on_path[s["stage"]] += s["ms"]
+        rows.append((wall * 1000, key, path))
+    if not rows:
+        return
+
+    walls = sorted(r[0] for r in rows)
+    wall_total = sum(walls) or 1.0
+    print(f"\nstep wall ms: p50={_percentile(walls, 50):.0f} p90={_percentile(walls, 90):.0f} "
+          f"max={walls[-1]:.0f}")
+    print("critical path share: " + ", ".join(
+        f"{stage} {ms / wall_total:.0%}" for stage, ms in
+        sorted(on_path.items(), key=lambda kv: -kv[1])))
+
+    print(f"\nslowest {min(slowest, len(rows))} steps:")
+    for wall, (run, step), path in sorted(rows, key=lambda r: -r[0])[:slowest]:
+        gap = wall - sum(s["ms"] for s in path)
+        chain = " -> ".join(f"{s['stage']} {s['ms']:.0f}" for s in path)
+        print(f"  {run} step {step}: {wall:.0f}ms = {chain} (gaps {max(gap, 0):.0f})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarize agent trace files")
+    parser.add_argument("paths", nargs="+", help="trace JSONL files (rotated ones too)")
+    parser.add_argument("--run", help="only this run id")
+    parser.add_argument("--slowest", type=int, default=5, help="steps to break down")
+    args = parser.parse_args()
+
+    spans = load(args.paths)
+    if args.run:
+        spans = [s for s in spans if s["run"] == args.run]
+    if not spans:
+        raise SystemExit("no spans found")
+    summarize(spans, args.slowest)
+
+
+if __name__ == "__main__":
+    main()
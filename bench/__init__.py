@@ -0,0 +1,5 @@
+"""
+Benchmarks and the local stand-ins they run against (fake GNOME extension,
+fake xdotool).  Run the entry points as modules from the repository root,
+e.g. `python -m bench.daemon_bench`.
+"""
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+bench/agent_bench.py
+End-to-end benchmark of DesktopAgent without a model server or a desktop.
+
+Everything the agent talks to is replaced in-process:
+
+  * a fake OpenAI-compatible /v1/chat/completions server.  It plays a
+    scripted task of --steps actions and then "finish", with a configurable
+    time to first token and output token rate; it streams when asked to.
+  * a stand-in daemon serving /health, /state and every action endpoint.
+    Each action is recorded after --action-latency-ms.
+  * a synthetic screen swapped in for mss.  It redraws only --ui-delay-ms
+    after each action, like an application taking time to react, and
+    blinks a text cursor in between.
+
+The model answers with the step for the screen it was shown.  Asking again
+before the UI has caught up yields the same action again; that shows up as
+"repeats" and is what cooldown and frame interval trade against.
+
+Each run reports wall time, steps per second, inference count, repeats and
+time per stage (capture, encode, diff, state, inference, action) from
+DesktopAgent.stage_summary().  Realtime parameters accept comma lists and
+are swept as a grid:
+
+  python -m bench.agent_bench
+  python -m bench.agent_bench --modes realtime --fps-interval 0.2,0.5 \\
+      --cooldown 0.3,1.0 --idle-skip 0.01,0.02 --ui-delay-ms 400
+  python -m bench.agent_bench --model-ttft-ms 150 --token-rate 40 --stream
+  python -m bench.agent_bench --compare bench/results/agent-abc123-....json
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw                     # noqa: E402
+
+import agent.screen_capture as screen_capture       # noqa: E402
+from agent.config import AgentConfig                 # noqa: E402
+from agent.loop import DesktopAgent                  # noqa: E402
+from bench import stats                              # noqa: E402
+
+STAGES = ("capture", "encode", "diff", "state", "inference", "action")
+
+
+# ── synthetic screen ─────────────────────────────────────────────────────────
+
+class SyntheticScreen:
+    """A desktop whose content is a function of how many actions have landed."""
+
+    def __init__(self, width: int, height: int, ui_delay_ms: float, capture_ms: float):
+        self.width, self.height = width, height
+        self.ui_delay = ui_delay_ms / 1000
+        self.capture_delay = capture_ms / 1000
+        self.lock = threading.Lock()
+        self.actions: List[float] = []
+        self.grabs = 0
+        self._cache: Dict[int, bytes] = {}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.actions.clear()
+            self.grabs = 0
+
+    def record_action(self) -> None:
+        with self.lock:
+            self.actions.append(time.monotonic())
+
+    def visible_version(self) -> int:
+        """Number of actions the UI has caught up with."""
+        now = time.monotonic()
+        with self.lock:
+            return sum(1 for t in self.actions if t + self.ui_delay <= now)
+
+    def grab_rgb(self) -> bytes:
+        if self.capture_delay:
+            time.sleep(self.capture_delay)
+        version = self.visible_version()
+        base = self._cache.get(version)
+        if base is None:
+            base = self._render(version)
+            self._cache = {version: base}
+        with self.lock:
+            self.grabs += 1
+            blink = self.grabs % 2
+        if not blink:
+            return base
+        # Text cursor: a 2x18 block, far below the idle threshold
+        rgb = bytearray(base)
+        cx, cy = self.width // 3, self.height // 3
+        for y in range(cy, cy + 18):
+            start = (y * self.width + cx) * 3
+            rgb[start:start + 6] = b"\x20" * 6
+        return bytes(rgb)
+
+    def _render(self, version: int) -> bytes:
+        img = Image.new("RGB", (self.width, self.height), (246, 245, 244))
+        d = ImageDraw.Draw(img)
+        d.rectangle((0, 0, self.width, 36), fill=(36, 36, 36))
+        # One "dialog" per step, moving across the screen
+        x = 200 + (version * 173) % (self.width - 900)
+        y = 150 + (version * 97) % (self.height - 700)
+        d.rectangle((x, y, x + 700, y + 480), fill=(60 + version * 13 % 150, 90, 140))
+        for i in range(12):
+            d.text((x + 30, y + 40 + i * 30), f"step {version} line {i}", fill=(255, 255, 255))
+        return img.tobytes()
+
+
+class _Shot:
+    def __init__(self, width: int, height: int, rgb: bytes):
+        self.width, self.height, self.rgb = width, height, rgb
+        self.size = (width, height)
+
+
+class FakeMss:
+    """Just enough of mss.mss for agent.screen_capture."""
+
+    def __init__(self, screen: SyntheticScreen):
+        self.screen = screen
+        full = {"left": 0, "top": 0, "width": screen.width, "height": screen.height}
+        self.monitors = [full, dict(full)]
+
+    def __enter__(self) -> "FakeMss":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def grab(self, region: Dict[str, int]) -> _Shot:
+        rgb = self.screen.grab_rgb()
+        if (region["left"], region["top"], region["width"], region["height"]) == \
+                (0, 0, self.screen.width, self.screen.height):
+            return _Shot(self.screen.width, self.screen.height, rgb)
+        img = Image.frombytes("RGB", (self.screen.width, self.screen.height), rgb)
+        box = (region["left"], region["top"],
+               region["left"] + region["width"], region["top"] + region["height"])
+        return _Shot(region["width"], region["height"], img.crop(box).tobytes())
+
+
+# ── fake model server ────────────────────────────────────────────────────────
+
+def scripted_action(step: int) -> Dict[str, Any]:
+    kind = step % 4
+    if kind == 0:
+        return {"type": "mouse_click", "x": 100 + step * 37 % 1000, "y": 100 + step * 53 % 600}
+    if kind == 1:
+        return {"type": "type_text", "text": f"step {step}"}
+    if kind == 2:
+        return {"type": "hotkey", "keys": ["ctrl+s"]}
+    return {"type": "mouse_double_click", "x": 400, "y": 300}
+
+
+class ModelServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, screen: SyntheticScreen, steps: int,
+                 ttft_ms: float, token_rate: float):
+        super().__init__(("127.0.0.1", 0), _ModelHandler)
+        self.screen = screen
+        self.steps = steps
+        self.ttft = ttft_ms / 1000
+        self.token_rate = token_rate
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.finished = False
+        self.answers: Dict[int, int] = {}   # version -> times answered
+
+    def reset(self) -> None:
+        with self.lock:
+            self.calls = 0
+            self.finished = False
+            self.answers.clear()
+
+    def decide(self) -> str:
+        version = self.screen.visible_version()
+        with self.lock:
+            self.calls += 1
+            self.answers[version] = self.answers.get(version, 0) + 1
+        if version >= self.steps:
+            self.finished = True
+            decision = {"reason": "任务完成", "action": {"type": "finish"}}
+        else:
+            decision = {"reason": f"执行第{version + 1}步", "action": scripted_action(version)}
+        return json.dumps(decision, ensure_ascii=False)
+
+    @property
+    def repeats(self) -> int:
+        """Inferences beyond the first on the same screen."""
+        with self.lock:
+            return sum(n - 1 for n in self.answers.values())
+
+
+class _ModelHandler(BaseHTTPRequestHandler):
+    server: ModelServer
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        srv = self.server
+        text = srv.decide()
+        chunks = [text[i:i + 4] for i in range(0, len(text), 4)]   # ~1 token each
+        per_token = 1 / srv.token_rate if srv.token_rate > 0 else 0.0
+        prompt_tokens = len(json.dumps(body)) // 4
+        time.sleep(srv.ttft)
+
+        if not body.get("stream"):
+            time.sleep(per_token * len(chunks))
+            self._send_json({
+                "choices": [{"message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(chunks)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                delta = {"choices": [{"delta": {"content": chunk}}]}
+                self.wfile.write(f"data: {json.dumps(delta)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(per_token)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass        # the agent hung up once the action was complete
+        self.close_connection = True
+
+    def _send_json(self, data: Any) -> None:
+        raw = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+# ── stand-in daemon ──────────────────────────────────────────────────────────
+
+class DaemonStandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, screen: SyntheticScreen, windows: int, action_ms: float):
+        super().__init__(("127.0.0.1", 0), _DaemonHandler)
+        self.screen = screen
+        self.action_delay = action_ms / 1000
+        self.state = {
+            "windows": [{
+                "id": 1000 + i, "xid": 0x3a00000 + i, "title": f"Window {i}",
+                "wm_class": "gnome-terminal-server" if i % 2 else "firefox",
+                "pid": 4000 + i, "focused": i == 0, "minimized": False,
+                "maximized": False, "workspace": 0,
+                "x": 40 * i, "y": 30 * i, "width": 1200, "height": 800,
+            } for i in range(windows)],
+            "focused_window_id": 1000,
+            "workspaces": [{"index": 0, "active": True}, {"index": 1, "active": False}],
+            "monitors": [{"index": 0, "x": 0, "y": 0, "width": screen.width,
+                          "height": screen.height, "primary": True}],
+            "screen_width": screen.width,
+            "screen_height": screen.height,
+        }
+
+
+class _DaemonHandler(BaseHTTPRequestHandler):
+    server: DaemonStandIn
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True          # keep-alive: no 40ms delayed-ACK stalls
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/health"):
+            self._send_json({"status": "ok", "dbus_connected": True})
+        elif self.path.startswith("/state"):
+            self._send_json({**self.server.state, "state_version": len(self.server.screen.actions)})
+        else:
+            self._send_json({"detail": "not found"}, 404)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        time.sleep(self.server.action_delay)
+        self.server.screen.record_action()
+        if self.path.startswith("/actions/batch"):
+            results = [{"index": i, "type": a.get("type"), "success": True}
+                       for i, a in enumerate(body.get("actions", []))]
+            self._send_json({"success": True, "results": results})
+        else:
+            self._send_json({"success": True})
+
+    def _send_json(self, data: Any, status: int = 200) -> None:
+        raw = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+# ── runs ─────────────────────────────────────────────────────────────────────
+
+def _serve(server: ThreadingHTTPServer) -> str:
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def run_once(mode: str, params: Dict[str, float], args: argparse.Namespace,
+             screen: SyntheticScreen, model: ModelServer, daemon_url: str,
+             model_url: str) -> Dict[str, Any]:
+    screen.reset()
+    model.reset()
+    config = AgentConfig(
+        daemon_base_url=daemon_url,
+        model_api_base=f"{model_url}/v1",
+        model_stream=args.stream,
+        max_steps=args.steps * 4,
+        screenshot_max_width=args.max_width,
+        capture_interval_sec=params.get("interval", 0.0),
+        realtime=mode == "realtime",
+        pipelined=mode == "pipelined",
+        realtime_fps_interval=params.get("fps_interval", 0.5),
+        action_cooldown_sec=params.get("cooldown", 1.0),
+        idle_skip_threshold=params.get("idle_skip", 0.02),
+        capture_service=False,
+        decision_cache=False,
+    )
+    agent = DesktopAgent(config)
+
+    log = io.StringIO()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr if args.verbose else log):
+        agent.run("benchmark task")
+    wall = time.perf_counter() - t0
+
+    actions = len(screen.actions)
+    stages = agent.stage_summary()
+    label = " ".join(f"{k}={v:g}" for k, v in params.items())
+    row = {
+        "name": f"{mode} {label}".strip(),
+        "mode": mode,
+        "params": params,
+        "wall_s": wall,
+        "actions": actions,
+        "finished": model.finished,
+        "steps_per_s": actions / wall if wall > 0 else 0.0,
+        "inferences": model.calls,
+        "repeats": model.repeats,
+        "grabs": screen.grabs,
+        "stages": stages,
+    }
+    for stage in STAGES:
+        row[f"{stage}_ms"] = stages.get(stage, {}).get("mean_ms", 0.0)
+    print(f"[bench] {row['name']:<40} {wall:6.2f}s  {row['steps_per_s']:.2f} steps/s  "
+          f"inferences={model.calls} repeats={model.repeats}", file=sys.stderr)
+    return row
+
+
+def _floats(text: str) -> List[float]:
+    return [float(v) for v in text.split(",") if v]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end DesktopAgent benchmark")
+    parser.add_argument("--modes", default="stepwise,realtime",
+                        help="comma-separated: stepwise, realtime, pipelined")
+    parser.add_argument("--steps", type=int, default=10, help="scripted actions before finish")
+    parser.add_argument("--interval", default="0", help="stepwise capture_interval_sec values")
+    parser.add_argument("--fps-interval", default="0.5", help="realtime_fps_interval values")
+    parser.add_argument("--cooldown", default="1.0", help="action_cooldown_sec values")
+    parser.add_argument("--idle-skip", default="0.02", help="idle_skip_threshold values")
+    parser.add_argument("--model-ttft-ms", type=float, default=300.0)
+    parser.add_argument("--token-rate", type=float, default=60.0, help="output tokens/s")
+    parser.add_argument("--stream", action="store_true", help="MODEL_STREAM on")
+    parser.add_argument("--ui-delay-ms", type=float, default=200.0,
+                        help="time for the screen to reflect an action")
+    parser.add_argument("--action-latency-ms", type=float, default=5.0)
+    parser.add_argument("--capture-latency-ms", type=float, default=0.0,
+                        help="extra time per grab, on top of synthesising the frame")
+    parser.add_argument("--screen", default="2560x1440")
+    parser.add_argument("--max-width", type=int, default=1280)
+    parser.add_argument("--windows", type=int, default=8)
+    parser.add_argument("--out", help="result file (default bench/results/agent-<commit>-<time>.json)")
+    parser.add_argument("--compare", metavar="BASE.json", help="print the change against BASE")
+    parser.add_argument("--json", action="store_true", help="print the result file to stdout")
+    parser.add_argument("--verbose", action="store_true", help="show the agent's own output")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.screen.split("x"))
+    screen = SyntheticScreen(width, height, args.ui_delay_ms, args.capture_latency_ms)
+    screen_capture.mss = lambda: FakeMss(screen)
+
+    model = ModelServer(screen, args.steps, args.model_ttft_ms, args.token_rate)
+    daemon = DaemonStandIn(screen, args.windows, args.action_latency_ms)
+    model_url, daemon_url = _serve(model), _serve(daemon)
+
+    grids: Dict[str, List[Dict[str, float]]] = {
+        "stepwise": [{"interval": v} for v in _floats(args.interval)],
+        "realtime": [
+            {"fps_interval": f, "cooldown": c, "idle_skip": i}
+            for f, c, i in itertools.product(
+                _floats(args.fps_interval), _floats(args.cooldown), _floats(args.idle_skip))
+        ],
+        "pipelined": [{"fps_interval": f} for f in _floats(args.fps_interval)],
+    }
+    results = []
+    try:
+        for mode in args.modes.split(","):
+            for params in grids[mode]:
+                results.append(run_once(mode, params, args, screen, model,
+                                        daemon_url, model_url))
+    finally:
+        model.shutdown()
+        daemon.shutdown()
+
+    meta = stats.run_meta(
+        steps=args.steps, model_ttft_ms=args.model_ttft_ms, token_rate=args.token_rate,
+        stream=args.stream, ui_delay_ms=args.ui_delay_ms,
+        action_latency_ms=args.action_latency_ms, capture_latency_ms=args.capture_latency_ms,
+        screen=args.screen, max_width=args.max_width)
+    path = stats.save("agent", meta, results, args.out)
+
+    if args.json:
+        print(json.dumps({"kind": "agent", "meta": meta, "results": results}, indent=2))
+    else:
+        stats.print_table(results, ("name", "wall_s", "steps_per_s", "inferences", "repeats",
+                                    *(f"{s}_ms" for s in STAGES)))
+    print(f"[bench] results written to {path}", file=sys.stderr)
+    if args.compare:
+        stats.compare(stats.load(args.compare), stats.load(path),
+                      metrics=("wall_s", "steps_per_s", "inference_ms"))
+
+
+if __name__ == "__main__":
+    main()
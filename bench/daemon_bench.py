@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+bench/daemon_bench.py
+Load test for the REST daemon without a GNOME session.
+
+Starts a private dbus-daemon, the fake extension (bench/fake_aibridge.py)
+on it, and run_daemon.py with INPUT_BACKEND=xdotool and bench/bin first on
+PATH, so input endpoints go through the real subprocess path into a fake
+xdotool.  Every endpoint of daemon/api.py is then driven at each requested
+concurrency, and p50/p95/p99 latency and throughput are reported per
+endpoint.  "events" measures the time from a focus action to its SSE event.
+
+  python -m bench.daemon_bench
+  python -m bench.daemon_bench --concurrency 1,8,32 --requests 500 --windows 100
+  python -m bench.daemon_bench --transport uds --scenarios state,windows,mouse_click
+  python -m bench.daemon_bench --url http://127.0.0.1:7070      # existing daemon
+  python -m bench.daemon_bench --compare bench/results/daemon-abc123-....json
+
+Results go to bench/results/ (or --out) as JSON; --compare prints the
+change against an earlier result file.  The exit status is 1 when any
+scenario's error rate is above --max-error-rate (default 0), so a broken
+endpoint fails the run.
+
+Needs dbus-daemon, python3-dbus and python3-gi, like the daemon itself.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.http_session import make_session          # noqa: E402
+from bench import stats                              # noqa: E402
+
+REPO = stats.REPO
+FAKE_BIN = os.path.join(REPO, "bench", "bin")
+
+Windows = List[Dict[str, Any]]
+# (request index, window list) -> (path, json body)
+RequestFn = Callable[[int, Windows], Tuple[str, Optional[Dict[str, Any]]]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    request: RequestFn
+    per_window: bool = False        # at most one request per window (e.g. close)
+
+
+def _wid(i: int, windows: Windows) -> int:
+    return windows[i % len(windows)]["id"]
+
+
+def _xid(i: int, windows: Windows) -> int:
+    return windows[i % len(windows)].get("xid") or 0
+
+
+def _xy(i: int) -> Dict[str, int]:
+    return {"x": 100 + (i * 37) % 2000, "y": 100 + (i * 53) % 1200}
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("health", "GET", lambda i, w: ("/health", None)),
+    Scenario("metrics", "GET", lambda i, w: ("/metrics", None)),
+    Scenario("state", "GET", lambda i, w: ("/state", None)),
+    Scenario("state_strict", "GET", lambda i, w: ("/state?strict=true", None)),
+    Scenario("windows", "GET", lambda i, w: ("/windows", None)),
+    Scenario("windows_strict", "GET", lambda i, w: ("/windows?strict=true", None)),
+    Scenario("workspaces", "GET", lambda i, w: ("/workspaces", None)),
+    Scenario("focus", "POST", lambda i, w: (f"/windows/{_wid(i, w)}/focus", None)),
+    Scenario("minimize", "POST", lambda i, w: (f"/windows/{_wid(i, w)}/minimize", None)),
+    Scenario("maximize", "POST", lambda i, w: (
+        "/windows/maximize", {"window_id": _wid(i, w), "maximize": i % 2 == 0})),
+    Scenario("move_resize", "POST", lambda i, w: (
+        "/windows/move_resize",
+        {"window_id": _wid(i, w), **_xy(i), "width": 800 + i % 400, "height": 600})),
+    Scenario("switch_workspace", "POST", lambda i, w: (f"/workspaces/{i % 2}/switch", None)),
+    Scenario("launch", "POST", lambda i, w: ("/apps/launch", {"command": "true"})),
+    Scenario("mouse_move", "POST", lambda i, w: (
+        "/input/mouse/move?x={x}&y={y}".format(**_xy(i)), None)),
+    Scenario("mouse_click", "POST", lambda i, w: ("/input/mouse/click", _xy(i))),
+    Scenario("mouse_double_click", "POST", lambda i, w: ("/input/mouse/double_click", _xy(i))),
+    Scenario("mouse_drag", "POST", lambda i, w: (
+        "/input/mouse/drag", {"x1": 100, "y1": 100, "x2": 400 + i % 100, "y2": 300})),
+    Scenario("scroll", "POST", lambda i, w: ("/input/mouse/scroll", {**_xy(i), "clicks": 3})),
+    Scenario("key", "POST", lambda i, w: ("/input/keyboard/key", {"keys": ["ctrl+l"]})),
+    Scenario("type", "POST", lambda i, w: (
+        "/input/keyboard/type", {"text": "hello world", "delay_ms": 0})),
+    Scenario("paste", "POST", lambda i, w: (
+        "/input/keyboard/type", {"text": "x" * 2048, "strategy": "paste"})),
+    Scenario("focus_type", "POST", lambda i, w: (
+        "/input/keyboard/focus_type", {"xid": _xid(i, w), "text": "ls"})),
+    Scenario("focus_key", "POST", lambda i, w: (
+        "/input/keyboard/focus_key", {"xid": _xid(i, w), "keys": ["Return"]})),
+    Scenario("batch", "POST", lambda i, w: ("/actions/batch", {"actions": [
+        {"type": "mouse_click", **_xy(i)},
+        {"type": "hotkey", "keys": ["ctrl+a"]},
+        {"type": "type_text", "text": "hello", "delay_ms": 0},
+        {"type": "focus_window", "window_id": _wid(i, w)},
+    ]})),
+    Scenario("close", "POST", lambda i, w: (f"/windows/{_wid(i, w)}/close", None),
+             per_window=True),
+]
+
+
+# ── environment ──────────────────────────────────────────────────────────────
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class BenchEnv:
+    """Private session bus + fake extension + daemon, torn down on exit."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.procs: List[subprocess.Popen] = []
+        self.tmp = tempfile.mkdtemp(prefix="gnome-ai-bench-")
+        self.base_url = ""
+
+    def __enter__(self) -> "BenchEnv":
+        try:
+            self._start()
+        except BaseException:
+            self.__exit__()
+            raise
+        return self
+
+    def _start(self) -> None:
+        a = self.args
+        bus = subprocess.Popen(
+            ["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+            stdout=subprocess.PIPE, text=True)
+        self.procs.append(bus)
+        address = bus.stdout.readline().strip()
+        if not address:
+            raise RuntimeError("dbus-daemon did not report an address")
+
+        env = {**os.environ, "DBUS_SESSION_BUS_ADDRESS": address, "PYTHONUNBUFFERED": "1"}
+        fake = subprocess.Popen(
+            [sys.executable, "-m", "bench.fake_aibridge",
+             "--windows", str(a.windows), "--workspaces", str(a.workspaces),
+             "--latency-ms", str(a.dbus_latency_ms)],
+            cwd=REPO, env=env, stdout=subprocess.PIPE, text=True)
+        self.procs.append(fake)
+        if not fake.stdout.readline():
+            raise RuntimeError("fake AIBridge failed to start")
+
+        port = _free_port()
+        env.update({
+            "PATH": FAKE_BIN + os.pathsep + os.environ.get("PATH", ""),
+            "INPUT_BACKEND": "xdotool",
+            "FAKE_XDOTOOL_SLEEP": f"{a.input_latency_ms / 1000:g}",
+            # Pastes would otherwise queue behind each other's clipboard restore
+            "CLIPBOARD_RESTORE_DELAY": "0",
+            "DAEMON_HOST": "127.0.0.1" if a.transport == "tcp" else "",
+            "DAEMON_PORT": str(port),
+            "DAEMON_UDS": os.path.join(self.tmp, "daemon.sock") if a.transport == "uds" else "",
+        })
+        log = open(os.path.join(self.tmp, "daemon.log"), "w")
+        self.procs.append(subprocess.Popen(
+            [sys.executable, "run_daemon.py"], cwd=REPO, env=env,
+            stdout=log, stderr=subprocess.STDOUT))
+        self.base_url = (f"http://127.0.0.1:{port}" if a.transport == "tcp"
+                         else f"unix://{env['DAEMON_UDS']}")
+        _wait_healthy(self.base_url, os.path.join(self.tmp, "daemon.log"))
+
+    def __exit__(self, *exc) -> None:
+        for proc in reversed(self.procs):
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+                try:
+                    proc.wait(5)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+        self.procs.clear()
+
+
+def _wait_healthy(base_url: str, log_path: str, timeout: float = 20.0) -> None:
+    session, base = make_session(base_url, pool_size=1, retries=0)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if session.get(f"{base}/health", timeout=1).json().get("dbus_connected"):
+                return
+        except Exception:
+            pass
+        time.sleep(0.1)
+    with open(log_path) as f:
+        tail = f.read()[-2000:]
+    raise RuntimeError(f"daemon did not become healthy:\n{tail}")
+
+
+# ── drivers ──────────────────────────────────────────────────────────────────
+
+def run_scenario(base_url: str, scenario: Scenario, windows: Windows,
+                 requests: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    """Send `requests` requests from `concurrency` threads, each on its own
+    keep-alive connection, as fast as responses come back."""
+    if scenario.per_window:
+        requests = min(requests, len(windows))
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies: List[float] = []
+    errors = unsuccessful = 0
+
+    def worker(total: int, record: bool) -> None:
+        nonlocal errors, unsuccessful
+        session, base = make_session(base_url, pool_size=1, retries=0)
+        # One input scheduler queue per worker, like that many agents
+        session.headers["X-Client-Id"] = f"bench-{threading.get_ident()}"
+        while True:
+            with lock:
+                i = next(counter)
+            if i >= total:
+                return
+            path, body = scenario.request(i, windows)
+            t0 = time.perf_counter()
+            try:
+                r = session.request(scenario.method, base + path, json=body, timeout=30)
+                ok = r.status_code < 400
+                is_json = r.headers.get("content-type", "").startswith("application/json")
+                data = r.json() if ok and is_json else None
+            except Exception:
+                ok, data = False, None
+            ms = (time.perf_counter() - t0) * 1000
+            if not record:
+                continue
+            with lock:
+                if not ok:
+                    errors += 1
+                    continue
+                latencies.append(ms)
+                if isinstance(data, dict) and data.get("success") is False:
+                    unsuccessful += 1
+
+    def run(total: int, record: bool) -> float:
+        nonlocal counter
+        counter = itertools.count()
+        threads = [threading.Thread(target=worker, args=(total, record))
+                   for _ in range(concurrency)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - t0
+
+    if warmup and not scenario.per_window:
+        run(warmup, record=False)
+    elapsed = run(requests, record=True)
+    return {"name": scenario.name, "concurrency": concurrency,
+            **stats.summarize(latencies, elapsed),
+            "errors": errors, "unsuccessful": unsuccessful}
+
+
+def run_event_latency(base_url: str, windows: Windows, requests: int) -> Dict[str, Any]:
+    """Time from POST /windows/{id}/focus to the matching SSE focus event."""
+    session, base = make_session(base_url, pool_size=1, retries=0)
+    events: "queue.Queue[Tuple[float, int]]" = queue.Queue()
+    stop = threading.Event()
+
+    def reader() -> None:
+        sse, _ = make_session(base_url, pool_size=1, retries=0)
+        with sse.get(f"{base}/events", stream=True, timeout=(5, None)) as r:
+            event = None
+            for line in r.iter_lines(decode_unicode=True):
+                if stop.is_set():
+                    return
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:") and event == "focus":
+                    fid = json.loads(line[5:]).get("focused_window_id")
+                    events.put((time.perf_counter(), fid))
+
+    threading.Thread(target=reader, daemon=True).start()
+    time.sleep(0.3)     # let the subscription register
+
+    latencies: List[float] = []
+    misses = 0
+    t_start = time.perf_counter()
+    for i in range(requests):
+        wid = _wid(i, windows)
+        t0 = time.perf_counter()
+        session.post(f"{base}/windows/{wid}/focus", timeout=10)
+        deadline = t0 + 2.0
+        while True:
+            try:
+                t_event, fid = events.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                misses += 1
+                break
+            if fid == wid:
+                latencies.append((t_event - t0) * 1000)
+                break
+    stop.set()
+    return {"name": "events", "concurrency": 1,
+            **stats.summarize(latencies, time.perf_counter() - t_start),
+            "errors": misses, "unsuccessful": 0}
+
+
+def benchmark(base_url: str, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    wanted = set(args.scenarios.split(",")) if args.scenarios else None
+    session, base = make_session(base_url, pool_size=1, retries=0)
+    results = []
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        for scenario in SCENARIOS:
+            if wanted is not None and scenario.name not in wanted:
+                continue
+            # Fresh ids every time: close replaces windows
+            windows = session.get(f"{base}/windows?strict=true", timeout=10).json()
+            row = run_scenario(base_url, scenario, windows, args.requests,
+                               concurrency, args.warmup)
+            results.append(row)
+            _progress(row)
+    if wanted is None or "events" in wanted:
+        windows = session.get(f"{base}/windows?strict=true", timeout=10).json()
+        row = run_event_latency(base_url, windows, min(args.requests, 200))
+        results.append(row)
+        _progress(row)
+    return results
+
+
+def _progress(row: Dict[str, Any]) -> None:
+    print(f"[bench] {row['name']:<20} c={row['concurrency']:<3} "
+          f"p50={row['p50_ms']:.2f}ms p99={row['p99_ms']:.2f}ms "
+          f"{row['rps']:.0f} req/s  errors={row['errors']}", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the gnome-ai-daemon REST API")
+    parser.add_argument("--url", help="benchmark a running daemon instead of starting one "
+                                      "(http://host:port or unix:///path)")
+    parser.add_argument("--transport", choices=("tcp", "uds"), default="tcp")
+    parser.add_argument("--windows", type=int, default=20)
+    parser.add_argument("--workspaces", type=int, default=4)
+    parser.add_argument("--dbus-latency-ms", type=float, default=1.0,
+                        help="fake extension reply delay")
+    parser.add_argument("--input-latency-ms", type=float, default=0.0,
+                        help="fake xdotool run time")
+    parser.add_argument("--concurrency", default="1,8",
+                        help="comma-separated client counts (default 1,8)")
+    parser.add_argument("--requests", type=int, default=200, help="per scenario")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--scenarios", default="",
+                        help="comma-separated subset of: "
+                             + ",".join([s.name for s in SCENARIOS] + ["events"]))
+    parser.add_argument("--out", help="result file (default bench/results/daemon-<commit>-<time>.json)")
+    parser.add_argument("--compare", metavar="BASE.json", help="print the change against BASE")
+    parser.add_argument("--json", action="store_true", help="print the result file to stdout")
+    parser.add_argument("--max-error-rate", type=float, default=0.0,
+                        help="exit 1 when a scenario's share of failed requests is above this "
+                             "(default 0: any error fails the run)")
+    args = parser.parse_args()
+
+    if args.url:
+        results = benchmark(args.url, args)
+    else:
+        with BenchEnv(args) as env:
+            results = benchmark(env.base_url, args)
+
+    meta = stats.run_meta(
+        url=args.url or args.transport, windows=args.windows,
+        dbus_latency_ms=args.dbus_latency_ms, input_latency_ms=args.input_latency_ms,
+        requests=args.requests, concurrency=args.concurrency)
+    path = stats.save("daemon", meta, results, args.out)
+
+    if args.json:
+        print(json.dumps({"kind": "daemon", "meta": meta, "results": results}, indent=2))
+    else:
+        stats.print_table(results, ("name", "concurrency", "rps", "p50_ms", "p95_ms",
+                                    "p99_ms", "errors", "unsuccessful"))
+    print(f"[bench] results written to {path}", file=sys.stderr)
+    if args.compare:
+        stats.compare(stats.load(args.compare), stats.load(path))
+
+    failing = [row for row in results if _error_rate(row) > args.max_error_rate]
+    for row in failing:
+        print(f"[bench] {row['name']} c={row['concurrency']}: {row['errors']} errors "
+              f"({_error_rate(row):.0%}) above --max-error-rate {args.max_error_rate:.0%}",
+              file=sys.stderr)
+    if failing:
+        raise SystemExit(1)
+
+
+def _error_rate(row: Dict[str, Any]) -> float:
+    total = row["count"] + row["errors"]
+    return row["errors"] / total if total else 0.0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+bench/fake_aibridge.py
+Stand-in for the GNOME Shell extension: exports org.gnome.AIBridge on the
+session bus with a synthetic desktop, so the daemon can be benchmarked
+without GNOME.
+
+  * --windows N windows spread over --workspaces workspaces, one monitor
+  * every method sleeps --latency-ms before replying.  Calls are served
+    one at a time on the GLib main loop, like GNOME Shell's own loop.
+  * actions mutate the model and emit WindowsDelta (consecutive seq) just
+    as the real extension does; CloseWindow/LaunchApp keep the window count
+    steady (a closed window is replaced) so long runs stay comparable
+
+  python -m bench.fake_aibridge --windows 40 --latency-ms 2
+"""
+
+import argparse
+import json
+import signal
+import time
+from typing import Any, Dict, List
+
+import dbus
+import dbus.mainloop.glib
+import dbus.service
+from gi.repository import GLib
+
+DBUS_NAME  = "org.gnome.AIBridge"
+DBUS_PATH  = "/org/gnome/AIBridge"
+DBUS_IFACE = "org.gnome.AIBridge"
+
+SCREEN = (2560, 1440)
+WM_CLASSES = ("gnome-terminal-server", "firefox", "org.gnome.Nautilus",
+              "code", "org.gnome.TextEditor", "libreoffice-writer")
+
+
+def make_windows(count: int, workspaces: int) -> Dict[int, Dict[str, Any]]:
+    windows = {}
+    for i in range(count):
+        wid = 1000 + i
+        windows[wid] = {
+            "id": wid, "xid": 0x3a00000 + i,
+            "title": f"Window {i} — {WM_CLASSES[i % len(WM_CLASSES)]}",
+            "wm_class": WM_CLASSES[i % len(WM_CLASSES)], "pid": 4000 + i,
+            "focused": False, "minimized": False, "maximized": False,
+            "workspace": i % max(1, workspaces),
+            "x": 40 * (i % 20), "y": 30 * (i % 20), "width": 1200, "height": 800,
+        }
+    return windows
+
+
+def _window_struct(w: Dict[str, Any]) -> dbus.Struct:
+    return dbus.Struct((
+        dbus.UInt32(w["id"]), dbus.UInt32(w["xid"]), w["title"], w["wm_class"],
+        dbus.Int32(w["pid"]), w["focused"], w["minimized"], w["maximized"],
+        dbus.Int32(w["workspace"]), dbus.Int32(w["x"]), dbus.Int32(w["y"]),
+        dbus.Int32(w["width"]), dbus.Int32(w["height"]),
+    ), signature="uussibbbiiiii")
+
+
+def _window_dict(w: Dict[str, Any]) -> dbus.Dictionary:
+    types = {"id": dbus.UInt32, "xid": dbus.UInt32, "pid": dbus.Int32,
+             "workspace": dbus.Int32, "x": dbus.Int32, "y": dbus.Int32,
+             "width": dbus.Int32, "height": dbus.Int32}
+    return dbus.Dictionary({k: types.get(k, lambda v: v)(v) for k, v in w.items()},
+                           signature="sv")
+
+
+class FakeAIBridge(dbus.service.Object):
+    def __init__(self, bus, windows: int, workspaces: int, latency_ms: float):
+        super().__init__(bus, DBUS_PATH)
+        self.latency = latency_ms / 1000
+        self.windows = make_windows(windows, workspaces)
+        self.workspace_count = max(1, workspaces)
+        self.active_workspace = 0
+        self.focused = next(iter(self.windows), 0)
+        if self.focused:
+            self.windows[self.focused]["focused"] = True
+        self.seq = 0
+        self.next_id = 1000 + windows
+        self.calls = 0
+        self.clipboard = ""
+
+    def _serve(self) -> None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    # ── model ───────────────────────────────────────────────────────────────
+
+    def _workspaces(self) -> List[Dict[str, Any]]:
+        return [{"index": i, "active": i == self.active_workspace}
+                for i in range(self.workspace_count)]
+
+    def _emit(self, added=(), removed=(), changed=(), **globals_) -> None:
+        self.seq += 1
+        g = dbus.Dictionary(signature="sv")
+        if "focused_window_id" in globals_:
+            g["focused_window_id"] = dbus.UInt32(globals_["focused_window_id"])
+        if "workspaces" in globals_:
+            g["workspaces"] = dbus.Array(
+                [dbus.Struct((dbus.Int32(ws["index"]), ws["active"]), signature="ib")
+                 for ws in globals_["workspaces"]], signature="(ib)")
+        self.WindowsDelta(
+            dbus.UInt64(self.seq),
+            dbus.Array([_window_dict(w) for w in added], signature="a{sv}"),
+            dbus.Array([dbus.UInt32(i) for i in removed], signature="u"),
+            dbus.Array([_window_dict(c) for c in changed], signature="a{sv}"),
+            g,
+        )
+
+    def _set_focus(self, wid: int) -> bool:
+        if wid not in self.windows:
+            return False
+        if wid == self.focused:
+            return True
+        changed = [{"id": wid, "focused": True}]
+        if self.focused in self.windows:
+            self.windows[self.focused]["focused"] = False
+            changed.append({"id": self.focused, "focused": False})
+        self.windows[wid]["focused"] = True
+        self.focused = wid
+        self._emit(changed=changed, focused_window_id=wid)
+        return True
+
+    def _change(self, wid: int, **fields) -> bool:
+        w = self.windows.get(wid)
+        if w is None:
+            return False
+        w.update(fields)
+        self._emit(changed=[{"id": wid, **fields}])
+        return True
+
+    def _replace(self, wid: int) -> bool:
+        """Close `wid` and open a fresh window in its place."""
+        old = self.windows.pop(wid, None)
+        if old is None:
+            return False
+        new = {**old, "id": self.next_id, "focused": False,
+               "title": f"Window {self.next_id}"}
+        self.next_id += 1
+        self.windows[new["id"]] = new
+        if self.focused == wid:
+            self.focused = new["id"]
+            new["focused"] = True
+        self._emit(added=[new], removed=[wid], focused_window_id=self.focused)
+        self.WindowsChanged(json.dumps(list(self.windows.values())))
+        return True
+
+    # ── org.gnome.AIBridge ──────────────────────────────────────────────────
+
+    @dbus.service.method(DBUS_IFACE, out_signature="s")
+    def GetWindows(self):
+        self._serve()
+        return json.dumps(list(self.windows.values()))
+
+    @dbus.service.method(DBUS_IFACE, out_signature="s")
+    def GetWorkspaces(self):
+        self._serve()
+        return json.dumps(self._workspaces())
+
+    @dbus.service.method(DBUS_IFACE, out_signature="u")
+    def GetFocusedWindow(self):
+        self._serve()
+        return dbus.UInt32(self.focused)
+
+    @dbus.service.method(DBUS_IFACE, out_signature="a{sv}")
+    def GetDesktopState(self):
+        self._serve()
+        return dbus.Dictionary({
+            "windows": dbus.Array([_window_struct(w) for w in self.windows.values()],
+                                  signature="(uussibbbiiiii)"),
+            "focused_window_id": dbus.UInt32(self.focused),
+            "workspaces": dbus.Array(
+                [dbus.Struct((dbus.Int32(ws["index"]), ws["active"]), signature="ib")
+                 for ws in self._workspaces()], signature="(ib)"),
+            "monitors": dbus.Array(
+                [dbus.Struct((dbus.Int32(0), dbus.Int32(0), dbus.Int32(0),
+                              dbus.Int32(SCREEN[0]), dbus.Int32(SCREEN[1]), True),
+                             signature="iiiiib")], signature="(iiiiib)"),
+            "screen_width": dbus.Int32(SCREEN[0]),
+            "screen_height": dbus.Int32(SCREEN[1]),
+            "seq": dbus.UInt64(self.seq),
+        }, signature="sv")
+
+    @dbus.service.method(DBUS_IFACE, in_signature="u", out_signature="b")
+    def FocusWindow(self, window_id):
+        self._serve()
+        return self._set_focus(int(window_id))
+
+    @dbus.service.method(DBUS_IFACE, in_signature="u", out_signature="b")
+    def CloseWindow(self, window_id):
+        self._serve()
+        return self._replace(int(window_id))
+
+    @dbus.service.method(DBUS_IFACE, in_signature="uiiii", out_signature="b")
+    def MoveResizeWindow(self, window_id, x, y, width, height):
+        self._serve()
+        return self._change(int(window_id), x=int(x), y=int(y),
+                            width=int(width), height=int(height))
+
+    @dbus.service.method(DBUS_IFACE, in_signature="u", out_signature="b")
+    def MinimizeWindow(self, window_id):
+        self._serve()
+        return self._change(int(window_id), minimized=True)
+
+    @dbus.service.method(DBUS_IFACE, in_signature="ub", out_signature="b")
+    def MaximizeWindow(self, window_id, maximize):
+        self._serve()
+        return self._change(int(window_id), maximized=bool(maximize), minimized=False)
+
+    @dbus.service.method(DBUS_IFACE, in_signature="i", out_signature="b")
+    def SwitchWorkspace(self, index):
+        self._serve()
+        index = int(index)
+        if not 0 <= index < self.workspace_count:
+            return False
+        if index != self.active_workspace:
+            self.active_workspace = index
+            self._emit(workspaces=self._workspaces())
+        return True
+
+    @dbus.service.method(DBUS_IFACE, in_signature="s", out_signature="b")
+    def LaunchApp(self, command):
+        self._serve()
+        # Launching is fire-and-forget in the real extension as well
+        return bool(str(command).strip())
+
+    @dbus.service.method(DBUS_IFACE, out_signature="s")
+    def GetClipboard(self):
+        self._serve()
+        return self.clipboard
+
+    @dbus.service.method(DBUS_IFACE, in_signature="s", out_signature="b")
+    def SetClipboard(self, text):
+        self._serve()
+        self.clipboard = str(text)
+        return True
+
+    @dbus.service.signal(DBUS_IFACE, signature="s")
+    def WindowsChanged(self, windows_json):
+        pass
+
+    @dbus.service.signal(DBUS_IFACE, signature="taa{sv}auaa{sv}a{sv}")
+    def WindowsDelta(self, seq, added, removed, changed, globals_):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake org.gnome.AIBridge service")
+    parser.add_argument("--windows", type=int, default=20)
+    parser.add_argument("--workspaces", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=1.0,
+                        help="delay before every reply (default 1ms)")
+    args = parser.parse_args()
+
+    dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
+    bus = dbus.SessionBus()
+    name = dbus.service.BusName(DBUS_NAME, bus, do_not_queue=True)  # noqa: F841
+    service = FakeAIBridge(bus, args.windows, args.workspaces, args.latency_ms)
+
+    loop = GLib.MainLoop()
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGTERM, loop.quit)
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGINT, loop.quit)
+    print(f"[fake-aibridge] {args.windows} windows, {args.latency_ms}ms latency, "
+          f"on {bus.get_unique_name()}", flush=True)
+    loop.run()
+    print(f"[fake-aibridge] served {service.calls} calls", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+bench/stats.py
+Latency summaries and result files shared by the benchmarks.
+
+A result file is JSON:
+
+  {"kind": "daemon", "meta": {commit, date, host, python, params...},
+   "results": [{"name": ..., "count": ..., "p50_ms": ..., ...}, ...]}
+
+Rows are matched across files by their "name" (plus "concurrency" when
+present), so two runs of the same benchmark on different commits can be
+compared with compare().
+"""
+
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO, "bench", "results")
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile (q in 0..100) of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(latencies_ms: Iterable[float], elapsed_s: float = 0.0) -> Dict[str, float]:
+    values = sorted(latencies_ms)
+    return {
+        "count":   len(values),
+        "rps":     len(values) / elapsed_s if elapsed_s > 0 else 0.0,
+        "mean_ms": statistics.fmean(values) if values else 0.0,
+        "p50_ms":  percentile(values, 50),
+        "p95_ms":  percentile(values, 95),
+        "p99_ms":  percentile(values, 99),
+        "max_ms":  values[-1] if values else 0.0,
+    }
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.check_output(
+            ["git", "-C", REPO, "rev-parse", "--short", "HEAD"],
+            text=True, stderr=subprocess.DEVNULL)
+        dirty = subprocess.call(
+            ["git", "-C", REPO, "diff", "--quiet", "HEAD"], stderr=subprocess.DEVNULL)
+        return out.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_meta(**params: Any) -> Dict[str, Any]:
+    return {
+        "commit": git_commit(),
+        "date":   datetime.datetime.now().isoformat(timespec="seconds"),
+        "host":   platform.node(),
+        "python": platform.python_version(),
+        "params": params,
+    }
+
+
+def save(kind: str, meta: Dict[str, Any], results: List[Dict[str, Any]],
+         path: Optional[str] = None) -> str:
+    """Write a result file; the default name is bench/results/<kind>-<commit>-<time>.json."""
+    if path is None:
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"{kind}-{meta['commit']}-{stamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"kind": kind, "meta": meta, "results": results}, f, indent=2)
+    return path
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _key(row: Dict[str, Any]) -> Tuple[str, Any]:
+    return row["name"], row.get("concurrency")
+
+
+def print_table(results: List[Dict[str, Any]], columns: Sequence[str],
+                out=sys.stdout) -> None:
+    widths = [max(len(c), 9) for c in columns]
+    print("  ".join(c.rjust(w) if i else c.ljust(24) for i, (c, w)
+                    in enumerate(zip(columns, widths))), file=out)
+    for row in results:
+        cells = []
+        for i, (c, w) in enumerate(zip(columns, widths)):
+            v = row.get(c, "")
+            text = f"{v:.2f}" if isinstance(v, float) else str(v)
+            cells.append(text.rjust(w) if i else text.ljust(24))
+        print("  ".join(cells), file=out)
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any],
+            metrics: Sequence[str] = ("p50_ms", "p99_ms", "rps"), out=sys.stdout) -> None:
+    """Print new vs base for every row present in both result files."""
+    print(f"base {base['meta']['commit']} ({base['meta']['date']})  ->  "
+          f"new {new['meta']['commit']} ({new['meta']['date']})", file=out)
+    base_rows = {_key(r): r for r in base["results"]}
+    header = ["name".ljust(24), "conc".rjust(4)]
+    header += [f"{m:>22}" for m in metrics]
+    print("  ".join(header), file=out)
+    for row in new["results"]:
+        old = base_rows.get(_key(row))
+        if old is None:
+            continue
+        cells = [row["name"].ljust(24), str(row.get("concurrency", "")).rjust(4)]
+        for m in metrics:
+            a, b = old.get(m, 0.0), row.get(m, 0.0)
+            change = f"{(b - a) / a:+.0%}" if a else "n/a"
+            cells.append(f"{a:>8.2f} -> {b:>8.2f} {change:>4}")
+        print("  ".join(cells), file=out)
@@ -7,17 +7,31 @@ All endpoints return structured JSON.  The daemon wraps two sources:
   2. xdotool           (mouse, keyboard, window geometry)
 
 Base URL: http://127.0.0.1:7070
+
+Every route is `async def`: DBus calls complete through the GLib main
+loop and input runs on the input scheduler's thread, so no handler parks
+a threadpool worker while it waits.  The one blocking DBus step,
+connecting to the extension, runs in a worker thread.  Input routes read X-Client-Id and
+X-Input-Priority to pick the caller's scheduler queue.
 """
 
-from typing import List
+import asyncio
+from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, status
+import anyio.to_thread
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
+from daemon import metrics
+from daemon.batch import run_batch
+from daemon.config import settings
 from daemon.dbus_client import AIBridgeClient
+from daemon.events import bus
 from daemon import input_controller as ic
+from daemon.input_scheduler import ANONYMOUS, PRIORITIES, InputQueueFull, Origin, get_scheduler
 from daemon.models import (
-    FocusKeyRequest, FocusTypeRequest, KeyPressRequest,
+    BatchRequest, BatchResponse, FocusKeyRequest, FocusTypeRequest, KeyPressRequest,
     LaunchAppRequest, MaximizeRequest, MouseClickRequest,
     MouseDragRequest, MoveResizeRequest, ScreenState,
     ScrollRequest, SuccessResponse, TypeTextRequest,
@@ -40,20 +54,64 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.metrics:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+bus.attach(AIBridgeClient.instance())
+
+metrics.Gauge("gnome_ai_dbus_connected", "1 while connected to org.gnome.AIBridge.",
+              fn=lambda: AIBridgeClient.instance().connected)
+metrics.Gauge("gnome_ai_state_version", "Version of the cached desktop state.",
+              fn=lambda: AIBridgeClient.instance().state_version)
+metrics.Gauge("gnome_ai_input_queued", "Input jobs waiting in the scheduler.",
+              fn=lambda: get_scheduler().pending())
+
 
-def _client() -> AIBridgeClient:
+_connect_lock: Optional[asyncio.Lock] = None
+
+
+async def _client() -> AIBridgeClient:
+    """The bridge client, connected first if needed.
+
+    connect() introspects the extension synchronously, so it runs in a
+    worker thread; concurrent requests wait for the same attempt.
+    """
+    global _connect_lock
     c = AIBridgeClient.instance()
-    if not c.connected:
-        try:
-            c.connect()
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=f"GNOME AI Bridge extension not reachable: {e}",
-            )
+    if c.connected:
+        return c
+    if _connect_lock is None:
+        _connect_lock = asyncio.Lock()
+    async with _connect_lock:
+        if not c.connected:
+            try:
+                await anyio.to_thread.run_sync(c.connect)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail=f"GNOME AI Bridge extension not reachable: {e}",
+                )
     return c
 
 
+def _origin(
+    x_client_id: Optional[str] = Header(None),
+    x_input_priority: Optional[str] = Header(None),
+) -> Origin:
+    priority = (x_input_priority or "normal").lower()
+    if priority not in PRIORITIES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"X-Input-Priority must be one of {', '.join(PRIORITIES)}")
+    return Origin(x_client_id or ANONYMOUS, priority)
+
+
+@app.exception_handler(InputQueueFull)
+async def input_queue_full(request: Request, exc: InputQueueFull) -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                        content={"detail": str(exc)})
+
+
 # ── state ─────────────────────────────────────────────────────────────────────
 
 @app.get(
@@ -62,55 +120,98 @@ def _client() -> AIBridgeClient:
     summary="Full desktop state snapshot",
     description=(
         "Returns all open windows, the focused window id, workspace list, "
-        "and screen resolution in a single call.  Ideal as context for an LLM."
+        "monitor geometry and screen resolution in a single call.  Ideal as "
+        "context for an LLM.  Served from the signal-driven state cache "
+        "unless strict=true."
+    ),
+)
+async def get_state(strict: bool = False) -> ScreenState:
+    c = await _client()
+    snap = await c.get_desktop_state_async(strict)
+    if snap["screen_width"] is None:
+        snap["screen_width"], snap["screen_height"] = await ic.get_screen_size_async()
+    with metrics.MODEL_BUILD.time("ScreenState"):
+        return ScreenState(**snap, state_version=c.state_version)
+
+
+# ── events ────────────────────────────────────────────────────────────────────
+
+@app.get(
+    "/events",
+    summary="Server-Sent Events stream of desktop state changes",
+    description=(
+        "Pushes windows/focus/workspaces/monitors events as the extension "
+        "reports them.  Resume with ?since=<id> or Last-Event-ID; a "
+        "'resync' event means the resume point is gone and /state should "
+        "be refetched.  Slow consumers get an 'evicted' event and the "
+        "stream ends."
     ),
 )
-def get_state() -> ScreenState:
-    c = _client()
-    w, h = ic.get_screen_size()
-    return ScreenState(
-        windows=[WindowInfo(**win) for win in c.get_windows()],
-        focused_window_id=c.get_focused_window(),
-        workspaces=[WorkspaceInfo(**ws) for ws in c.get_workspaces()],
-        screen_width=w,
-        screen_height=h,
+async def events(
+    since: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None),
+) -> StreamingResponse:
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    await _client()   # make sure the signal receivers are registered
+    sub = bus.subscribe(since)
+
+    async def stream():
+        try:
+            async for frame in sub.sse():
+                yield frame
+        finally:
+            bus.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 # ── windows ───────────────────────────────────────────────────────────────────
 
 @app.get("/windows", response_model=List[WindowInfo], summary="List open windows")
-def list_windows() -> List[WindowInfo]:
-    return [WindowInfo(**w) for w in _client().get_windows()]
+async def list_windows(strict: bool = False) -> List[WindowInfo]:
+    c = await _client()
+    windows = await c.get_windows_async(strict)
+    with metrics.MODEL_BUILD.time("WindowInfo"):
+        return [WindowInfo(**w) for w in windows]
 
 
 @app.post("/windows/{window_id}/focus", response_model=SuccessResponse)
-def focus_window(window_id: int) -> SuccessResponse:
-    ok = _client().focus_window(window_id)
+async def focus_window(window_id: int) -> SuccessResponse:
+    c = await _client()
+    ok = await c.focus_window_async(window_id)
     return SuccessResponse(success=ok)
 
 
 @app.post("/windows/{window_id}/close", response_model=SuccessResponse)
-def close_window(window_id: int) -> SuccessResponse:
-    ok = _client().close_window(window_id)
+async def close_window(window_id: int) -> SuccessResponse:
+    c = await _client()
+    ok = await c.close_window_async(window_id)
     return SuccessResponse(success=ok)
 
 
 @app.post("/windows/{window_id}/minimize", response_model=SuccessResponse)
-def minimize_window(window_id: int) -> SuccessResponse:
-    ok = _client().minimize_window(window_id)
+async def minimize_window(window_id: int) -> SuccessResponse:
+    c = await _client()
+    ok = await c.minimize_window_async(window_id)
     return SuccessResponse(success=ok)
 
 
 @app.post("/windows/maximize", response_model=SuccessResponse)
-def maximize_window(req: MaximizeRequest) -> SuccessResponse:
-    ok = _client().maximize_window(req.window_id, req.maximize)
+async def maximize_window(req: MaximizeRequest) -> SuccessResponse:
+    c = await _client()
+    ok = await c.maximize_window_async(req.window_id, req.maximize)
     return SuccessResponse(success=ok)
 
 
 @app.post("/windows/move_resize", response_model=SuccessResponse)
-def move_resize_window(req: MoveResizeRequest) -> SuccessResponse:
-    ok = _client().move_resize_window(
+async def move_resize_window(req: MoveResizeRequest) -> SuccessResponse:
+    c = await _client()
+    ok = await c.move_resize_window_async(
         req.window_id, req.x, req.y, req.width, req.height)
     return SuccessResponse(success=ok)
 
@@ -118,78 +219,138 @@ def move_resize_window(req: MoveResizeRequest) -> SuccessResponse:
 # ── workspaces ────────────────────────────────────────────────────────────────
 
 @app.get("/workspaces", response_model=List[WorkspaceInfo])
-def list_workspaces() -> List[WorkspaceInfo]:
-    return [WorkspaceInfo(**ws) for ws in _client().get_workspaces()]
+async def list_workspaces(strict: bool = False) -> List[WorkspaceInfo]:
+    c = await _client()
+    workspaces = await c.get_workspaces_async(strict)
+    with metrics.MODEL_BUILD.time("WorkspaceInfo"):
+        return [WorkspaceInfo(**ws) for ws in workspaces]
 
 
 @app.post("/workspaces/{index}/switch", response_model=SuccessResponse)
-def switch_workspace(index: int) -> SuccessResponse:
-    ok = _client().switch_workspace(index)
+async def switch_workspace(index: int) -> SuccessResponse:
+    c = await _client()
+    ok = await c.switch_workspace_async(index)
     return SuccessResponse(success=ok)
 
 
 # ── app launch ────────────────────────────────────────────────────────────────
 
 @app.post("/apps/launch", response_model=SuccessResponse)
-def launch_app(req: LaunchAppRequest) -> SuccessResponse:
-    ok = _client().launch_app(req.command)
+async def launch_app(req: LaunchAppRequest) -> SuccessResponse:
+    c = await _client()
+    ok = await c.launch_app_async(req.command)
     return SuccessResponse(success=ok)
 
 
 # ── mouse ─────────────────────────────────────────────────────────────────────
 
 @app.post("/input/mouse/move", response_model=SuccessResponse)
-def mouse_move(x: int, y: int) -> SuccessResponse:
-    return SuccessResponse(success=ic.mouse_move(x, y))
+async def mouse_move(x: int, y: int, origin: Origin = Depends(_origin)) -> SuccessResponse:
+    return SuccessResponse(success=await ic.run_async(
+        ic.mouse_move_ops(x, y), "mouse_move", origin))
 
 
 @app.post("/input/mouse/click", response_model=SuccessResponse)
-def mouse_click(req: MouseClickRequest) -> SuccessResponse:
-    return SuccessResponse(success=ic.mouse_click(req.x, req.y, req.button))
+async def mouse_click(req: MouseClickRequest,
+                      origin: Origin = Depends(_origin)) -> SuccessResponse:
+    return SuccessResponse(success=await ic.run_async(
+        ic.mouse_click_ops(req.x, req.y, req.button), "mouse_click", origin))
 
 
 @app.post("/input/mouse/double_click", response_model=SuccessResponse)
-def mouse_double_click(req: MouseClickRequest) -> SuccessResponse:
-    return SuccessResponse(success=ic.mouse_double_click(req.x, req.y))
+async def mouse_double_click(req: MouseClickRequest,
+                             origin: Origin = Depends(_origin)) -> SuccessResponse:
+    return SuccessResponse(success=await ic.run_async(
+        ic.mouse_double_click_ops(req.x, req.y), "mouse_double_click", origin))
 
 
 @app.post("/input/mouse/drag", response_model=SuccessResponse)
-def mouse_drag(req: MouseDragRequest) -> SuccessResponse:
-    return SuccessResponse(
-        success=ic.mouse_drag(req.x1, req.y1, req.x2, req.y2))
+async def mouse_drag(req: MouseDragRequest,
+                     origin: Origin = Depends(_origin)) -> SuccessResponse:
+    return SuccessResponse(success=await ic.run_async(
+        ic.mouse_drag_ops(req.x1, req.y1, req.x2, req.y2), "mouse_drag", origin))
 
 
 @app.post("/input/mouse/scroll", response_model=SuccessResponse)
-def scroll(req: ScrollRequest) -> SuccessResponse:
-    return SuccessResponse(
-        success=ic.scroll(req.x, req.y, req.direction, req.clicks))
+async def scroll(req: ScrollRequest, origin: Origin = Depends(_origin)) -> SuccessResponse:
+    return SuccessResponse(success=await ic.run_async(
+        ic.scroll_ops(req.x, req.y, req.direction, req.clicks), "scroll", origin))
 
 
 # ── keyboard ──────────────────────────────────────────────────────────────────
 
 @app.post("/input/keyboard/key", response_model=SuccessResponse)
-def key_press(req: KeyPressRequest) -> SuccessResponse:
-    return SuccessResponse(success=ic.key_press(*req.keys))
+async def key_press(req: KeyPressRequest,
+                    origin: Origin = Depends(_origin)) -> SuccessResponse:
+    return SuccessResponse(success=await ic.run_async(
+        ic.key_press_ops(*req.keys), "key_press", origin))
 
 
 @app.post("/input/keyboard/type", response_model=SuccessResponse)
-def type_text(req: TypeTextRequest) -> SuccessResponse:
-    return SuccessResponse(success=ic.type_text(req.text, req.delay_ms))
+async def type_text(req: TypeTextRequest,
+                    origin: Origin = Depends(_origin)) -> SuccessResponse:
+    return SuccessResponse(success=await ic.enter_text_async(
+        _client, req.text, req.delay_ms, req.strategy, origin=origin))
 
 
 @app.post("/input/keyboard/focus_type", response_model=SuccessResponse)
-def focus_and_type(req: FocusTypeRequest) -> SuccessResponse:
-    return SuccessResponse(success=ic.focus_and_type(req.xid, req.text))
+async def focus_and_type(req: FocusTypeRequest,
+                         origin: Origin = Depends(_origin)) -> SuccessResponse:
+    return SuccessResponse(success=await ic.enter_text_async(
+        _client, req.text, req.delay_ms, req.strategy, xid=req.xid, origin=origin))
 
 
 @app.post("/input/keyboard/focus_key", response_model=SuccessResponse)
-def focus_and_key(req: FocusKeyRequest) -> SuccessResponse:
-    return SuccessResponse(success=ic.focus_and_key(req.xid, *req.keys))
+async def focus_and_key(req: FocusKeyRequest,
+                        origin: Origin = Depends(_origin)) -> SuccessResponse:
+    return SuccessResponse(success=await ic.run_async(
+        ic.focus_and_key_ops(req.xid, *req.keys), "focus_and_key", origin))
+
+
+# ── batch ─────────────────────────────────────────────────────────────────────
+
+@app.post(
+    "/actions/batch",
+    response_model=BatchResponse,
+    summary="Run an ordered list of actions in one request",
+    description=(
+        "Steps use the agent's action vocabulary.  Returns one result per "
+        "step; consecutive input steps run in a single backend invocation "
+        "unless merge=false."
+    ),
+)
+async def actions_batch(req: BatchRequest,
+                        origin: Origin = Depends(_origin)) -> BatchResponse:
+    try:
+        return await run_batch(req, _client, origin)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
 
 
 # ── health ────────────────────────────────────────────────────────────────────
 
 @app.get("/health")
-def health() -> dict:
+async def health() -> dict:
     c = AIBridgeClient.instance()
     return {"status": "ok", "dbus_connected": c.connected}
+
+
+# ── metrics ───────────────────────────────────────────────────────────────────
+
+if settings.metrics:
+    @app.get(
+        "/metrics",
+        response_class=PlainTextResponse,
+        summary="Prometheus metrics",
+        description=(
+            "Per-route request counts and latency, per-method DBus latency, "
+            "per-primitive input latency, reconnects and queue depths in the "
+            "Prometheus text format."
+        ),
+    )
+    async def get_metrics() -> PlainTextResponse:
+        pool = anyio.to_thread.current_default_thread_limiter().statistics()
+        metrics.THREADPOOL_BUSY.set(pool.borrowed_tokens)
+        metrics.THREADPOOL_WAITING.set(pool.tasks_waiting)
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
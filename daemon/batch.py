@@ -0,0 +1,184 @@
+"""
+daemon/batch.py
+Executor behind POST /actions/batch.
+
+Every action is validated up front with the same request models the
+single-action endpoints use, so a malformed batch is rejected before
+anything runs.  Each step becomes either a list of input ops or an
+async call: a DBus call, a wait, or text entry that pastes through the
+clipboard (see input_controller.enter_text_async).  With merge enabled,
+runs of consecutive input steps with no pause between them go to the
+input backend in a single invocation.  Input groups are submitted to
+the input scheduler under the caller's Origin, so a batch's groups stay
+in order relative to the client's other input.  A group that finds the
+client's queue full fails like any other step.
+
+Pauses and waits are awaited here, never sent to the backend as sleep
+ops: the scheduler has a single thread, and a sleeping job would hold
+up every other client's input.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from daemon import input_controller as ic
+from daemon.input_controller import ClientFactory
+from daemon.input_backend import Op
+from daemon.input_scheduler import InputQueueFull, Origin
+from daemon.models import (
+    BatchAction, BatchRequest, BatchResponse, BatchStepResult,
+    FocusKeyRequest, FocusTypeRequest, KeyPressRequest, LaunchAppRequest,
+    MaximizeRequest, MouseClickRequest, MouseDragRequest, MoveResizeRequest,
+    ScrollRequest, TypeTextRequest, WaitRequest,
+)
+
+AsyncCall = Callable[[ClientFactory], Awaitable[bool]]
+
+
+def _dbus(method: str, *args) -> AsyncCall:
+    """AsyncCall for one AIBridgeClient *_async method."""
+    async def call(client: ClientFactory) -> bool:
+        return await getattr(await client(), method)(*args)
+    return call
+
+
+def _wait(seconds: float) -> AsyncCall:
+    async def call(client: ClientFactory) -> bool:
+        await asyncio.sleep(seconds)
+        return True
+    return call
+
+
+def _plan(action: BatchAction,
+          origin: Origin) -> Tuple[Optional[List[Op]], Optional[AsyncCall]]:
+    """Translate one action into (input ops, None) or (None, async call)."""
+    p = action.model_extra or {}
+    t = action.type
+
+    # ── input ────────────────────────────────────────────────────────────
+    if t == "wait":
+        return None, _wait(WaitRequest(**p).ms / 1000)
+    if t == "mouse_move":
+        r = MouseClickRequest(**p)
+        return ic.mouse_move_ops(r.x, r.y), None
+    if t == "mouse_click":
+        r = MouseClickRequest(**p)
+        return ic.mouse_click_ops(r.x, r.y, r.button), None
+    if t == "mouse_double_click":
+        r = MouseClickRequest(**p)
+        return ic.mouse_double_click_ops(r.x, r.y), None
+    if t == "mouse_drag":
+        r = MouseDragRequest(**p)
+        return ic.mouse_drag_ops(r.x1, r.y1, r.x2, r.y2), None
+    if t == "scroll":
+        r = ScrollRequest(**p)
+        return ic.scroll_ops(r.x, r.y, r.direction, r.clicks), None
+    if t == "hotkey":
+        r = KeyPressRequest(**p)
+        return ic.key_press_ops(*r.keys), None
+    if t in ("type_text", "focus_type"):
+        r = TypeTextRequest(**p) if t == "type_text" else FocusTypeRequest(**p)
+        xid = getattr(r, "xid", None)
+        if ic.wants_paste(r.text, r.strategy):
+            return None, lambda c: ic.enter_text_async(
+                c, r.text, r.delay_ms, r.strategy, xid=xid, origin=origin)
+        if xid is None:
+            return ic.type_text_ops(r.text, r.delay_ms), None
+        return ic.focus_and_type_ops(xid, r.text, r.delay_ms), None
+    if t == "focus_key":
+        r = FocusKeyRequest(**p)
+        return ic.focus_and_key_ops(r.xid, *r.keys), None
+
+    # ── DBus ─────────────────────────────────────────────────────────────
+    if t == "launch":
+        cmd = LaunchAppRequest(**p).command
+        return None, _dbus("launch_app_async", cmd)
+    if t in ("focus_window", "close_window", "minimize_window"):
+        wid = int(p["window_id"])
+        return None, _dbus(f"{t}_async", wid)
+    if t == "maximize_window":
+        r = MaximizeRequest(**p)
+        return None, _dbus("maximize_window_async", r.window_id, r.maximize)
+    if t == "move_resize":
+        r = MoveResizeRequest(**p)
+        return None, _dbus("move_resize_window_async",
+                           r.window_id, r.x, r.y, r.width, r.height)
+    if t == "switch_workspace":
+        index = int(p["index"])
+        return None, _dbus("switch_workspace_async", index)
+
+    raise ValueError(f"unsupported action type: {t}")
+
+
+async def run_batch(req: BatchRequest, client: ClientFactory,
+                    origin: Origin = Origin()) -> BatchResponse:
+    """Run a batch.  Raises ValueError if any action fails validation."""
+    t0 = time.monotonic()
+    n = len(req.actions)
+
+    plans = []
+    for i, action in enumerate(req.actions):
+        try:
+            plans.append(_plan(action, origin))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"actions[{i}] ({action.type}): {e}") from e
+
+    def delay_after(i: int) -> float:
+        if i == n - 1:
+            return 0.0
+        ms = req.actions[i].pause_ms
+        return (req.step_delay_ms if ms is None else ms) / 1000
+
+    # Partition into groups: consecutive input steps merge when allowed
+    # and there is no pause between them
+    groups: List[List[int]] = []
+    for i, (ops, _) in enumerate(plans):
+        prev = groups[-1][-1] if groups else None
+        if (req.merge and ops is not None and prev is not None
+                and plans[prev][0] is not None and delay_after(prev) == 0):
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+
+    results: List[BatchStepResult] = []
+    failed = False
+    for gid, idxs in enumerate(groups):
+        merged_failure = False
+        if failed and req.stop_on_failure:
+            ok, detail = False, "skipped"
+        elif plans[idxs[0]][0] is not None:
+            ops: List[Op] = [op for i in idxs for op in plans[i][0]]
+            try:
+                ok = await ic.run_async(ops, "batch", origin)
+                merged_failure = not ok and len(idxs) > 1
+                detail = None if ok else (
+                    f"merged input group failed (steps {idxs[0]}-{idxs[-1]})"
+                    if merged_failure else "input backend failed")
+            except InputQueueFull as e:
+                # Earlier groups already ran: report it per step, not as a 429
+                ok, detail = False, str(e)
+        else:
+            i = idxs[0]
+            try:
+                ok, detail = bool(await plans[i][1](client)), None
+            except Exception as e:
+                ok, detail = False, str(getattr(e, "detail", e))
+        # No pause before steps that will be skipped
+        if (ok or not req.stop_on_failure) and delay_after(idxs[-1]) > 0:
+            await asyncio.sleep(delay_after(idxs[-1]))
+        failed = failed or not ok
+        # The backend reports one result per invocation: a failed merged
+        # group's first step carries the failure, the rest are "unknown"
+        results += [
+            BatchStepResult(index=i, type=req.actions[i].type, success=ok,
+                            detail="unknown" if merged_failure and k else detail,
+                            group=gid)
+            for k, i in enumerate(idxs)
+        ]
+
+    return BatchResponse(
+        success=not failed,
+        results=results,
+        elapsed_ms=(time.monotonic() - t0) * 1000,
+    )
@@ -0,0 +1,43 @@
+"""
+daemon/config.py
+Runtime settings for the daemon, read once from the environment.
+
+uvicorn imports daemon.api by module path, so the settings live in a
+module-level singleton rather than being passed in from run_daemon.py.
+"""
+
+from dataclasses import dataclass
+import os
+
+
+@dataclass
+class DaemonConfig:
+    # ── listen ───────────────────────────────────────────────────────────
+    host: str = os.getenv("DAEMON_HOST", "127.0.0.1")
+    port: int = int(os.getenv("DAEMON_PORT", "7070"))
+    uds: str = os.getenv("DAEMON_UDS", "")
+    # uds: 额外监听的 Unix 域套接字路径（如 $XDG_RUNTIME_DIR/gnome-ai-daemon.sock），
+    # 权限 0600；DAEMON_HOST 置空则只监听该套接字
+
+    # ── DBus state cache ─────────────────────────────────────────────────
+    state_cache: bool = os.getenv("STATE_CACHE", "1") != "0"
+    state_cache_max_age: float = float(os.getenv("STATE_CACHE_MAX_AGE", "1.0"))
+    # state_cache_max_age: 缓存条目的最长寿命（秒）；仅对不发 WindowsDelta 的旧版扩展
+    # 生效（旧版不为焦点/工作区变化发信号）。<= 0 表示只依赖信号失效。
+
+    # ── input ────────────────────────────────────────────────────────────
+    input_backend: str = os.getenv("INPUT_BACKEND", "auto")
+    # input_backend: auto | xtest | xdotool（auto 优先用进程内 XTest，失败回退 xdotool）
+    input_queue_max: int = int(os.getenv("INPUT_QUEUE_MAX", "64"))
+    # input_queue_max: 每个客户端（X-Client-Id）在输入调度器中最多排队的任务数，超出返回 429
+    paste_min_chars: int = int(os.getenv("TEXT_PASTE_MIN_CHARS", "32"))
+    clipboard_restore_delay: float = float(os.getenv("CLIPBOARD_RESTORE_DELAY", "0.3"))
+    # paste_min_chars: strategy=auto 时文本达到该长度（或含非 ASCII 字符）改用剪贴板粘贴
+    # clipboard_restore_delay: 粘贴后等待目标程序读取剪贴板再恢复原内容的秒数；0 表示不恢复
+
+    # ── observability ────────────────────────────────────────────────────
+    metrics: bool = os.getenv("DAEMON_METRICS", "1") != "0"
+    # metrics: 提供 GET /metrics（Prometheus 文本格式）并统计每个路由的延迟
+
+
+settings = DaemonConfig()
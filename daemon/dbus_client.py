@@ -4,21 +4,80 @@ Singleton wrapper around the org.gnome.AIBridge DBus service
 exposed by the GNOME Shell extension.
 
 Falls back gracefully when the extension is not loaded.
+
+Reads are served from an in-memory state cache.  The cache is filled by
+live reads and by the extension's signals, invalidated by our own
+window/workspace actions and by the extension going away, and carries a
+monotonically increasing state version.  Pass strict=True to bypass it
+and read live over DBus.
+
+Extensions that emit WindowsDelta keep the cache as a mirror: each delta
+is applied in place, and a gap in its sequence numbers triggers a full
+resync through GetDesktopState.  Older extensions only send
+WindowsChanged, so entries there also expire after STATE_CACHE_MAX_AGE.
+
+Every query and action also has an *_async form for the FastAPI event
+loop: the call is sent without blocking and its reply is delivered
+through the GLib main loop, so slow GNOME Shell responses never tie up
+a worker thread.
 """
 
+import asyncio
 import json
 import threading
-from typing import Any, Callable, Dict, List, Optional
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import dbus
 import dbus.mainloop.glib
 
-# One-time GLib main loop integration for dbus-python
+from daemon import metrics
+from daemon.config import settings
+
+# One-time GLib main loop integration for dbus-python.  Async calls are
+# issued from the asyncio thread while replies and signals are dispatched
+# on the GLib thread, so libdbus must be in thread-safe mode.
+dbus.mainloop.glib.threads_init()
 dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
 
 DBUS_NAME   = "org.gnome.AIBridge"
 DBUS_PATH   = "/org/gnome/AIBridge"
 DBUS_IFACE  = "org.gnome.AIBridge"
+DBUS_TIMEOUT = 5.0   # seconds, for async calls
+# A failed resync is retried no sooner than this, doubling up to the max
+RESYNC_BACKOFF_MIN = 0.5
+RESYNC_BACKOFF_MAX = 30.0
+
+# Field order of the window struct in GetDesktopState's "windows" array
+_WINDOW_FIELDS = (
+    ("id", int), ("xid", int), ("title", str), ("wm_class", str),
+    ("pid", int), ("focused", bool), ("minimized", bool),
+    ("maximized", bool), ("workspace", int),
+    ("x", int), ("y", int), ("width", int), ("height", int),
+)
+_MONITOR_FIELDS = (
+    ("index", int), ("x", int), ("y", int),
+    ("width", int), ("height", int), ("primary", bool),
+)
+
+# Cache keys that together make up a full desktop snapshot
+_SNAPSHOT_KEYS = ("windows", "focused", "workspaces", "monitors", "screen")
+
+
+_FIELD_TYPES = dict(_WINDOW_FIELDS)
+
+
+def _unpack_struct(fields, values) -> Dict[str, Any]:
+    return {name: conv(v) for (name, conv), v in zip(fields, values)}
+
+
+def _unpack_window_dict(d) -> Dict[str, Any]:
+    return {str(k): _FIELD_TYPES[str(k)](v) for k, v in d.items()
+            if str(k) in _FIELD_TYPES}
+
+
+def _unpack_workspaces(values) -> List[Dict[str, Any]]:
+    return [{"index": int(i), "active": bool(a)} for i, a in values]
 
 
 class AIBridgeClient:
@@ -38,22 +97,69 @@ class AIBridgeClient:
         self._proxy: Optional[dbus.Interface] = None
         self._bus:   Optional[dbus.SessionBus] = None
         self._window_change_callbacks: List[Callable] = []
+        self._window_delta_callbacks: List[Callable] = []
+        self._resync_callbacks: List[Callable] = []
+        # Unique bus name of the extension; None until watch_name_owner's
+        # first report, which describes the current owner, not a change
+        self._owner: Optional[str] = None
+        self._subscribed = False
+        self._has_desktop_state = True   # False for extensions predating it
+        self._has_clipboard = True       # likewise for Get/SetClipboard
+
+        # key -> (value, monotonic time it was stored)
+        self._cache: Dict[str, Tuple[Any, float]] = {}
+        self._cache_lock = threading.Lock()
+        self._version = 0
+
+        # Last WindowsDelta seq reflected in the cache; None until the
+        # extension has told us it emits deltas.  _mirror_lock orders
+        # delta application against snapshot refills; it is only held to
+        # swap data in, never across a DBus call.
+        self._seq: Optional[int] = None
+        self._mirror_lock = threading.RLock()
+        # Deltas received while a resync's snapshot is in flight, or None
+        # when no resync is running
+        self._held_deltas: Optional[List[Dict[str, Any]]] = None
+        # No resync before this monotonic time; the delay doubles per failure
+        self._resync_at = 0.0
+        self._resync_delay = 0.0
 
     # ── connection ──────────────────────────────────────────────────────────
 
     def connect(self) -> None:
+        try:
+            self._connect()
+        except Exception:
+            metrics.DBUS_CONNECTS.inc("error")
+            raise
+        metrics.DBUS_CONNECTS.inc("ok")
+
+    def _connect(self) -> None:
         self._bus   = dbus.SessionBus()
         obj         = self._bus.get_object(DBUS_NAME, DBUS_PATH)
         self._proxy = dbus.Interface(obj, dbus_interface=DBUS_IFACE)
-
-        # Subscribe to WindowsChanged signal
-        self._bus.add_signal_receiver(
-            self._on_windows_changed,
-            signal_name="WindowsChanged",
-            dbus_interface=DBUS_IFACE,
-            bus_name=DBUS_NAME,
-            path=DBUS_PATH,
-        )
+        self._has_desktop_state = True
+        self._has_clipboard = True
+        self._seq = None
+        self.invalidate()
+
+        if self._subscribed:
+            return
+        self._subscribed = True
+
+        # Drop cached state whenever the extension (re)appears or goes away
+        self._bus.watch_name_owner(DBUS_NAME, self._on_name_owner_changed)
+
+        # Subscribe to WindowsChanged / WindowsDelta signals
+        for name, handler in (("WindowsChanged", self._on_windows_changed),
+                              ("WindowsDelta",   self._on_windows_delta)):
+            self._bus.add_signal_receiver(
+                handler,
+                signal_name=name,
+                dbus_interface=DBUS_IFACE,
+                bus_name=DBUS_NAME,
+                path=DBUS_PATH,
+            )
 
     @property
     def connected(self) -> bool:
@@ -65,62 +171,512 @@ class AIBridgeClient:
             self.connect()
         return self._proxy  # type: ignore
 
-    # ── window queries ──────────────────────────────────────────────────────
+    # ── state cache ─────────────────────────────────────────────────────────
+
+    @property
+    def delta_capable(self) -> bool:
+        """True once the extension is known to emit WindowsDelta."""
+        return self._seq is not None
+
+    @property
+    def state_version(self) -> int:
+        """Bumped every time the cached desktop state changes."""
+        return self._version
+
+    def invalidate(self, *keys: str) -> None:
+        """Drop the given cache entries (all of them when called bare)."""
+        with self._cache_lock:
+            if not keys:
+                keys = tuple(self._cache)
+            dropped = [k for k in keys if self._cache.pop(k, None) is not None]
+            if dropped:
+                self._version += 1
+
+    def _cache_get(self, key: str) -> Optional[Any]:
+        if not settings.state_cache:
+            return None
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            max_age = settings.state_cache_max_age
+            expires = max_age > 0 and self._seq is None
+            if expires and time.monotonic() - stored_at > max_age:
+                del self._cache[key]
+                return None
+            return value
+
+    def _cache_put(self, key: str, value: Any) -> None:
+        with self._cache_lock:
+            old = self._cache.get(key)
+            self._cache[key] = (value, time.monotonic())
+            if old is None or old[0] != value:
+                self._version += 1
+
+    # ── DBus calls ──────────────────────────────────────────────────────────
+    # All calls go through _call/_call_async, which time them per method.
+
+    def _call(self, method: str, *args: Any) -> Any:
+        with metrics.dbus_call(method):
+            return getattr(self._require(), method)(*args)
+
+    async def _call_async(self, method: str, *args: Any) -> Any:
+        """Non-blocking DBus call; the reply arrives via the GLib main loop.
+
+        Needs the GLib loop that run_daemon.py runs in a background thread.
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        def settle(result: Any = None, error: Optional[BaseException] = None) -> None:
+            if fut.done():
+                return      # the awaiting handler was cancelled
+            if error is not None:
+                fut.set_exception(error)
+            else:
+                fut.set_result(result)
+
+        with metrics.dbus_call(method):
+            getattr(self._require(), method)(
+                *args,
+                reply_handler=lambda *r: loop.call_soon_threadsafe(
+                    settle, r[0] if len(r) == 1 else r),
+                error_handler=lambda e: loop.call_soon_threadsafe(settle, None, e),
+                timeout=DBUS_TIMEOUT,
+            )
+            return await fut
+
+    def _action(self, method: str, args: Tuple, *invalidates: str) -> bool:
+        ok = bool(self._call(method, *args))
+        if invalidates:
+            self.invalidate(*invalidates)
+        return ok
+
+    async def _action_async(self, method: str, args: Tuple, *invalidates: str) -> bool:
+        ok = bool(await self._call_async(method, *args))
+        if invalidates:
+            self.invalidate(*invalidates)
+        return ok
+
+    def _store_live(self, key: str, value: Any, seq: Optional[int]) -> None:
+        """Cache the result of a live read that started at mirror seq `seq`.
+
+        The JSON methods carry no seq of their own: if the mirror moved on
+        while the call was in flight, the result may predate it and is
+        not cached.
+        """
+        with self._mirror_lock:
+            if self._seq is None or self._seq == seq:
+                self._cache_put(key, value)
+
+    def _store_json(self, key: str, raw: Any, seq: Optional[int]) -> Any:
+        data = json.loads(str(raw))
+        self._store_live(key, data, seq)
+        return list(data)
+
+    # ── desktop snapshot ────────────────────────────────────────────────────
+
+    def get_desktop_state(self, strict: bool = False) -> Dict[str, Any]:
+        """Windows, focus, workspaces and monitor geometry in one snapshot.
+
+        Uses the extension's GetDesktopState (one round-trip, typed DBus
+        data) and falls back to the individual JSON methods on extensions
+        that predate it; screen_width/height are then None.
+        """
+        cached = None if strict else self._cached_snapshot()
+        if cached is not None:
+            return cached
+
+        if self._has_desktop_state:
+            try:
+                raw = self._call("GetDesktopState")
+                with self._mirror_lock:
+                    return self._snapshot(*self._fill_from_desktop_state(raw))
+            except dbus.exceptions.DBusException as e:
+                self._check_unknown_method(e)
+
+        return self._snapshot(
+            self.get_windows(strict),
+            self.get_focused_window(strict),
+            self.get_workspaces(strict),
+            [], (None, None),
+        )
+
+    async def get_desktop_state_async(self, strict: bool = False) -> Dict[str, Any]:
+        cached = None if strict else self._cached_snapshot()
+        if cached is not None:
+            return cached
+
+        if self._has_desktop_state:
+            try:
+                raw = await self._call_async("GetDesktopState")
+                with self._mirror_lock:
+                    return self._snapshot(*self._fill_from_desktop_state(raw))
+            except dbus.exceptions.DBusException as e:
+                self._check_unknown_method(e)
+
+        return self._snapshot(
+            await self.get_windows_async(strict),
+            await self.get_focused_window_async(strict),
+            await self.get_workspaces_async(strict),
+            [], (None, None),
+        )
+
+    def _check_unknown_method(self, e: "dbus.exceptions.DBusException") -> None:
+        """Remember an extension without GetDesktopState; re-raise anything else."""
+        if e.get_dbus_name() != "org.freedesktop.DBus.Error.UnknownMethod":
+            raise e
+        self._has_desktop_state = False
+
+    def _cached_snapshot(self) -> Optional[Dict[str, Any]]:
+        cached = [self._cache_get(k) for k in _SNAPSHOT_KEYS]
+        if all(v is not None for v in cached):
+            return self._snapshot(*cached)
+        return None
+
+    def _fill_from_desktop_state(self, raw: Dict[str, Any]) -> Tuple:
+        windows    = [_unpack_struct(_WINDOW_FIELDS, w) for w in raw["windows"]]
+        focused    = int(raw["focused_window_id"])
+        workspaces = _unpack_workspaces(raw["workspaces"])
+        monitors   = [_unpack_struct(_MONITOR_FIELDS, m) for m in raw["monitors"]]
+        screen     = (int(raw["screen_width"]), int(raw["screen_height"]))
+        values     = (windows, focused, workspaces, monitors, screen)
+
+        seq = int(raw["seq"]) if "seq" in raw else None
+        if seq is not None and self._seq is not None and seq < self._seq:
+            return values   # a newer delta already landed; keep the mirror
+        for key, value in zip(_SNAPSHOT_KEYS, values):
+            self._cache_put(key, value)
+        if seq is not None:
+            self._seq = seq
+        return values
+
+    @staticmethod
+    def _snapshot(windows, focused, workspaces, monitors, screen) -> Dict[str, Any]:
+        return {
+            "windows":           list(windows),
+            "focused_window_id": focused,
+            "workspaces":        list(workspaces),
+            "monitors":          list(monitors),
+            "screen_width":      screen[0],
+            "screen_height":     screen[1],
+        }
 
-    def get_windows(self) -> List[Dict[str, Any]]:
-        raw = str(self._require().GetWindows())
-        return json.loads(raw)
+    # ── window queries ──────────────────────────────────────────────────────
 
-    def get_focused_window(self) -> int:
-        return int(self._require().GetFocusedWindow())
+    def get_windows(self, strict: bool = False) -> List[Dict[str, Any]]:
+        cached = None if strict else self._cache_get("windows")
+        if cached is not None:
+            return list(cached)
+        seq = self._seq
+        return self._store_json("windows", self._call("GetWindows"), seq)
+
+    async def get_windows_async(self, strict: bool = False) -> List[Dict[str, Any]]:
+        cached = None if strict else self._cache_get("windows")
+        if cached is not None:
+            return list(cached)
+        seq = self._seq
+        return self._store_json("windows", await self._call_async("GetWindows"), seq)
+
+    def get_focused_window(self, strict: bool = False) -> int:
+        cached = None if strict else self._cache_get("focused")
+        if cached is not None:
+            return cached
+        seq = self._seq
+        fid = int(self._call("GetFocusedWindow"))
+        self._store_live("focused", fid, seq)
+        return fid
+
+    async def get_focused_window_async(self, strict: bool = False) -> int:
+        cached = None if strict else self._cache_get("focused")
+        if cached is not None:
+            return cached
+        seq = self._seq
+        fid = int(await self._call_async("GetFocusedWindow"))
+        self._store_live("focused", fid, seq)
+        return fid
 
     # ── window actions ──────────────────────────────────────────────────────
+    # Every action that changes window state drops the entries it affects,
+    # so a read right after it never sees the pre-action view while the
+    # extension's delta for the change is still in flight.  Each action has
+    # a blocking form and an *_async form sharing the same arguments.
 
     def focus_window(self, window_id: int) -> bool:
-        return bool(self._require().FocusWindow(dbus.UInt32(window_id)))
+        return self._action("FocusWindow", (dbus.UInt32(window_id),),
+                            "windows", "focused", "workspaces")
+
+    async def focus_window_async(self, window_id: int) -> bool:
+        return await self._action_async("FocusWindow", (dbus.UInt32(window_id),),
+                                        "windows", "focused", "workspaces")
 
     def close_window(self, window_id: int) -> bool:
-        return bool(self._require().CloseWindow(dbus.UInt32(window_id)))
+        return self._action("CloseWindow", (dbus.UInt32(window_id),),
+                            "windows", "focused")
+
+    async def close_window_async(self, window_id: int) -> bool:
+        return await self._action_async("CloseWindow", (dbus.UInt32(window_id),),
+                                        "windows", "focused")
+
+    @staticmethod
+    def _move_resize_args(window_id: int, x: int, y: int, width: int, height: int) -> Tuple:
+        return (dbus.UInt32(window_id),
+                dbus.Int32(x), dbus.Int32(y),
+                dbus.Int32(width), dbus.Int32(height))
 
     def move_resize_window(
         self, window_id: int, x: int, y: int, width: int, height: int
     ) -> bool:
-        return bool(self._require().MoveResizeWindow(
-            dbus.UInt32(window_id),
-            dbus.Int32(x), dbus.Int32(y),
-            dbus.Int32(width), dbus.Int32(height),
-        ))
+        return self._action("MoveResizeWindow", self._move_resize_args(
+            window_id, x, y, width, height), "windows")
+
+    async def move_resize_window_async(
+        self, window_id: int, x: int, y: int, width: int, height: int
+    ) -> bool:
+        return await self._action_async("MoveResizeWindow", self._move_resize_args(
+            window_id, x, y, width, height), "windows")
 
     def minimize_window(self, window_id: int) -> bool:
-        return bool(self._require().MinimizeWindow(dbus.UInt32(window_id)))
+        return self._action("MinimizeWindow", (dbus.UInt32(window_id),),
+                            "windows", "focused")
+
+    async def minimize_window_async(self, window_id: int) -> bool:
+        return await self._action_async("MinimizeWindow", (dbus.UInt32(window_id),),
+                                        "windows", "focused")
 
     def maximize_window(self, window_id: int, maximize: bool = True) -> bool:
-        return bool(self._require().MaximizeWindow(
-            dbus.UInt32(window_id), dbus.Boolean(maximize)))
+        return self._action("MaximizeWindow",
+                            (dbus.UInt32(window_id), dbus.Boolean(maximize)),
+                            "windows")
+
+    async def maximize_window_async(self, window_id: int, maximize: bool = True) -> bool:
+        return await self._action_async("MaximizeWindow",
+                                        (dbus.UInt32(window_id), dbus.Boolean(maximize)),
+                                        "windows")
 
     # ── workspace ───────────────────────────────────────────────────────────
 
-    def get_workspaces(self) -> List[Dict[str, Any]]:
-        raw = str(self._require().GetWorkspaces())
-        return json.loads(raw)
+    def get_workspaces(self, strict: bool = False) -> List[Dict[str, Any]]:
+        cached = None if strict else self._cache_get("workspaces")
+        if cached is not None:
+            return list(cached)
+        seq = self._seq
+        return self._store_json("workspaces", self._call("GetWorkspaces"), seq)
+
+    async def get_workspaces_async(self, strict: bool = False) -> List[Dict[str, Any]]:
+        cached = None if strict else self._cache_get("workspaces")
+        if cached is not None:
+            return list(cached)
+        seq = self._seq
+        return self._store_json("workspaces", await self._call_async("GetWorkspaces"), seq)
 
     def switch_workspace(self, index: int) -> bool:
-        return bool(self._require().SwitchWorkspace(dbus.Int32(index)))
+        return self._action("SwitchWorkspace", (dbus.Int32(index),),
+                            "windows", "focused", "workspaces")
+
+    async def switch_workspace_async(self, index: int) -> bool:
+        return await self._action_async("SwitchWorkspace", (dbus.Int32(index),),
+                                        "windows", "focused", "workspaces")
 
     # ── app launch ──────────────────────────────────────────────────────────
 
     def launch_app(self, command: str) -> bool:
-        return bool(self._require().LaunchApp(command))
+        return self._action("LaunchApp", (command,))
+
+    async def launch_app_async(self, command: str) -> bool:
+        return await self._action_async("LaunchApp", (command,))
+
+    # ── clipboard ───────────────────────────────────────────────────────────
+    # Both return None when the extension predates the clipboard methods.
+
+    @property
+    def clipboard_capable(self) -> bool:
+        """False once the extension is known to lack Get/SetClipboard."""
+        return self._has_clipboard
+
+    async def get_clipboard_async(self) -> Optional[str]:
+        """Text on the CLIPBOARD selection ("" when it holds no text)."""
+        try:
+            return str(await self._call_async("GetClipboard"))
+        except dbus.exceptions.DBusException as e:
+            self._check_clipboard_method(e)
+            return None
+
+    async def set_clipboard_async(self, text: str) -> Optional[bool]:
+        try:
+            return bool(await self._call_async("SetClipboard", text))
+        except dbus.exceptions.DBusException as e:
+            self._check_clipboard_method(e)
+            return None
+
+    def _check_clipboard_method(self, e: "dbus.exceptions.DBusException") -> None:
+        """Remember an extension without the clipboard methods; re-raise anything else."""
+        if e.get_dbus_name() != "org.freedesktop.DBus.Error.UnknownMethod":
+            raise e
+        self._has_clipboard = False
 
     # ── signals ─────────────────────────────────────────────────────────────
 
     def on_windows_changed(self, cb: Callable[[List[Dict]], None]) -> None:
         self._window_change_callbacks.append(cb)
 
-    def _on_windows_changed(self, windows_json: str) -> None:
-        data = json.loads(str(windows_json))
-        for cb in self._window_change_callbacks:
+    def on_windows_delta(self, cb: Callable[[Dict[str, Any]], None]) -> None:
+        """cb receives {seq, added, removed, changed, globals} as plain Python."""
+        self._window_delta_callbacks.append(cb)
+
+    def on_resync(self, cb: Callable[[str], None]) -> None:
+        """cb receives a reason whenever the mirror is dropped: a delta gap
+        or the extension restarting.  Deltas no longer describe the change
+        from what a listener has seen; it should refetch the state."""
+        self._resync_callbacks.append(cb)
+
+    def _fire(self, callbacks: List[Callable], payload: Any) -> None:
+        for cb in callbacks:
             try:
-                cb(data)
+                cb(payload)
             except Exception as e:
                 print(f"[dbus_client] signal callback error: {e}")
+
+    def _on_windows_changed(self, windows_json: str) -> None:
+        if self._seq is not None:
+            return      # the WindowsDelta path already covers this change
+        data = json.loads(str(windows_json))
+        # The signal carries the full list: refresh the cache from it and
+        # drop the focus entry, which usually moves with the new window.
+        self._cache_put("windows", data)
+        self.invalidate("focused")
+        self._fire(self._window_change_callbacks, data)
+
+    def _on_windows_delta(self, seq, added, removed, changed, globals_) -> None:
+        seq = int(seq)
+        delta = {
+            "seq":     seq,
+            "added":   [_unpack_window_dict(w) for w in added],
+            "removed": [int(i) for i in removed],
+            "changed": [_unpack_window_dict(w) for w in changed],
+            "globals": self._unpack_globals(globals_),
+        }
+        with self._mirror_lock:
+            if self._held_deltas is not None:
+                self._held_deltas.append(delta)     # applied after the resync
+            elif self._seq is not None and seq <= self._seq:
+                return      # already covered by a newer snapshot
+            elif self._seq is not None and seq == self._seq + 1:
+                self._apply_delta(delta)
+            else:
+                self._resync(seq)
+            windows = self._cache_get("windows")
+
+        self._fire(self._window_delta_callbacks, delta)
+        if windows is not None and (delta["added"] or delta["removed"]):
+            self._fire(self._window_change_callbacks, list(windows))
+
+    @staticmethod
+    def _unpack_globals(g) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        if "focused_window_id" in g:
+            out["focused_window_id"] = int(g["focused_window_id"])
+        if "workspaces" in g:
+            out["workspaces"] = _unpack_workspaces(g["workspaces"])
+        if "monitors" in g:
+            out["monitors"] = [_unpack_struct(_MONITOR_FIELDS, m) for m in g["monitors"]]
+        if "screen_width" in g:
+            out["screen"] = (int(g["screen_width"]), int(g["screen_height"]))
+        return out
+
+    def _apply_delta(self, delta: Dict[str, Any]) -> None:
+        """Apply a consecutive delta to the cached snapshot (mirror_lock held)."""
+        self._seq = delta["seq"]
+        g = delta["globals"]
+        if "focused_window_id" in g:
+            self._cache_put("focused", g["focused_window_id"])
+        for key in ("workspaces", "monitors", "screen"):
+            if key in g:
+                self._cache_put(key, g[key])
+
+        # Without a base list there is nothing to patch; the next read
+        # fetches a fresh snapshot, which carries its own seq.
+        windows = self._cache_get("windows")
+        if windows is None:
+            return
+        by_id = {w["id"]: w for w in windows}
+        for wid in delta["removed"]:
+            by_id.pop(wid, None)
+        for w in delta["added"]:
+            by_id[w["id"]] = w
+        for fields in delta["changed"]:
+            old = by_id.get(fields["id"])
+            if old is not None:
+                # Replace rather than mutate: readers may hold the old dict
+                by_id[fields["id"]] = {**old, **fields}
+        self._cache_put("windows", list(by_id.values()))
+
+    def _resync(self, seq: int) -> None:
+        """Sequence gap: drop the mirror and refetch it (mirror_lock held).
+
+        Runs on the GLib thread, so GetDesktopState is sent without
+        waiting for the reply; deltas arriving meanwhile are held and
+        applied on top of the snapshot.  After a failed refetch the next
+        one waits RESYNC_BACKOFF_MIN, doubling per failure; until then
+        the cache stays empty and reads go to the extension.
+        """
+        self.invalidate()
+        had, self._seq = self._seq, None
+        if had is not None:
+            self._fire(self._resync_callbacks, f"delta gap (have {had}, got {seq})")
+        if time.monotonic() < self._resync_at or not self._has_desktop_state:
+            return
+        print(f"[dbus_client] delta gap (have {had}, got {seq}); resyncing")
+        self._held_deltas = []
+        t0 = time.perf_counter()
+
+        def done(raw: Any = None, error: Optional[BaseException] = None) -> None:
+            metrics.DBUS_DURATION.observe(time.perf_counter() - t0, "GetDesktopState")
+            if error is not None:
+                metrics.DBUS_ERRORS.inc("GetDesktopState")
+            self._resync_done(raw, error)
+
+        try:
+            self._require().GetDesktopState(
+                reply_handler=done,
+                error_handler=lambda e: done(error=e),
+                timeout=DBUS_TIMEOUT,
+            )
+        except Exception as e:
+            done(error=e)
+
+    def _resync_done(self, raw: Any, error: Optional[BaseException]) -> None:
+        """Reply to a resync's GetDesktopState (GLib thread)."""
+        with self._mirror_lock:
+            held, self._held_deltas = self._held_deltas or [], None
+            if error is None:
+                try:
+                    self._fill_from_desktop_state(raw)
+                except (KeyError, TypeError, ValueError) as e:
+                    error = e
+            if error is None:
+                self._resync_delay = 0.0
+                for delta in held:
+                    if self._seq is not None and delta["seq"] == self._seq + 1:
+                        self._apply_delta(delta)
+                return
+            if (isinstance(error, dbus.exceptions.DBusException) and
+                    error.get_dbus_name() == "org.freedesktop.DBus.Error.UnknownMethod"):
+                self._has_desktop_state = False
+            self._resync_delay = min(RESYNC_BACKOFF_MAX,
+                                     max(RESYNC_BACKOFF_MIN, 2 * self._resync_delay))
+            self._resync_at = time.monotonic() + self._resync_delay
+        print(f"[dbus_client] resync failed: {error}; "
+              f"next attempt in {self._resync_delay:.1f}s")
+
+    def _on_name_owner_changed(self, owner: str) -> None:
+        # A restarted extension starts its sequence numbers over
+        first, self._owner = self._owner is None, str(owner)
+        with self._mirror_lock:
+            self._seq = None
+            self._resync_at = self._resync_delay = 0.0
+            self.invalidate()
+        if not first:
+            self._fire(self._resync_callbacks,
+                       "extension restarted" if owner else "extension went away")
@@ -0,0 +1,152 @@
+"""
+daemon/events.py
+In-process event bus behind GET /events (Server-Sent Events).
+
+AIBridgeClient signal callbacks run on the GLib thread and publish into
+the bus; every subscriber is an asyncio queue on the server's event loop.
+
+  * Each event gets a bus-wide, monotonically increasing id.  The last
+    HISTORY events are kept so a client can resume with ?since=<id> or
+    the Last-Event-ID header; if it fell too far behind, or its id is
+    ahead of the bus (it comes from before a daemon restart), it is sent
+    a "resync" event instead and should refetch GET /state.  "resync" is
+    also published when the daemon itself loses track of the desktop: a
+    gap in the extension's deltas or the extension restarting.
+  * Subscriber queues are bounded.  A consumer that lets its queue fill
+    up is evicted: its queue is dropped, it is sent a final "evicted"
+    event and the stream ends, so it can reconnect and resume.
+
+Event types: windows (added/removed/changed), focus, workspaces, monitors,
+resync, evicted.
+"""
+
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from daemon.dbus_client import AIBridgeClient
+
+HISTORY    = 1024   # events kept for resume
+QUEUE_SIZE = 256    # per-subscriber backlog before eviction
+HEARTBEAT  = 15.0   # seconds between keep-alive comments
+
+
+class Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, since: int):
+        self.loop      = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.evicted   = False
+        self.last_sent = since      # resume point handed out on eviction
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        """Enqueue an event; runs on the subscriber's loop."""
+        if self.evicted:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.evicted = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"id": self.last_sent, "event": "evicted",
+                                   "data": {"reason": "slow consumer"}})
+
+    async def sse(self) -> AsyncIterator[str]:
+        """Yield the subscription as SSE frames until evicted."""
+        while True:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            self.last_sent = event["id"]
+            yield (f"id: {event['id']}\nevent: {event['event']}\n"
+                   f"data: {json.dumps(event['data'], ensure_ascii=False)}\n\n")
+            if event["event"] == "evicted":
+                return
+
+
+class EventBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=HISTORY)
+        self._subs: List[Subscriber] = []
+
+    @property
+    def last_id(self) -> int:
+        return self._seq
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> None:
+        """Thread-safe: record an event and fan it out to subscribers."""
+        with self._lock:
+            self._seq += 1
+            event = {"id": self._seq, "event": event_type, "data": data}
+            self._history.append(event)
+            subs = list(self._subs)
+        for sub in subs:
+            sub.loop.call_soon_threadsafe(sub.offer, event)
+
+    def subscribe(self, since: Optional[int] = None) -> Subscriber:
+        """Register a subscriber on the running loop, replaying from `since`."""
+        with self._lock:
+            sub = Subscriber(asyncio.get_running_loop(),
+                             self._seq if since is None else min(since, self._seq))
+            replay: List[Dict[str, Any]] = []
+            if since is not None and since > self._seq:
+                replay = [{"id": self._seq, "event": "resync",
+                           "data": {"reason": "resume point from another daemon run"}}]
+            elif since is not None and since < self._seq:
+                oldest = self._history[0]["id"] if self._history else self._seq + 1
+                replay = [e for e in self._history if e["id"] > since]
+                if since + 1 < oldest or len(replay) >= QUEUE_SIZE:
+                    replay = [{"id": self._seq, "event": "resync",
+                               "data": {"reason": "resume point too old"}}]
+            for event in replay:
+                sub.queue.put_nowait(event)
+            self._subs.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+
+    # ── AIBridgeClient wiring ───────────────────────────────────────────────
+
+    def attach(self, client: AIBridgeClient) -> None:
+        def on_delta(delta: Dict[str, Any]) -> None:
+            base = {"state_version": client.state_version}
+            if delta["added"] or delta["removed"] or delta["changed"]:
+                self.publish("windows", {
+                    **base,
+                    "added":   delta["added"],
+                    "removed": delta["removed"],
+                    "changed": delta["changed"],
+                })
+            g = delta["globals"]
+            if "focused_window_id" in g:
+                self.publish("focus", {**base, "focused_window_id": g["focused_window_id"]})
+            if "workspaces" in g:
+                self.publish("workspaces", {**base, "workspaces": g["workspaces"]})
+            if "monitors" in g:
+                self.publish("monitors", {**base, "monitors": g["monitors"]})
+
+        def on_full_list(windows: List[Dict]) -> None:
+            # Extensions without WindowsDelta only send the full list
+            if not client.delta_capable:
+                self.publish("resync", {"state_version": client.state_version,
+                                        "reason": "window list changed"})
+
+        def on_resync(reason: str) -> None:
+            self.publish("resync", {"state_version": client.state_version,
+                                    "reason": reason})
+
+        client.on_windows_delta(on_delta)
+        client.on_windows_changed(on_full_list)
+        client.on_resync(on_resync)
+
+
+bus = EventBus()
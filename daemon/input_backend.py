@@ -0,0 +1,433 @@
+"""
+daemon/input_backend.py
+Pluggable input injection backends used by input_controller.
+
+Input is described as a list of primitive ops, named after the xdotool
+commands they mirror:
+
+    ("mousemove", x, y)          ("click", button, repeat)
+    ("mousedown", button)        ("mouseup", button)
+    ("key", (keystroke, ...))    ("type", text, delay_ms)
+    ("windowfocus", xid)         ("sleep", seconds)
+
+A backend runs a whole op list in one invocation and reports success as
+a bool, stopping at the first failing op.  The daemon calls run() only
+from the input scheduler's thread (daemon/input_scheduler.py).
+run_async() does the same without blocking the event loop, for callers
+outside the scheduler: xdotool uses asyncio subprocesses, and XTest runs
+on the backend's own single worker thread rather than the shared
+threadpool.
+
+  xtest    – in-process XTest via python-xlib over one persistent display
+             connection (no fork/exec per primitive)
+  xdotool  – the original subprocess path; chains ops into as few
+             xdotool invocations as possible
+
+Selected with INPUT_BACKEND=auto|xtest|xdotool (auto prefers xtest).
+"""
+
+import asyncio
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Sequence, Tuple
+
+from daemon import metrics
+from daemon.config import settings
+
+Op = Tuple[Any, ...]
+
+# xdotool's default --delay between repeated clicks; kept for parity
+CLICK_REPEAT_DELAY = 0.1
+
+
+class InputBackend:
+    """Base class: run a sequence of input ops."""
+
+    name = "base"
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"input-{self.name}")
+
+    def run(self, ops: Sequence[Op]) -> bool:
+        raise NotImplementedError
+
+    def screen_size(self) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    async def run_async(self, ops: Sequence[Op]) -> bool:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.run, ops)
+
+    async def screen_size_async(self) -> Tuple[int, int]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.screen_size)
+
+
+# ── xdotool (subprocess) ─────────────────────────────────────────────────────
+
+def _xdo(*args: str) -> bool:
+    """Run an xdotool command. Returns True on success."""
+    try:
+        with metrics.XDOTOOL_EXEC.time(args[0]):
+            subprocess.run(["xdotool", *args], check=True,
+                           capture_output=True, timeout=5)
+        return True
+    except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
+        print(f"[input] xdotool error: {e}")
+        return False
+
+
+async def _xdo_async(*args: str) -> bool:
+    """Non-blocking _xdo()."""
+    with metrics.XDOTOOL_EXEC.time(args[0]):
+        return await _xdo_exec(*args)
+
+
+async def _xdo_exec(*args: str) -> bool:
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "xdotool", *args,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+    except FileNotFoundError as e:
+        print(f"[input] xdotool error: {e}")
+        return False
+    try:
+        _, err = await asyncio.wait_for(proc.communicate(), timeout=5)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        print(f"[input] xdotool error: timed out: {' '.join(args)}")
+        return False
+    if proc.returncode != 0:
+        print(f"[input] xdotool error: exit {proc.returncode}: {err.decode().strip()}")
+        return False
+    return True
+
+
+def _xdo_args(op: Op) -> List[str]:
+    name, *args = op
+    if name == "mousemove":
+        x, y = args
+        return ["mousemove", "--sync", str(x), str(y)]
+    if name == "click":
+        button, repeat = args
+        if repeat > 1:
+            return ["click", "--repeat", str(repeat), str(button)]
+        return ["click", str(button)]
+    if name in ("mousedown", "mouseup"):
+        return [name, str(args[0])]
+    if name == "key":
+        return ["key", "--clearmodifiers", *args[0]]
+    if name == "type":
+        text, delay_ms = args
+        return ["type", "--clearmodifiers", "--delay", str(delay_ms), "--", text]
+    if name == "windowfocus":
+        return ["windowfocus", "--sync", str(args[0])]
+    if name == "sleep":
+        return ["sleep", f"{args[0]:g}"]
+    raise ValueError(f"unknown input op: {name}")
+
+
+class XdotoolBackend(InputBackend):
+    """Fork one xdotool process per chain of ops.
+
+    xdotool supports command chaining, but `key` and `type` swallow every
+    remaining argument, so a chain is cut after either of them.
+    """
+
+    name = "xdotool"
+
+    @staticmethod
+    def _chains(ops: Sequence[Op]) -> List[List[str]]:
+        chains: List[List[str]] = [[]]
+        for op in ops:
+            chains[-1] += _xdo_args(op)
+            if op[0] in ("key", "type"):
+                chains.append([])
+        return [c for c in chains if c]
+
+    def run(self, ops: Sequence[Op]) -> bool:
+        return all(_xdo(*chain) for chain in self._chains(ops))
+
+    async def run_async(self, ops: Sequence[Op]) -> bool:
+        for chain in self._chains(ops):
+            if not await _xdo_async(*chain):
+                return False
+        return True
+
+    def screen_size(self) -> Tuple[int, int]:
+        try:
+            out = subprocess.check_output(
+                ["xdotool", "getdisplaygeometry"], text=True, timeout=3)
+            w, h = out.strip().split()
+            return int(w), int(h)
+        except Exception:
+            return (1920, 1080)
+
+
+# ── XTest (in-process) ───────────────────────────────────────────────────────
+
+# xdotool accepts these lowercase aliases for modifier keys
+_KEY_ALIASES = {
+    "alt": "Alt_L", "ctrl": "Control_L", "control": "Control_L",
+    "shift": "Shift_L", "super": "Super_L", "meta": "Meta_L",
+}
+
+
+class XTestBackend(InputBackend):
+    """Inject input through the XTest extension on a persistent connection.
+
+    Mirrors xdotool semantics: key chords like "ctrl+shift+t", modifiers
+    held by the user are released around key/type ops (--clearmodifiers),
+    and characters without a keycode are typed through a scratch keycode
+    that is remapped on the fly.  A lost X connection (e.g. the session
+    restarted) is reopened and the call retried once.
+    """
+
+    name = "xtest"
+
+    def __init__(self):
+        from Xlib import X, XK
+        from Xlib.ext import xtest
+
+        super().__init__()
+        self._X, self._XK, self._xtest = X, XK, xtest
+        self._lock = threading.RLock()
+        self._open()
+
+    # ── plumbing ────────────────────────────────────────────────────────────
+
+    def _open(self) -> None:
+        from Xlib import display
+
+        self._d = display.Display()
+        if not self._d.has_extension("XTEST"):
+            self._d.close()
+            raise RuntimeError("X server lacks the XTEST extension")
+        self._root = self._d.screen().root
+        self._scratch = self._find_scratch_keycode()
+
+    def _reconnect(self, error: Exception) -> bool:
+        """Drop the dead display and open a new one; False if that fails."""
+        print(f"[input] X connection lost ({error}); reconnecting")
+        try:
+            self._d.close()
+        except Exception:
+            pass
+        try:
+            self._open()
+            return True
+        except Exception as e:
+            print(f"[input] xtest reconnect failed: {e}")
+            return False
+
+    def run(self, ops: Sequence[Op]) -> bool:
+        from Xlib.error import ConnectionClosedError, XError
+
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    for op in ops:
+                        if not getattr(self, f"_op_{op[0]}")(*op[1:]):
+                            return False
+                    self._d.sync()
+                    return True
+                except ConnectionClosedError as e:
+                    if attempt or not self._reconnect(e):
+                        print(f"[input] xtest error: {e}")
+                        return False
+                except (XError, ValueError) as e:
+                    print(f"[input] xtest error: {e}")
+                    return False
+            return False
+
+    def screen_size(self) -> Tuple[int, int]:
+        from Xlib.error import ConnectionClosedError
+
+        with self._lock:
+            try:
+                geom = self._root.get_geometry()
+            except ConnectionClosedError as e:
+                if not self._reconnect(e):
+                    raise
+                geom = self._root.get_geometry()
+            return int(geom.width), int(geom.height)
+
+    def _fake(self, event_type: int, detail: int = 0, **kw: Any) -> None:
+        self._xtest.fake_input(self._d, event_type, detail, **kw)
+
+    # ── mouse ───────────────────────────────────────────────────────────────
+
+    def _op_mousemove(self, x: int, y: int) -> bool:
+        self._fake(self._X.MotionNotify, x=int(x), y=int(y), root=self._root)
+        self._d.sync()
+        return True
+
+    def _op_click(self, button: int, repeat: int = 1) -> bool:
+        for i in range(repeat):
+            if i:
+                self._d.sync()
+                time.sleep(CLICK_REPEAT_DELAY)
+            self._fake(self._X.ButtonPress, int(button))
+            self._fake(self._X.ButtonRelease, int(button))
+        return True
+
+    def _op_mousedown(self, button: int) -> bool:
+        self._fake(self._X.ButtonPress, int(button))
+        return True
+
+    def _op_mouseup(self, button: int) -> bool:
+        self._fake(self._X.ButtonRelease, int(button))
+        return True
+
+    # ── keyboard ────────────────────────────────────────────────────────────
+
+    def _op_key(self, keys: Sequence[str]) -> bool:
+        held = self._release_held_modifiers()
+        try:
+            for chord in keys:
+                keysyms = [self._name_to_keysym(part) for part in chord.split("+")]
+                self._press_chord(keysyms)
+        finally:
+            self._restore_modifiers(held)
+            self._reset_scratch()
+        return True
+
+    def _op_type(self, text: str, delay_ms: int = 12) -> bool:
+        held = self._release_held_modifiers()
+        try:
+            for i, ch in enumerate(text):
+                if i and delay_ms:
+                    self._d.sync()
+                    time.sleep(delay_ms / 1000)
+                self._press_chord([self._char_to_keysym(ch)])
+        finally:
+            self._restore_modifiers(held)
+            self._reset_scratch()
+        return True
+
+    def _op_windowfocus(self, xid: int) -> bool:
+        win = self._d.create_resource_object("window", int(xid))
+        win.set_input_focus(self._X.RevertToParent, self._X.CurrentTime)
+        self._d.sync()
+        # --sync: wait until the focus actually lands on the window
+        deadline = time.monotonic() + 2.0
+        while time.monotonic() < deadline:
+            if self._d.get_input_focus().focus.id == int(xid):
+                return True
+            time.sleep(0.01)
+        return False
+
+    def _op_sleep(self, seconds: float) -> bool:
+        self._d.sync()
+        time.sleep(seconds)
+        return True
+
+    # ── keysym helpers ──────────────────────────────────────────────────────
+
+    def _name_to_keysym(self, name: str) -> int:
+        XK = self._XK
+        for candidate in (name, _KEY_ALIASES.get(name.lower(), ""),
+                          name.capitalize(), name.lower()):
+            if candidate:
+                sym = XK.string_to_keysym(candidate)
+                if sym:
+                    return sym
+        if len(name) == 1:
+            return self._char_to_keysym(name)
+        raise ValueError(f"unknown key name: {name!r}")
+
+    def _char_to_keysym(self, ch: str) -> int:
+        if ch == "\n":
+            return self._XK.string_to_keysym("Return")
+        if ch == "\t":
+            return self._XK.string_to_keysym("Tab")
+        cp = ord(ch)
+        if 0x20 <= cp <= 0x7E or 0xA0 <= cp <= 0xFF:
+            return cp
+        return 0x01000000 | cp          # X11 Unicode keysym
+
+    def _press_chord(self, keysyms: List[int]) -> None:
+        X = self._X
+        pressed: List[int] = []
+        for sym in keysyms:
+            keycode, shifted = self._keycode_for(sym)
+            if shifted:
+                shift = self._d.keysym_to_keycode(self._XK.string_to_keysym("Shift_L"))
+                self._fake(X.KeyPress, shift)
+                pressed.append(shift)
+            self._fake(X.KeyPress, keycode)
+            pressed.append(keycode)
+        for keycode in reversed(pressed):
+            self._fake(X.KeyRelease, keycode)
+
+    def _keycode_for(self, keysym: int) -> Tuple[int, bool]:
+        """Return (keycode, needs_shift), remapping the scratch key if needed."""
+        for keycode, index in self._d.keysym_to_keycodes(keysym):
+            if index in (0, 1):
+                return keycode, index == 1
+        if not self._scratch:
+            raise ValueError(f"no keycode for keysym 0x{keysym:x}")
+        self._d.change_keyboard_mapping(self._scratch, [(keysym, keysym)])
+        self._d.sync()
+        return self._scratch, False
+
+    def _find_scratch_keycode(self) -> Optional[int]:
+        info = self._d.display.info
+        for keycode in range(info.max_keycode, info.min_keycode - 1, -1):
+            if not any(self._d.keycode_to_keysym(keycode, i) for i in range(4)):
+                return keycode
+        return None
+
+    def _reset_scratch(self) -> None:
+        if self._scratch:
+            self._d.change_keyboard_mapping(self._scratch, [(0, 0)])
+
+    # ── --clearmodifiers ────────────────────────────────────────────────────
+
+    def _release_held_modifiers(self) -> List[int]:
+        keymap = self._d.query_keymap()
+        held = [
+            kc for keycodes in self._d.get_modifier_mapping() for kc in keycodes
+            if kc and keymap[kc // 8] & (1 << (kc % 8))
+        ]
+        for kc in held:
+            self._fake(self._X.KeyRelease, kc)
+        return held
+
+    def _restore_modifiers(self, held: List[int]) -> None:
+        for kc in held:
+            self._fake(self._X.KeyPress, kc)
+
+
+# ── selection ────────────────────────────────────────────────────────────────
+
+_backend: Optional[InputBackend] = None
+_backend_lock = threading.Lock()
+
+
+def _create(name: str) -> InputBackend:
+    if name == "xdotool":
+        return XdotoolBackend()
+    if name == "xtest":
+        return XTestBackend()
+    if name == "auto":
+        try:
+            return XTestBackend()
+        except Exception as e:
+            print(f"[input] XTest unavailable ({e}); falling back to xdotool")
+            return XdotoolBackend()
+    raise ValueError(f"unknown INPUT_BACKEND: {name}")
+
+
+def get_backend() -> InputBackend:
+    """Return the process-wide input backend, creating it on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _create(settings.input_backend)
+            print(f"[input] using {_backend.name} backend")
+        return _backend
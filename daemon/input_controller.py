@@ -1,60 +1,135 @@
 """
 daemon/input_controller.py
-Virtual keyboard + mouse input via xdotool (X11).
+Virtual keyboard + mouse input (X11).
 
-xdotool is a well-maintained CLI tool – using subprocess here is the
-idiomatic way to drive it from Python without a C binding.
+Each helper builds a short list of input ops and hands it to the
+configured backend in one call (see daemon/input_backend.py): in-process
+XTest by default, or chained xdotool invocations as a fallback.  The
+*_ops builders are public so callers such as the batch endpoint can
+concatenate several primitives into a single backend invocation.
+
+run()/run_async() go through the input scheduler (see
+daemon/input_scheduler.py), which serializes all input and keeps each
+client's calls in order.  They take the primitive's name, which labels
+its latency and failure metrics, and the caller's Origin.
+
+enter_text_async() is the text entry engine behind the type endpoints:
+it either types or pastes through the clipboard (see "text entry").
 """
 
-import subprocess
-import shlex
-from typing import Tuple
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from daemon import metrics
+from daemon.config import settings
+from daemon.dbus_client import AIBridgeClient
+from daemon.input_backend import Op, get_backend
+from daemon.input_scheduler import Origin, get_scheduler
+
+SCROLL_BUTTONS = {"up": 4, "down": 5, "left": 6, "right": 7}
+
+# Returns the connected bridge client; raises when it is unreachable
+ClientFactory = Callable[[], Awaitable[AIBridgeClient]]
+
+
+def run(ops: Sequence[Op], primitive: str = "ops", origin: Origin = Origin()) -> bool:
+    """Run a list of ops on the input backend in one invocation.
 
+    Raises InputQueueFull if the caller's queue is full.
+    """
+    backend = get_backend()
+    t0 = time.perf_counter()
+    future = get_scheduler().submit(ops, primitive, origin)
+    ok = False
+    metrics.INPUT_PENDING.inc()
+    try:
+        ok = future.result()
+        return ok
+    finally:
+        _record(backend.name, primitive, t0, ok)
 
-def _xdo(*args: str) -> bool:
-    """Run an xdotool command. Returns True on success."""
+
+async def run_async(ops: Sequence[Op], primitive: str = "ops",
+                    origin: Origin = Origin()) -> bool:
+    """run() without blocking the event loop."""
+    backend = get_backend()
+    t0 = time.perf_counter()
+    future = get_scheduler().submit(ops, primitive, origin)
+    ok = False
+    metrics.INPUT_PENDING.inc()
     try:
-        subprocess.run(["xdotool", *args], check=True,
-                       capture_output=True, timeout=5)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
-        print(f"[input] xdotool error: {e}")
-        return False
+        ok = await asyncio.wrap_future(future)
+        return ok
+    finally:
+        _record(backend.name, primitive, t0, ok)
+
+
+def _record(backend: str, primitive: str, t0: float, ok: bool) -> None:
+    metrics.INPUT_PENDING.dec()
+    metrics.INPUT_DURATION.observe(time.perf_counter() - t0, backend, primitive)
+    if not ok:
+        metrics.INPUT_FAILURES.inc(backend, primitive)
+
+
+# ── op builders ──────────────────────────────────────────────────────────────
+
+def mouse_move_ops(x: int, y: int) -> List[Op]:
+    return [("mousemove", x, y)]
+
+def mouse_click_ops(x: int, y: int, button: int = 1) -> List[Op]:
+    return [("mousemove", x, y), ("click", button, 1)]
+
+def mouse_double_click_ops(x: int, y: int) -> List[Op]:
+    return [("mousemove", x, y), ("click", 1, 2)]
+
+def mouse_drag_ops(x1: int, y1: int, x2: int, y2: int) -> List[Op]:
+    return [("mousemove", x1, y1), ("mousedown", 1),
+            ("mousemove", x2, y2), ("mouseup", 1)]
+
+def scroll_ops(x: int, y: int, direction: str = "up", clicks: int = 3) -> List[Op]:
+    btn = SCROLL_BUTTONS.get(direction, 4)
+    return [("mousemove", x, y), ("click", btn, clicks)]
+
+def key_press_ops(*keys: str) -> List[Op]:
+    return [("key", keys)]
+
+def type_text_ops(text: str, delay_ms: int = 12) -> List[Op]:
+    return [("type", text, delay_ms)]
+
+def focus_and_type_ops(xid: int, text: str, delay_ms: int = 12) -> List[Op]:
+    return [("windowfocus", xid), *type_text_ops(text, delay_ms)]
+
+def focus_and_key_ops(xid: int, *keys: str) -> List[Op]:
+    return [("windowfocus", xid), *key_press_ops(*keys)]
 
 
 # ── mouse ────────────────────────────────────────────────────────────────────
 
 def mouse_move(x: int, y: int) -> bool:
     """Move mouse to absolute screen coordinates."""
-    return _xdo("mousemove", "--sync", str(x), str(y))
+    return run(mouse_move_ops(x, y), "mouse_move")
 
 def mouse_click(x: int, y: int, button: int = 1) -> bool:
     """Click at absolute screen coordinates. button: 1=left, 2=middle, 3=right."""
-    return (mouse_move(x, y) and
-            _xdo("click", str(button)))
+    return run(mouse_click_ops(x, y, button), "mouse_click")
 
 def mouse_double_click(x: int, y: int) -> bool:
-    return (mouse_move(x, y) and
-            _xdo("click", "--repeat", "2", "1"))
+    return run(mouse_double_click_ops(x, y), "mouse_double_click")
 
 def mouse_down(button: int = 1) -> bool:
-    return _xdo("mousedown", str(button))
+    return run([("mousedown", button)], "mouse_down")
 
 def mouse_up(button: int = 1) -> bool:
-    return _xdo("mouseup", str(button))
+    return run([("mouseup", button)], "mouse_up")
 
 def mouse_drag(x1: int, y1: int, x2: int, y2: int) -> bool:
     """Click and drag from (x1,y1) to (x2,y2)."""
-    return (mouse_move(x1, y1) and
-            mouse_down(1) and
-            mouse_move(x2, y2) and
-            mouse_up(1))
+    return run(mouse_drag_ops(x1, y1, x2, y2), "mouse_drag")
 
 def scroll(x: int, y: int, direction: str = "up", clicks: int = 3) -> bool:
     """Scroll at position. direction: 'up'|'down'|'left'|'right'."""
-    btn = {"up": 4, "down": 5, "left": 6, "right": 7}.get(direction, 4)
-    return (mouse_move(x, y) and
-            _xdo("click", "--repeat", str(clicks), str(btn)))
+    return run(scroll_ops(x, y, direction, clicks), "scroll")
 
 
 # ── keyboard ─────────────────────────────────────────────────────────────────
@@ -64,27 +139,156 @@ def key_press(*keys: str) -> bool:
     Simulate pressing a key or key combo.
     keys examples: "Return", "ctrl+c", "alt+F4", "super"
     """
-    return _xdo("key", "--clearmodifiers", *keys)
+    return run(key_press_ops(*keys), "key_press")
 
 def type_text(text: str, delay_ms: int = 12) -> bool:
     """
     Type a string of text.
     delay_ms controls inter-keystroke delay (avoids missed keys under load).
     """
-    return _xdo("type", "--clearmodifiers",
-                "--delay", str(delay_ms), "--", text)
+    return run(type_text_ops(text, delay_ms), "type_text")
 
 
 # ── window focus + input ─────────────────────────────────────────────────────
 
 def focus_and_type(xid: int, text: str) -> bool:
     """Focus window by X11 XID, then type text into it."""
-    return (_xdo("windowfocus", "--sync", str(xid)) and
-            type_text(text))
+    return run(focus_and_type_ops(xid, text), "focus_and_type")
 
 def focus_and_key(xid: int, *keys: str) -> bool:
-    return (_xdo("windowfocus", "--sync", str(xid)) and
-            key_press(*keys))
+    return run(focus_and_key_ops(xid, *keys), "focus_and_key")
+
+
+# ── text entry ───────────────────────────────────────────────────────────────
+# Typing costs delay_ms per character (2 KB at 12 ms is ~25 s); a paste
+# costs two DBus calls and one key chord at any length.  Long text, and
+# non-ASCII text such as CJK (typed one remapped keycode at a time), is
+# pasted through the CLIPBOARD selection; short ASCII text is typed.
+
+# Lowercase wm_class -> paste chord where ctrl+v does not paste.  None:
+# the terminal pastes PRIMARY only, so text is always typed there.
+PASTE_CHORDS: Dict[str, Optional[str]] = {
+    **dict.fromkeys((
+        "gnome-terminal", "gnome-terminal-server", "org.gnome.terminal",
+        "kgx", "org.gnome.console", "ptyxis", "org.gnome.ptyxis",
+        "tilix", "com.gexperts.tilix", "terminator", "xfce4-terminal",
+        "konsole", "org.kde.konsole", "kitty", "alacritty", "foot",
+        "wezterm", "org.wezfurlong.wezterm", "blackbox",
+        "com.raggesilver.blackbox",
+    ), "ctrl+shift+v"),
+    **dict.fromkeys(("xterm", "uxterm", "urxvt", "rxvt"), None),
+}
+DEFAULT_PASTE_CHORD = "ctrl+v"
+
+_paste_lock: Optional[asyncio.Lock] = None
+_restores: Set["asyncio.Task[None]"] = set()
+
+
+def paste_chord(wm_class: str) -> Optional[str]:
+    return PASTE_CHORDS.get(wm_class.lower(), DEFAULT_PASTE_CHORD)
+
+
+def wants_paste(text: str, strategy: str = "auto") -> bool:
+    """Whether `strategy` (auto | type | paste) asks for a clipboard paste."""
+    if strategy == "auto":
+        return len(text) >= settings.paste_min_chars or not text.isascii()
+    return strategy == "paste"
+
+
+async def enter_text_async(client: ClientFactory, text: str, delay_ms: int = 12,
+                           strategy: str = "auto", xid: Optional[int] = None,
+                           origin: Origin = Origin()) -> bool:
+    """Type or paste `text` into the focused window, or into `xid` after focusing it.
+
+    A paste falls back to typing when the extension has no clipboard
+    methods, DBus is unreachable, or the target is a PRIMARY-only terminal.
+    """
+    focus: List[Op] = [("windowfocus", xid)] if xid else []
+    if wants_paste(text, strategy):
+        ok = await _paste_async(client, text, focus, xid, origin)
+        if ok is not None:
+            return ok
+    return await run_async(focus + type_text_ops(text, delay_ms),
+                           "focus_and_type" if xid else "type_text", origin)
+
+
+async def _paste_async(client: ClientFactory, text: str, focus: List[Op],
+                       xid: Optional[int], origin: Origin) -> Optional[bool]:
+    """Set the clipboard, send the paste chord, restore the clipboard later.
+
+    Returns None when the text could not be put on the clipboard.  The
+    lock is held until the previous clipboard text is back, so two pastes
+    never see each other's text.  GetClipboard reads "" for an empty
+    clipboard and for non-text content such as an image; neither can be
+    put back as text, so the pasted text is left in place.
+    """
+    global _paste_lock
+    try:
+        c = await client()
+        if not c.clipboard_capable:
+            return None
+        chord = paste_chord(await _target_wm_class(c, xid))
+    except Exception as e:
+        print(f"[input] clipboard unavailable ({e}); typing instead")
+        return None
+    if chord is None:
+        return None
+
+    if _paste_lock is None:
+        _paste_lock = asyncio.Lock()
+    lock = _paste_lock
+    await lock.acquire()
+    previous: Optional[str] = None
+    try:
+        try:
+            previous = await c.get_clipboard_async()
+            pasted = previous is not None and bool(await c.set_clipboard_async(text))
+        except Exception as e:
+            print(f"[input] clipboard unavailable ({e}); typing instead")
+            pasted = False
+        if not pasted:
+            return None
+        return await run_async(focus + key_press_ops(chord), "paste_text", origin)
+    finally:
+        if not previous or settings.clipboard_restore_delay <= 0:
+            lock.release()
+        else:
+            # The target reads the clipboard after it handles the chord, so
+            # the old text goes back later, without holding up the response
+            task = asyncio.get_running_loop().create_task(
+                _restore_clipboard(c, previous, lock))
+            _restores.add(task)
+            task.add_done_callback(_restores.discard)
+
+
+async def _restore_clipboard(c: AIBridgeClient, previous: str, lock: asyncio.Lock) -> None:
+    try:
+        await asyncio.sleep(settings.clipboard_restore_delay)
+        await c.set_clipboard_async(previous)
+    except Exception as e:
+        print(f"[input] clipboard restore failed: {e}")
+    finally:
+        lock.release()
+
+
+async def _target_wm_class(c: AIBridgeClient, xid: Optional[int]) -> str:
+    """wm_class of `xid`, or of the focused window; "" when not found.
+
+    Falls back to GetWindows/GetFocusedWindow when the snapshot call
+    fails, so a broken GetDesktopState does not turn every paste into
+    typing.
+    """
+    try:
+        state = await c.get_desktop_state_async()
+        windows, focused = state["windows"], state["focused_window_id"]
+    except Exception as e:
+        print(f"[input] desktop state unavailable ({e}); using the window list")
+        windows = await c.get_windows_async()
+        focused = None if xid else await c.get_focused_window_async()
+    for w in windows:
+        if (xid in (w["id"], w.get("xid"))) if xid else w["id"] == focused:
+            return w.get("wm_class") or ""
+    return ""
 
 
 # ── screen geometry helpers ──────────────────────────────────────────────────
@@ -92,9 +296,13 @@ def focus_and_key(xid: int, *keys: str) -> bool:
 def get_screen_size() -> Tuple[int, int]:
     """Return (width, height) of the primary display."""
     try:
-        out = subprocess.check_output(
-            ["xdotool", "getdisplaygeometry"], text=True, timeout=3)
-        w, h = out.strip().split()
-        return int(w), int(h)
+        return get_backend().screen_size()
+    except Exception:
+        return (1920, 1080)
+
+
+async def get_screen_size_async() -> Tuple[int, int]:
+    try:
+        return await get_backend().screen_size_async()
     except Exception:
         return (1920, 1080)
@@ -0,0 +1,168 @@
+"""
+daemon/input_scheduler.py
+Single owner of the input backend.
+
+Every input call – REST endpoints, batches, the sync helpers in
+input_controller – is submitted here as a job and run by one scheduler
+thread.  Op lists from different requests therefore never interleave:
+a click's mousemove and button press land back to back, and two
+xdotool chains never race each other.
+
+Jobs are queued per client (the X-Client-Id header; requests without
+one share the "anonymous" queue) and run in submission order within a
+client.  Across clients the scheduler takes the queue whose head has
+the highest priority (X-Input-Priority: high | normal | low) and
+rotates between clients of equal priority, so one busy agent cannot
+starve another.  A client with more than INPUT_QUEUE_MAX jobs waiting
+gets InputQueueFull (HTTP 429).
+
+Mouse moves are coalesced:
+  - consecutive mousemove ops inside a job collapse to the last one
+  - a queued move-only job is dropped when the same client's next job
+    starts with a mousemove; the pointer ends where that job puts it,
+    so the dropped move completes as successful
+
+Completion is reported through a concurrent.futures.Future, which
+input_controller.run_async() awaits from the event loop.  A job whose
+future was cancelled before it started (the request went away) is not
+run.
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from daemon import metrics
+from daemon.config import settings
+from daemon.input_backend import Op, get_backend
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+ANONYMOUS = "anonymous"
+
+
+class Origin(NamedTuple):
+    """Who submitted an input job, from the request headers."""
+    client: str = ANONYMOUS
+    priority: str = "normal"
+
+
+class InputQueueFull(Exception):
+    """The client already has queue_max input jobs waiting."""
+
+
+@dataclass
+class _Job:
+    ops: List[Op]
+    primitive: str
+    priority: str
+    future: Future
+    submitted: float = field(default_factory=time.perf_counter)
+
+
+def coalesce_moves(ops: Sequence[Op]) -> List[Op]:
+    """Copy of `ops` with each run of consecutive mousemoves cut to its last."""
+    out: List[Op] = []
+    for op in ops:
+        if op[0] == "mousemove" and out and out[-1][0] == "mousemove":
+            out[-1] = op
+            metrics.INPUT_COALESCED.inc("merged")
+        else:
+            out.append(op)
+    return out
+
+
+def _move_only(ops: Sequence[Op]) -> bool:
+    return bool(ops) and all(op[0] == "mousemove" for op in ops)
+
+
+class InputScheduler:
+    def __init__(self, queue_max: int = 64):
+        self.queue_max = queue_max
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_Job]] = {}
+        # client -> when it was last served; clients with an empty queue
+        # are forgotten, so a client that comes back goes to the front
+        self._served: Dict[str, int] = {}
+        self._clock = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, ops: Sequence[Op], primitive: str = "ops",
+               origin: Origin = Origin()) -> Future:
+        """Queue `ops`; the future resolves to the backend's success flag."""
+        priority = origin.priority if origin.priority in PRIORITIES else "normal"
+        job = _Job(coalesce_moves(ops), primitive, priority, Future())
+        with self._cond:
+            q = self._queues.setdefault(origin.client, deque())
+            if len(q) >= self.queue_max:
+                raise InputQueueFull(
+                    f"client {origin.client!r} has {len(q)} input jobs queued")
+            q.append(job)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="input-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return job.future
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    # ── scheduler thread ────────────────────────────────────────────────────
+
+    def _next(self) -> Tuple[_Job, bool]:
+        """Pop the next job (lock held, some queue non-empty).
+
+        Returns (job, superseded); a superseded job is completed without
+        running.
+        """
+        client = min(self._queues, key=lambda c: (
+            PRIORITIES[self._queues[c][0].priority], self._served.get(c, -1)))
+        q = self._queues[client]
+        job = q.popleft()
+        superseded = _move_only(job.ops) and bool(q) and bool(q[0].ops) \
+            and q[0].ops[0][0] == "mousemove"
+        if q:
+            self._served[client] = next(self._clock)
+        else:
+            del self._queues[client]
+            self._served.pop(client, None)
+        return job, superseded
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queues:
+                    self._cond.wait()
+                job, superseded = self._next()
+
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            if superseded:
+                metrics.INPUT_COALESCED.inc("superseded")
+                job.future.set_result(True)
+                continue
+            metrics.INPUT_QUEUE_WAIT.observe(time.perf_counter() - job.submitted, job.priority)
+            try:
+                job.future.set_result(get_backend().run(job.ops))
+            except Exception as e:
+                job.future.set_exception(e)
+
+
+# ── singleton ────────────────────────────────────────────────────────────────
+
+_scheduler: Optional[InputScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> InputScheduler:
+    """Return the process-wide input scheduler, creating it on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = InputScheduler(settings.input_queue_max)
+        return _scheduler
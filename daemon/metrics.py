@@ -0,0 +1,273 @@
+"""
+daemon/metrics.py
+Prometheus metrics for the daemon, served as text at GET /metrics.
+
+Counters, gauges and histograms are kept in process and rendered in the
+Prometheus text exposition format (0.0.4), so no client library is
+needed.  Every metric is created at import time and registered in
+REGISTRY; instrumented modules import this one and call observe()/inc().
+
+  gnome_ai_http_requests_total{route,method,status}
+  gnome_ai_http_request_duration_seconds{route,method}
+  gnome_ai_http_requests_in_flight
+  gnome_ai_dbus_call_duration_seconds{method}       per AIBridge method
+  gnome_ai_dbus_call_errors_total{method}
+  gnome_ai_dbus_connects_total{result}              ok | error
+  gnome_ai_model_build_duration_seconds{model}      Pydantic response models
+  gnome_ai_input_duration_seconds{backend,primitive}
+  gnome_ai_input_failures_total{backend,primitive}
+  gnome_ai_input_pending                            queued + running input calls
+  gnome_ai_input_queue_wait_seconds{priority}       time in the input scheduler's queue
+  gnome_ai_input_coalesced_total{kind}              merged | superseded mouse moves
+  gnome_ai_xdotool_exec_duration_seconds{command}   one per xdotool process
+  gnome_ai_threadpool_busy / _waiting               anyio worker threads
+
+Routes are labelled with their template (/windows/{window_id}/focus), so
+the label set stays bounded.  /metrics itself and the /events stream are
+not timed.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-millisecond cache hits up to DBus/xdotool timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return super().render() + [
+            f"{self.name}{_label_text(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Set directly, or computed at scrape time when `fn` is given."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+        self._fn = fn
+
+    def set(self, value: float, *labels: Any) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: Any, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> List[str]:
+        if self._fn is not None:
+            try:
+                items = [((), float(self._fn()))]
+            except Exception:
+                items = []
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return super().render() + [
+            f"{self.name}{_label_text(self.labelnames, k)} {_num(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += value
+
+    @contextmanager
+    def time(self, *labels: Any) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, *labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(s)) for k, s in self._series.items())
+        lines = super().render()
+        names = self.labelnames + ("le",)
+        for key, s in items:
+            total = 0
+            for le, n in zip(self.buckets + (float("inf"),), s[:-1]):
+                total += n
+                bound = "+Inf" if le == float("inf") else repr(le)
+                lines.append(f"{self.name}_bucket{_label_text(names, key + (bound,))} {total}")
+            labels = _label_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_num(s[-1])}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+def render() -> str:
+    return "\n".join(line for m in REGISTRY for line in m.render()) + "\n"
+
+
+# ── daemon metrics ───────────────────────────────────────────────────────────
+
+HTTP_REQUESTS = Counter(
+    "gnome_ai_http_requests_total", "HTTP requests by route and status.",
+    ("route", "method", "status"))
+HTTP_DURATION = Histogram(
+    "gnome_ai_http_request_duration_seconds", "HTTP request latency by route.",
+    ("route", "method"))
+HTTP_IN_FLIGHT = Gauge(
+    "gnome_ai_http_requests_in_flight", "HTTP requests being served.")
+
+DBUS_DURATION = Histogram(
+    "gnome_ai_dbus_call_duration_seconds", "Round trip of AIBridge DBus calls.",
+    ("method",))
+DBUS_ERRORS = Counter(
+    "gnome_ai_dbus_call_errors_total", "AIBridge DBus calls that raised.",
+    ("method",))
+DBUS_CONNECTS = Counter(
+    "gnome_ai_dbus_connects_total", "Attempts to (re)connect to org.gnome.AIBridge.",
+    ("result",))
+
+MODEL_BUILD = Histogram(
+    "gnome_ai_model_build_duration_seconds", "Construction of Pydantic response models.",
+    ("model",))
+
+INPUT_DURATION = Histogram(
+    "gnome_ai_input_duration_seconds", "Input primitives, from submission to completion.",
+    ("backend", "primitive"))
+INPUT_FAILURES = Counter(
+    "gnome_ai_input_failures_total", "Input primitives the backend reported as failed.",
+    ("backend", "primitive"))
+INPUT_PENDING = Gauge(
+    "gnome_ai_input_pending", "Input calls queued on or running in the backend.")
+INPUT_QUEUE_WAIT = Histogram(
+    "gnome_ai_input_queue_wait_seconds", "Time input jobs wait for the scheduler thread.",
+    ("priority",))
+INPUT_COALESCED = Counter(
+    "gnome_ai_input_coalesced_total", "Mouse moves merged or dropped by the input scheduler.",
+    ("kind",))
+XDOTOOL_EXEC = Histogram(
+    "gnome_ai_xdotool_exec_duration_seconds", "Lifetime of one xdotool process.",
+    ("command",))
+
+THREADPOOL_BUSY = Gauge(
+    "gnome_ai_threadpool_busy", "Worker threads in use in the anyio threadpool.")
+THREADPOOL_WAITING = Gauge(
+    "gnome_ai_threadpool_waiting", "Tasks waiting for an anyio worker thread.")
+
+
+@contextmanager
+def dbus_call(method: str) -> Iterator[None]:
+    """Time a DBus call and count it as an error if it raises."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        DBUS_ERRORS.inc(method)
+        raise
+    finally:
+        DBUS_DURATION.observe(time.perf_counter() - t0, method)
+
+
+# ── ASGI middleware ──────────────────────────────────────────────────────────
+
+_UNTIMED = ("/metrics", "/events")
+
+
+class MetricsMiddleware:
+    """Per-route request count, status and latency.
+
+    Plain ASGI rather than BaseHTTPMiddleware: it only wraps `send` to
+    see the status, so streaming responses pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in _UNTIMED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the shared scope
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUESTS.inc(route, scope["method"], status)
+            HTTP_DURATION.observe(time.perf_counter() - t0, route, scope["method"])
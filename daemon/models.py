@@ -4,7 +4,7 @@ Pydantic request/response models for the FastAPI layer.
 """
 
 from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 # ── window ────────────────────────────────────────────────────────────────────
@@ -45,6 +45,17 @@ class WorkspaceInfo(BaseModel):
     active: bool
 
 
+# ── monitor ───────────────────────────────────────────────────────────────────
+
+class MonitorInfo(BaseModel):
+    index:   int
+    x:       int
+    y:       int
+    width:   int
+    height:  int
+    primary: bool
+
+
 # ── input ─────────────────────────────────────────────────────────────────────
 
 class MouseClickRequest(BaseModel):
@@ -71,10 +82,14 @@ class KeyPressRequest(BaseModel):
 class TypeTextRequest(BaseModel):
     text:     str
     delay_ms: int = Field(12, ge=0, le=500)
+    strategy: str = Field("auto", pattern=r"^(auto|type|paste)$")
+    """auto: paste long or non-ASCII text through the clipboard, type the rest"""
 
 class FocusTypeRequest(BaseModel):
     xid:      int   # X11 window XID (from WindowInfo.id on X11)
     text:     str
+    delay_ms: int = Field(12, ge=0, le=500)
+    strategy: str = Field("auto", pattern=r"^(auto|type|paste)$")
 
 class FocusKeyRequest(BaseModel):
     xid:  int
@@ -87,6 +102,62 @@ class LaunchAppRequest(BaseModel):
     command: str
 
 
+# ── batch ─────────────────────────────────────────────────────────────────────
+
+class WaitRequest(BaseModel):
+    ms: int = Field(0, ge=0, le=10_000)
+
+BATCH_ACTION_TYPES = (
+    "wait", "launch", "focus_window", "close_window", "minimize_window",
+    "maximize_window", "move_resize", "switch_workspace",
+    "mouse_move", "mouse_click", "mouse_double_click", "mouse_drag", "scroll",
+    "hotkey", "type_text", "focus_type", "focus_key",
+)
+
+class BatchAction(BaseModel):
+    """One step, in the agent's action vocabulary.
+
+    Parameters sit next to `type` exactly as in the single-action
+    endpoints, e.g. {"type": "mouse_click", "x": 10, "y": 20}.
+    """
+    model_config = ConfigDict(extra="allow")
+
+    type:     str = Field(..., pattern=r"^(" + "|".join(BATCH_ACTION_TYPES) + r")$")
+    pause_ms: Optional[int] = Field(None, ge=0, le=10_000)
+    """pause after this step; overrides BatchRequest.step_delay_ms
+    (delay_ms stays with type_text / focus_type as the keystroke delay)"""
+
+class BatchRequest(BaseModel):
+    actions:         List[BatchAction] = Field(..., min_length=1, max_length=100)
+    stop_on_failure: bool = True
+    step_delay_ms:   int  = Field(0, ge=0, le=10_000)
+    merge:           bool = True
+    """merge consecutive input steps with no pause between them into one
+    backend invocation"""
+
+class BatchStepResult(BaseModel):
+    """Outcome of one step.
+
+    success is True only for a step known to have run.  detail is
+    "skipped" for steps not run after an earlier failure
+    (stop_on_failure).  A merged group succeeds or fails as one backend
+    invocation, so when it fails only its first step carries the error;
+    the others have detail "unknown", as the backend may have stopped
+    before or after them.  Send merge=false for per-step results.
+    """
+    index:   int
+    type:    str
+    success: bool
+    detail:  Optional[str] = None
+    group:   int
+    """steps sharing a group ran in the same backend invocation"""
+
+class BatchResponse(BaseModel):
+    success:    bool
+    results:    List[BatchStepResult]
+    elapsed_ms: float
+
+
 # ── generic response ──────────────────────────────────────────────────────────
 
 class SuccessResponse(BaseModel):
@@ -99,3 +170,5 @@ class ScreenState(BaseModel):
     workspaces:       List[WorkspaceInfo]
     screen_width:     int
     screen_height:    int
+    monitors:         List[MonitorInfo] = []
+    state_version:    int = 0
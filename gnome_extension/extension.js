@@ -10,6 +10,7 @@
 import Gio from 'gi://Gio';
 import GLib from 'gi://GLib';
 import Meta from 'gi://Meta';
+import St from 'gi://St';
 import * as Main from 'resource:///org/gnome/shell/ui/main.js';
 import {Extension} from 'resource:///org/gnome/shell/extensions/extension.js';
 
@@ -70,25 +71,87 @@ const AI_BRIDGE_IFACE = `
       <arg type="u" name="window_id" direction="out"/>
     </method>
 
+    <!-- Text on the CLIPBOARD selection; "" when it holds no text. -->
+    <method name="GetClipboard">
+      <arg type="s" name="text" direction="out"/>
+    </method>
+
+    <method name="SetClipboard">
+      <arg type="s" name="text"    direction="in"/>
+      <arg type="b" name="success" direction="out"/>
+    </method>
+
+    <!--
+      Atomic snapshot as typed DBus data (no JSON):
+        windows           a(uussibbbiiiii)   id, xid, title, wm_class, pid,
+                                             focused, minimized, maximized,
+                                             workspace, x, y, width, height
+        focused_window_id u
+        workspaces        a(ib)              index, active
+        monitors          a(iiiiib)          index, x, y, width, height, primary
+        screen_width      i
+        screen_height     i
+        seq               t                  last WindowsDelta seq emitted
+    -->
+    <method name="GetDesktopState">
+      <arg type="a{sv}" name="state" direction="out"/>
+    </method>
+
+    <!-- Full window list; emitted only when windows appear or go away. -->
     <signal name="WindowsChanged">
       <arg type="s" name="windows_json"/>
     </signal>
 
+    <!--
+      Incremental update, coalesced to at most one per frame.
+        seq      consecutive sequence number (GetDesktopState reports the
+                 last one emitted, so a client can detect gaps and resync)
+        added    full window dicts (same keys as GetWindows)
+        removed  window ids
+        changed  {id, ...only the fields that changed}
+        globals  any of focused_window_id, workspaces, monitors,
+                 screen_width, screen_height that changed
+    -->
+    <signal name="WindowsDelta">
+      <arg type="t"      name="seq"/>
+      <arg type="aa{sv}" name="added"/>
+      <arg type="au"     name="removed"/>
+      <arg type="aa{sv}" name="changed"/>
+      <arg type="a{sv}"  name="globals"/>
+    </signal>
+
   </interface>
 </node>`;
 
+// Sequence number of the last WindowsDelta signal emitted
+let _deltaSeq = 0;
+
+// Live WindowRegistry while the extension is enabled
+let _registry = null;
+
+// DBus types of the window fields, for building a{sv} dicts
+const WINDOW_FIELD_TYPES = {
+    id: 'u', xid: 'u', title: 's', wm_class: 's', pid: 'i',
+    focused: 'b', minimized: 'b', maximized: 'b', workspace: 'i',
+    x: 'i', y: 'i', width: 'i', height: 'i',
+};
+
 // ── Helper functions ───────────────────────────────────────────────────────────
 
+function _isListed(w) {
+    return w &&
+           !w.is_skip_taskbar() &&
+           w.get_window_type() === Meta.WindowType.NORMAL;
+}
+
 function _allWindows() {
     return global.get_window_actors()
         .map(a => a.meta_window)
-        .filter(w => w &&
-                     !w.is_skip_taskbar() &&
-                     w.get_window_type() === Meta.WindowType.NORMAL);
+        .filter(_isListed);
 }
 
 function _findWindow(id) {
-    return _allWindows().find(w => w.get_id() === id) ?? null;
+    return _registry?.get(id) ?? null;
 }
 
 function _windowToJson(w) {
@@ -117,10 +180,187 @@ function _windowToJson(w) {
     };
 }
 
+function _jsonToTuple(j) {
+    return [j.id, Number(j.xid) >>> 0, j.title, j.wm_class, j.pid,
+        j.focused, j.minimized, j.maximized, j.workspace,
+        j.x, j.y, j.width, j.height];
+}
+
+function _windowFieldsToVariants(fields) {
+    const out = {};
+    for (const [key, value] of Object.entries(fields)) {
+        const type = WINDOW_FIELD_TYPES[key];
+        out[key] = new GLib.Variant(type, type === 'u' ? Number(value) >>> 0 : value);
+    }
+    return out;
+}
+
+function _workspaceList() {
+    const mgr    = global.workspace_manager;
+    const count  = mgr.get_n_workspaces();
+    const active = mgr.get_active_workspace_index();
+    const data   = [];
+    for (let i = 0; i < count; i++)
+        data.push({index: i, active: i === active});
+    return data;
+}
+
+function _monitorList() {
+    const lm = Main.layoutManager;
+    return lm.monitors.map(m =>
+        [m.index, m.x, m.y, m.width, m.height, m.index === lm.primaryIndex]);
+}
+
+// ── Window registry ────────────────────────────────────────────────────────────
+// id -> MetaWindow index plus cached serializations, kept current by window
+// lifecycle and property signals so DBus calls never walk the actor list or
+// re-serialize windows that have not changed.  Everything here runs on the
+// compositor thread, so cheap lookups matter.
+//
+// `listener` receives added(id), removed(id), changed(id) and
+// focusChanged(id) as the registry sees them.
+//
+// Windows are listed in stacking order, bottom to top, like the actor list
+// _allWindows() walks; the order is cached until the stack changes.
+
+const WINDOW_PROPERTY_SIGNALS = [
+    'notify::title', 'notify::wm-class', 'notify::minimized',
+    'notify::maximized-horizontally', 'notify::maximized-vertically',
+    'position-changed', 'size-changed', 'workspace-changed',
+];
+
+class WindowRegistry {
+    constructor(listener) {
+        this._listener = listener;
+        // id -> {win, sigIds, obj, json, tuple}; obj/json/tuple are null
+        // when stale and rebuilt on demand
+        this._entries = new Map();
+        // ids in stacking order; null when stale
+        this._order = null;
+        this._focusId = AIBridgeMethods.GetFocusedWindow();
+
+        for (const w of _allWindows())
+            this._add(w, false);
+
+        this._sigCreated = global.display.connect(
+            'window-created', (_d, w) => {
+                if (_isListed(w))
+                    this._add(w, true);
+            });
+        // Focus moves between two windows: both fragments go stale
+        this._sigFocus = global.display.connect(
+            'notify::focus-window', () => {
+                const id = AIBridgeMethods.GetFocusedWindow();
+                this._invalidate(this._focusId);
+                this._invalidate(id);
+                this._focusId = id;
+                this._listener.focusChanged(id);
+            });
+        this._sigRestacked = global.display.connect(
+            'restacked', () => { this._order = null; });
+        // Removing or reordering workspaces renumbers them under the windows
+        const mgr = global.workspace_manager;
+        this._sigWorkspaces = ['workspace-removed', 'workspaces-reordered']
+            .map(sig => mgr.connect(sig, () => {
+                for (const id of this._entries.keys())
+                    this._invalidate(id);
+            }));
+    }
+
+    destroy() {
+        global.display.disconnect(this._sigCreated);
+        global.display.disconnect(this._sigFocus);
+        global.display.disconnect(this._sigRestacked);
+        for (const id of this._sigWorkspaces)
+            global.workspace_manager.disconnect(id);
+        for (const e of this._entries.values())
+            e.sigIds.forEach(id => e.win.disconnect(id));
+        this._entries.clear();
+    }
+
+    get focusId() {
+        return this._focusId;
+    }
+
+    get(id) {
+        return this._entries.get(id)?.win ?? null;
+    }
+
+    has(id) {
+        return this._entries.has(id);
+    }
+
+    ids() {
+        this._order ??= global.display.sort_windows_by_stacking(
+            [...this._entries.values()].map(e => e.win)).map(w => w.get_id());
+        return this._order;
+    }
+
+    // Current field object for one window (cached until it changes)
+    obj(id) {
+        const e = this._entries.get(id);
+        if (!e) return null;
+        e.obj ??= _windowToJson(e.win);
+        return e.obj;
+    }
+
+    // GetWindows payload, reusing the JSON fragment of unchanged windows
+    json() {
+        const parts = [];
+        for (const id of this.ids()) {
+            const e = this._entries.get(id);
+            e.json ??= JSON.stringify(this.obj(id));
+            parts.push(e.json);
+        }
+        return `[${parts.join(',')}]`;
+    }
+
+    // GetDesktopState window structs, reused the same way
+    tuples() {
+        const out = [];
+        for (const id of this.ids()) {
+            const e = this._entries.get(id);
+            e.tuple ??= _jsonToTuple(this.obj(id));
+            out.push(e.tuple);
+        }
+        return out;
+    }
+
+    _add(w, isNew) {
+        const id = w.get_id();
+        if (this._entries.has(id)) return;
+        const sigIds = WINDOW_PROPERTY_SIGNALS.map(sig =>
+            w.connect(sig, () => this._invalidate(id)));
+        sigIds.push(w.connect('unmanaged', () => this._remove(id)));
+        this._entries.set(id, {win: w, sigIds, obj: null, json: null, tuple: null});
+        this._order = null;
+        if (isNew)
+            this._listener.added(id);
+    }
+
+    _remove(id) {
+        const e = this._entries.get(id);
+        if (!e) return;
+        e.sigIds.forEach(sigId => e.win.disconnect(sigId));
+        this._entries.delete(id);
+        this._order = null;
+        this._listener.removed(id);
+    }
+
+    _invalidate(id) {
+        const e = this._entries.get(id);
+        if (!e) return;
+        e.obj = e.json = e.tuple = null;
+        this._listener.changed(id);
+    }
+}
+
 // ── DBus method implementations (plain JS object for wrapJSObject) ─────────
 const AIBridgeMethods = {
     GetWindows() {
         try {
+            if (_registry)
+                return _registry.json();
             return JSON.stringify(_allWindows().map(_windowToJson));
         } catch (e) {
             logError(e, 'AIBridge.GetWindows');
@@ -189,13 +429,7 @@ const AIBridgeMethods = {
 
     GetWorkspaces() {
         try {
-            const mgr    = global.workspace_manager;
-            const count  = mgr.get_n_workspaces();
-            const active = mgr.get_active_workspace_index();
-            const data   = [];
-            for (let i = 0; i < count; i++)
-                data.push({index: i, active: i === active});
-            return JSON.stringify(data);
+            return JSON.stringify(_workspaceList());
         } catch (e) {
             logError(e, 'AIBridge.GetWorkspaces');
             return '[]';
@@ -238,6 +472,53 @@ const AIBridgeMethods = {
         const fw = global.display.get_focus_window();
         return fw ? fw.get_id() : 0;
     },
+
+    // St.Clipboard.get_text() answers through a callback, so this one
+    // completes the invocation itself (wrapJSObject calls the *Async form).
+    GetClipboardAsync(params, invocation) {
+        try {
+            St.Clipboard.get_default().get_text(St.ClipboardType.CLIPBOARD,
+                (_clipboard, text) => invocation.return_value(
+                    new GLib.Variant('(s)', [text ?? ''])));
+        } catch (e) {
+            logError(e, 'AIBridge.GetClipboard');
+            invocation.return_value(new GLib.Variant('(s)', ['']));
+        }
+    },
+
+    SetClipboard(text) {
+        try {
+            St.Clipboard.get_default().set_text(St.ClipboardType.CLIPBOARD, text);
+            return true;
+        } catch (e) {
+            logError(e, 'AIBridge.SetClipboard');
+            return false;
+        }
+    },
+
+    GetDesktopState() {
+        // Everything is read in one synchronous pass on the shell's main
+        // loop, so the pieces are mutually consistent.
+        try {
+            const [width, height] = global.display.get_size();
+            return {
+                windows: new GLib.Variant('a(uussibbbiiiii)',
+                    _registry ? _registry.tuples()
+                        : _allWindows().map(w => _jsonToTuple(_windowToJson(w)))),
+                focused_window_id: new GLib.Variant('u',
+                    AIBridgeMethods.GetFocusedWindow()),
+                workspaces: new GLib.Variant('a(ib)',
+                    _workspaceList().map(ws => [ws.index, ws.active])),
+                monitors: new GLib.Variant('a(iiiiib)', _monitorList()),
+                screen_width:  new GLib.Variant('i', width),
+                screen_height: new GLib.Variant('i', height),
+                seq:           new GLib.Variant('t', _deltaSeq),
+            };
+        } catch (e) {
+            logError(e, 'AIBridge.GetDesktopState');
+            throw e;
+        }
+    },
 };
 
 // ── Extension class ────────────────────────────────────────────────────────────
@@ -268,24 +549,51 @@ export default class AIBridgeExtension extends Extension {
             () => log('AIBridge: could not own bus name'),
         );
 
-        // Watch window-list changes (emit DBus signal)
-        this._sigDisplay = global.display.connect(
-            'window-created', this._emitWindowsChanged.bind(this));
-        this._sigWM = global.window_manager.connect(
-            'destroy', this._emitWindowsChanged.bind(this));
+        // ── delta tracking ──
+        // Windows whose fields changed since the last delta, and the
+        // window objects as last emitted (to diff against)
+        this._emitted        = new Map();
+        this._pendingAdded   = new Set();
+        this._pendingRemoved = new Set();
+        this._dirty          = new Set();
+        this._dirtyGlobals   = new Set();
+        this._laterId        = 0;
+
+        _registry = new WindowRegistry({
+            added:   id => this._markAdded(id),
+            removed: id => this._markRemoved(id),
+            changed: id => this._markDirty(id),
+            focusChanged: () => this._markGlobal('focused_window_id'),
+        });
+        for (const id of _registry.ids())
+            this._emitted.set(id, _registry.obj(id));
+
+        const mgr = global.workspace_manager;
+        this._sigWorkspaces = [
+            'active-workspace-changed', 'workspace-added', 'workspace-removed',
+        ].map(sig => mgr.connect(sig, () => this._markGlobal('workspaces')));
+        this._sigMonitors = Main.layoutManager.connect(
+            'monitors-changed', () => this._markGlobal('monitors'));
 
         log('AIBridge extension enabled');
     }
 
     disable() {
-        // Disconnect window signals correctly from their source
-        if (this._sigDisplay) {
-            global.display.disconnect(this._sigDisplay);
-            this._sigDisplay = null;
+        // Disconnect signals correctly from their source
+        for (const id of this._sigWorkspaces ?? [])
+            global.workspace_manager.disconnect(id);
+        this._sigWorkspaces = null;
+        if (this._sigMonitors) {
+            Main.layoutManager.disconnect(this._sigMonitors);
+            this._sigMonitors = null;
+        }
+        if (_registry) {
+            _registry.destroy();
+            _registry = null;
         }
-        if (this._sigWM) {
-            global.window_manager.disconnect(this._sigWM);
-            this._sigWM = null;
+        if (this._laterId) {
+            global.compositor.get_laters().remove(this._laterId);
+            this._laterId = 0;
         }
 
         // Unexport the DBus object
@@ -303,6 +611,105 @@ export default class AIBridgeExtension extends Extension {
         log('AIBridge extension disabled');
     }
 
+    // ── delta bookkeeping (fed by the window registry) ─────────────────────
+
+    _markAdded(id) {
+        this._pendingAdded.add(id);
+        this._scheduleFlush();
+    }
+
+    _markRemoved(id) {
+        this._dirty.delete(id);
+        this._emitted.delete(id);
+        // A window that never made it into a delta just disappears
+        if (!this._pendingAdded.delete(id))
+            this._pendingRemoved.add(id);
+        this._scheduleFlush();
+    }
+
+    _markDirty(id) {
+        this._dirty.add(id);
+        this._scheduleFlush();
+    }
+
+    _markGlobal(name) {
+        this._dirtyGlobals.add(name);
+        this._scheduleFlush();
+    }
+
+    _scheduleFlush() {
+        if (this._laterId) return;
+        // Coalesce everything that happens within one frame into one delta
+        this._laterId = global.compositor.get_laters().add(
+            Meta.LaterType.BEFORE_REDRAW, () => {
+                this._laterId = 0;
+                this._flushDelta();
+                return GLib.SOURCE_REMOVE;
+            });
+    }
+
+    _flushDelta() {
+        if (!this._dbusObj || !_registry) return;
+        try {
+            const added = [];
+            for (const id of this._pendingAdded) {
+                const cur = _registry.obj(id);
+                this._emitted.set(id, cur);
+                added.push(_windowFieldsToVariants(cur));
+            }
+
+            const changed = [];
+            for (const id of this._dirty) {
+                if (this._pendingAdded.has(id) || !_registry.has(id)) continue;
+                const cur  = _registry.obj(id);
+                const last = this._emitted.get(id) ?? {};
+                const diff = {};
+                for (const key of Object.keys(cur)) {
+                    if (cur[key] !== last[key])
+                        diff[key] = cur[key];
+                }
+                this._emitted.set(id, cur);
+                if (Object.keys(diff).length)
+                    changed.push(_windowFieldsToVariants({id, ...diff}));
+            }
+
+            const removed = [...this._pendingRemoved];
+            const globals = {};
+            if (this._dirtyGlobals.has('focused_window_id'))
+                globals.focused_window_id = new GLib.Variant('u', _registry.focusId);
+            if (this._dirtyGlobals.has('workspaces')) {
+                globals.workspaces = new GLib.Variant('a(ib)',
+                    _workspaceList().map(ws => [ws.index, ws.active]));
+            }
+            if (this._dirtyGlobals.has('monitors')) {
+                const [width, height] = global.display.get_size();
+                globals.monitors      = new GLib.Variant('a(iiiiib)', _monitorList());
+                globals.screen_width  = new GLib.Variant('i', width);
+                globals.screen_height = new GLib.Variant('i', height);
+            }
+
+            this._pendingAdded.clear();
+            this._pendingRemoved.clear();
+            this._dirty.clear();
+            this._dirtyGlobals.clear();
+
+            if (!added.length && !removed.length && !changed.length &&
+                !Object.keys(globals).length)
+                return;
+
+            _deltaSeq += 1;
+            this._dbusObj.emit_signal(
+                'WindowsDelta',
+                new GLib.Variant('(taa{sv}aua{sv}a{sv})',
+                    [_deltaSeq, added, removed, changed, globals]),
+            );
+            if (added.length || removed.length)
+                this._emitWindowsChanged();
+        } catch (e) {
+            logError(e, 'AIBridge._flushDelta');
+        }
+    }
+
     _emitWindowsChanged() {
         if (!this._dbusObj) return;
         try {
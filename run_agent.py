@@ -7,6 +7,12 @@ Normal mode:
 Realtime mode (0.5s frame, action cooldown):
   .venv/bin/python run_agent.py --realtime "打开终端并输入 hello"
 
+Pipelined mode (capture/state prefetch overlaps inference):
+  .venv/bin/python run_agent.py --pipelined "打开终端并输入 hello"
+
+Background capture process (shared-memory frame ring):
+  .venv/bin/python run_agent.py --realtime --capture-service "打开终端并输入 hello"
+
 Remote model server:
   MODEL_API_BASE=http://<gpu-server>:8000/v1 \
   .venv/bin/python run_agent.py --realtime "打开浏览器"
@@ -23,18 +29,43 @@ def main() -> None:
     parser.add_argument("goal", type=str, help="high-level task goal in Chinese or English")
     parser.add_argument("--realtime", action="store_true",
                         help="enable low-latency realtime mode (0.5s frame + action cooldown)")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="overlap state fetch, capture, inference and actions (asyncio)")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream model output and act as soon as the action is complete")
     parser.add_argument("--fps-interval", type=float, default=None,
                         help="override realtime frame interval in seconds (default: 0.5)")
     parser.add_argument("--cooldown", type=float, default=None,
                         help="override action cooldown in seconds (default: 1.0)")
+    parser.add_argument("--capture-service", action="store_true",
+                        help="grab frames in a background process via a shared-memory ring")
+    parser.add_argument("--roi", choices=["off", "window", "dirty"], default=None,
+                        help="crop screenshots to the focused window or the changed region")
+    parser.add_argument("--trace", nargs="?", const="", default=None, metavar="PATH",
+                        help="write a per-step JSONL trace (default path: AGENT_TRACE_PATH)")
+    parser.add_argument("--record", metavar="DIR", default=None,
+                        help="record the session for offline replay (python -m agent.replay)")
     args = parser.parse_args()
 
     cfg = AgentConfig()
     cfg.realtime = args.realtime
+    cfg.pipelined = args.pipelined
+    if args.stream:
+        cfg.model_stream = True
     if args.fps_interval is not None:
         cfg.realtime_fps_interval = args.fps_interval
     if args.cooldown is not None:
         cfg.action_cooldown_sec = args.cooldown
+    if args.capture_service:
+        cfg.capture_service = True
+    if args.roi is not None:
+        cfg.capture_roi = args.roi
+    if args.trace is not None:
+        cfg.trace = True
+        if args.trace:
+            cfg.trace_path = args.trace
+    if args.record is not None:
+        cfg.record_dir = args.record
 
     DesktopAgent(cfg).run(args.goal)
 
@@ -5,9 +5,12 @@ Starts the FastAPI server together with the DBus event listener.
 """
 
 import asyncio
+import os
+import socket
 import threading
 import uvicorn
 from daemon.api import app          # FastAPI application
+from daemon.config import settings
 from daemon.dbus_client import AIBridgeClient
 
 
@@ -18,6 +21,17 @@ def _run_dbus_mainloop():
     loop.run()
 
 
+def _bind_unix_socket(path: str) -> socket.socket:
+    """Listening Unix socket at `path`, readable only by this user."""
+    if os.path.exists(path):
+        os.unlink(path)                     # stale socket from a previous run
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    os.chmod(path, 0o600)
+    sock.listen(128)
+    return sock
+
+
 def main():
     # Start GLib loop for DBus signal delivery
     t = threading.Thread(target=_run_dbus_mainloop, daemon=True)
@@ -32,13 +46,28 @@ def main():
         print(f"[daemon] WARNING: Could not connect to org.gnome.AIBridge: {e}")
         print("[daemon] Install the GNOME extension first (run install.sh)")
 
-    uvicorn.run(
+    config = uvicorn.Config(
         "daemon.api:app",
-        host="127.0.0.1",
-        port=7070,
+        host=settings.host or "127.0.0.1",
+        port=settings.port,
         log_level="info",
         reload=False,
     )
+    # One server on every listener: TCP and/or the Unix socket
+    sockets = []
+    if settings.host:
+        sockets.append(config.bind_socket())
+        print(f"[daemon] Listening on http://{settings.host}:{settings.port}")
+    if settings.uds:
+        sockets.append(_bind_unix_socket(settings.uds))
+        print(f"[daemon] Listening on unix://{settings.uds}")
+    if not sockets:
+        raise SystemExit("[daemon] DAEMON_HOST is empty and DAEMON_UDS is not set")
+    try:
+        uvicorn.Server(config).run(sockets=sockets)
+    finally:
+        if settings.uds and os.path.exists(settings.uds):
+            os.unlink(settings.uds)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for the screenshot encoders in agent/encoders.py.
+
+Reports downscale time, encode time and output size per backend on a set
+of sample frames: image files given on the command line, otherwise a live
+grab of the primary monitor (when a display is available) plus two
+synthetic 2560x1440 frames – a text-heavy UI and a photo-like gradient.
+
+  .venv/bin/python scripts/bench_encoders.py
+  .venv/bin/python scripts/bench_encoders.py --max-width 1280 --runs 20 shot1.png shot2.png
+  .venv/bin/python scripts/bench_encoders.py --json > encoders.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from agent.encoders import ENCODERS, RESAMPLE, get_encoder  # noqa: E402
+
+
+def synthetic_ui(w: int = 2560, h: int = 1440) -> Image.Image:
+    rnd = random.Random(1)
+    img = Image.new("RGB", (w, h), (246, 245, 244))
+    d = ImageDraw.Draw(img)
+    d.rectangle((0, 0, w, 48), fill=(36, 36, 36))
+    d.rectangle((0, 48, 280, h), fill=(235, 235, 235))
+    for y in range(70, h - 20, 22):
+        line = "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz    ") for _ in range(rnd.randint(40, 160)))
+        d.text((300, y), line, fill=(30, 30, 30))
+        if y % 5 == 0:
+            d.text((20, y), line[:24], fill=(60, 60, 60))
+    return img
+
+
+def synthetic_photo(w: int = 2560, h: int = 1440) -> Image.Image:
+    grad = Image.linear_gradient("L").resize((w, h))
+    noise = Image.effect_noise((w, h), 40)
+    return Image.merge("RGB", (grad, noise, grad.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+
+
+def sample_frames(paths: List[str]) -> List[Tuple[str, Image.Image]]:
+    if paths:
+        return [(os.path.basename(p), Image.open(p).convert("RGB")) for p in paths]
+    frames = []
+    try:
+        from mss import mss
+        with mss() as sct:
+            shot = sct.grab(sct.monitors[1])
+        frames.append(("live", Image.frombytes("RGB", shot.size, shot.rgb)))
+    except Exception as e:
+        print(f"[bench] no live capture ({e}); using synthetic frames only", file=sys.stderr)
+    frames.append(("synthetic-ui", synthetic_ui()))
+    frames.append(("synthetic-photo", synthetic_photo()))
+    return frames
+
+
+def bench(encoder, img: Image.Image, max_width: int, runs: int) -> Dict[str, float]:
+    resize_ms, encode_ms = [], []
+    size = 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        small = encoder.resize(img, max_width)
+        t1 = time.perf_counter()
+        data = encoder.encode(small)
+        t2 = time.perf_counter()
+        resize_ms.append((t1 - t0) * 1000)
+        encode_ms.append((t2 - t1) * 1000)
+        size = len(data)
+    return {
+        "resize_ms": statistics.median(resize_ms),
+        "encode_ms": statistics.median(encode_ms),
+        "total_ms": statistics.median(r + e for r, e in zip(resize_ms, encode_ms)),
+        "bytes": size,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark screenshot encoders")
+    parser.add_argument("images", nargs="*", help="sample frames (default: live + synthetic)")
+    parser.add_argument("--max-width", type=int, default=1280)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--encoders", default=",".join(ENCODERS),
+                        help="comma-separated backends (default: all)")
+    parser.add_argument("--resample", default="bilinear", choices=list(RESAMPLE))
+    parser.add_argument("--no-reduce", action="store_true", help="disable reduce-then-resize")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for label, img in sample_frames(args.images):
+        for name in args.encoders.split(","):
+            enc = get_encoder(name, args.quality, args.resample, not args.no_reduce)
+            enc.encode(enc.resize(img, args.max_width))   # warm-up
+            r = bench(enc, img, args.max_width, args.runs)
+            results.append({"frame": label, "size": f"{img.width}x{img.height}",
+                            "encoder": name, "mime": enc.mime, **r})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'frame':<16} {'encoder':<14} {'resize ms':>10} {'encode ms':>10} "
+          f"{'total ms':>9} {'KiB':>8}")
+    for r in results:
+        print(f"{r['frame']:<16} {r['encoder']:<14} {r['resize_ms']:>10.1f} "
+              f"{r['encode_ms']:>10.1f} {r['total_ms']:>9.1f} {r['bytes'] / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
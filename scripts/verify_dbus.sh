@@ -63,6 +63,15 @@ else
     fail "no workspace data: $WS"
 fi
 
+# 7. GetDesktopState returns a typed snapshot?
+step "GetDesktopState returns data"
+DS=$(gdbus call --session --dest org.gnome.AIBridge --object-path /org/gnome/AIBridge --method org.gnome.AIBridge.GetDesktopState 2>/dev/null || echo "ERROR")
+if echo "$DS" | grep -q "'screen_width'"; then
+    pass
+else
+    fail "no desktop state: $DS"
+fi
+
 echo
 echo "  Result: $OK passed, $FAIL failed"
 exit $FAIL
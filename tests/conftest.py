@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+from typing import List, Sequence
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from daemon import input_backend, input_scheduler  # noqa: E402
+from daemon.input_backend import InputBackend, Op  # noqa: E402
+
+
+class RecordingBackend(InputBackend):
+    """Input backend that records each invocation's ops instead of injecting them."""
+
+    name = "recording"
+
+    def __init__(self):
+        super().__init__()
+        self.calls: List[List[Op]] = []
+
+    def run(self, ops: Sequence[Op]) -> bool:
+        self.calls.append(list(ops))
+        for op in ops:
+            if op[0] == "sleep":
+                time.sleep(op[1])     # holds the scheduler thread, like XTest
+        return True
+
+    def screen_size(self):
+        return (1920, 1080)
+
+
+@pytest.fixture
+def backend(monkeypatch) -> RecordingBackend:
+    """A RecordingBackend behind a fresh input scheduler."""
+    rec = RecordingBackend()
+    monkeypatch.setattr(input_backend, "_backend", rec)
+    monkeypatch.setattr(input_scheduler, "_scheduler", input_scheduler.InputScheduler())
+    return rec
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("dbus")
+
+from daemon.batch import run_batch  # noqa: E402
+from daemon.models import BatchRequest  # noqa: E402
+
+
+async def _no_client():
+    raise AssertionError("the batch made a DBus call")
+
+
+def _run(req: BatchRequest):
+    return asyncio.run(run_batch(req, _no_client))
+
+
+def test_type_text_delay_is_the_keystroke_delay(backend):
+    resp = _run(BatchRequest(actions=[
+        {"type": "type_text", "text": "hello", "delay_ms": 40, "strategy": "type"},
+        {"type": "hotkey", "keys": ["Return"]},
+    ]))
+    assert resp.success
+    assert backend.calls == [[("type", "hello", 40), ("key", ("Return",))]]
+
+
+def test_pause_ms_is_the_pause_after_a_step(backend):
+    resp = _run(BatchRequest(step_delay_ms=100, actions=[
+        {"type": "type_text", "text": "hello", "strategy": "type", "pause_ms": 250},
+        {"type": "hotkey", "keys": ["Return"]},
+        {"type": "hotkey", "keys": ["Tab"]},
+    ]))
+    assert resp.success
+    assert backend.calls == [
+        [("type", "hello", 12)], [("key", ("Return",))], [("key", ("Tab",))],
+    ]
+    assert resp.elapsed_ms >= 350
+
+
+def test_steps_without_a_pause_still_merge(backend):
+    resp = _run(BatchRequest(step_delay_ms=100, actions=[
+        {"type": "hotkey", "keys": ["ctrl+l"], "pause_ms": 0},
+        {"type": "type_text", "text": "hello", "strategy": "type", "pause_ms": 0},
+        {"type": "wait", "ms": 50},
+        {"type": "hotkey", "keys": ["Return"]},
+    ]))
+    assert [r.group for r in resp.results] == [0, 0, 1, 2]
+    assert backend.calls == [
+        [("key", ("ctrl+l",)), ("type", "hello", 12)], [("key", ("Return",))],
+    ]
+
+
+def test_other_clients_input_runs_while_a_batch_pauses(backend):
+    from daemon import input_controller as ic
+    from daemon.input_scheduler import Origin
+
+    async def scenario():
+        batch = asyncio.create_task(run_batch(BatchRequest(actions=[
+            {"type": "hotkey", "keys": ["ctrl+l"], "pause_ms": 300},
+            {"type": "wait", "ms": 300},
+            {"type": "hotkey", "keys": ["Return"]},
+        ]), _no_client, Origin("a")))
+        await asyncio.sleep(0.1)
+        t0 = time.monotonic()
+        assert await ic.run_async(ic.mouse_move_ops(5, 5), "mouse_move", Origin("b"))
+        moved_in = time.monotonic() - t0
+        assert not batch.done()
+        return await batch, moved_in
+
+    resp, moved_in = asyncio.run(scenario())
+    assert resp.success
+    assert moved_in < 0.1
+    assert backend.calls == [
+        [("key", ("ctrl+l",))], [("mousemove", 5, 5)], [("key", ("Return",))],
+    ]
+
+
+class _Client:
+    async def launch_app_async(self, command: str) -> bool:
+        return True
+
+
+async def _client() -> _Client:
+    return _Client()
+
+
+def test_queue_full_mid_batch_is_a_failed_step(backend, monkeypatch):
+    from daemon import input_scheduler
+
+    scheduler = input_scheduler.get_scheduler()
+    submit = scheduler.submit
+    submitted = []
+
+    def submit_once(ops, primitive="ops", origin=input_scheduler.Origin()):
+        submitted.append(ops)
+        if len(submitted) > 1:
+            raise input_scheduler.InputQueueFull("client 'anonymous' has 64 input jobs queued")
+        return submit(ops, primitive, origin)
+
+    monkeypatch.setattr(scheduler, "submit", submit_once)
+    resp = asyncio.run(run_batch(BatchRequest(actions=[
+        {"type": "hotkey", "keys": ["ctrl+l"]},
+        {"type": "launch", "command": "true"},
+        {"type": "hotkey", "keys": ["Return"]},
+    ]), _client))
+    assert not resp.success
+    assert [r.success for r in resp.results] == [True, True, False]
+    assert "queued" in resp.results[2].detail
+    assert backend.calls == [[("key", ("ctrl+l",))]]
+
+
+@pytest.mark.parametrize("ms", [1_000_000_000, -1, "soon"])
+def test_wait_is_validated(backend, ms):
+    with pytest.raises(ValueError, match=r"actions\[0\] \(wait\)"):
+        _run(BatchRequest(actions=[{"type": "wait", "ms": ms}]))
+    assert backend.calls == []
+
+
+def test_failed_merged_group_reports_first_step_only(backend, monkeypatch):
+    monkeypatch.setattr(backend, "run", lambda ops: False)
+    resp = _run(BatchRequest(actions=[
+        {"type": "hotkey", "keys": ["ctrl+l"]},
+        {"type": "hotkey", "keys": ["Return"]},
+        {"type": "launch", "command": "true"},
+    ]))
+    assert not resp.success
+    assert [(r.group, r.success, r.detail) for r in resp.results] == [
+        (0, False, "merged input group failed (steps 0-1)"),
+        (0, False, "unknown"),
+        (1, False, "skipped"),
+    ]
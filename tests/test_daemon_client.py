@@ -0,0 +1,76 @@
+import itertools
+
+import pytest
+import requests
+
+from agent import daemon_client
+from agent.daemon_client import DaemonClient
+
+
+class _Response:
+    def __init__(self, status: int = 200, lines=()):
+        self.status_code = status
+        self.lines = list(lines)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Server Error")
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+
+def _event(i: int):
+    return [f"id: {i}", "event: focus", f'data: {{"focused_window_id": {i}}}', ""]
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    out = []
+    monkeypatch.setattr(daemon_client.time, "sleep", out.append)
+    monkeypatch.setattr(daemon_client.random, "uniform", lambda a, b: b)
+    return out
+
+
+def _client(replies):
+    client = DaemonClient("http://127.0.0.1:1")
+    requested = []
+
+    def get(url, params=None, **kw):
+        requested.append(params)
+        reply = next(replies)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    client.session.get = get
+    return client, requested
+
+
+def test_reconnects_with_backoff_through_http_errors(sleeps):
+    client, requested = _client(iter([
+        requests.ConnectionError("refused"),
+        _Response(503),
+        _Response(200, _event(1) + _event(2)),
+        _Response(200, _event(3)),
+    ]))
+    events = client.events()
+    assert [next(events)["id"] for _ in range(3)] == [1, 2, 3]
+    # 0.5, 1.0 while failing; reset by the events, then 0.5 after the clean end
+    assert sleeps == [0.5, 1.0, 0.5]
+    assert requested == [None, None, None, {"since": 2}]
+
+
+def test_backoff_is_capped(sleeps):
+    client, _ = _client(itertools.chain(
+        itertools.repeat(requests.ConnectionError("refused"), 10),
+        [_Response(200, _event(1))]))
+    assert next(client.events())["id"] == 1
+    assert max(sleeps) == daemon_client.EVENTS_BACKOFF_MAX
+    assert sleeps == sorted(sleeps)
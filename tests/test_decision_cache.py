@@ -0,0 +1,24 @@
+import json
+import time
+
+from agent.decision_cache import DecisionCache
+
+
+def _entry(**kw):
+    return {"key": "k", "phash": "ff", "action": {"type": "wait"},
+            "reason": "", "created": time.time(), **kw}
+
+
+def test_malformed_entries_are_skipped_on_load(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({"hash_size": 16, "entries": [
+        _entry(),
+        _entry(phash="not hex"),
+        _entry(created="yesterday"),
+        _entry(unknown_field=1),
+        {"key": "k"},
+        "junk",
+        _entry(key="k2"),
+    ]}), encoding="utf-8")
+    cache = DecisionCache(path=str(path))
+    assert len(cache) == 2
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("dbus")
+
+from daemon.events import EventBus  # noqa: E402
+
+
+def _replayed(bus: EventBus, since):
+    async def subscribe():
+        sub = bus.subscribe(since)
+        events = []
+        while not sub.queue.empty():
+            events.append(sub.queue.get_nowait())
+        return events
+    return asyncio.run(subscribe())
+
+
+@pytest.fixture
+def bus() -> EventBus:
+    bus = EventBus()
+    for i in range(3):
+        bus.publish("focus", {"focused_window_id": i})
+    return bus
+
+
+def test_resume_replays_missed_events(bus):
+    assert [e["id"] for e in _replayed(bus, 1)] == [2, 3]
+
+
+def test_resume_point_ahead_of_bus_gets_resync(bus):
+    # Last-Event-ID from before a daemon restart
+    events = _replayed(bus, 40)
+    assert [(e["id"], e["event"]) for e in events] == [(3, "resync")]
+
+
+def test_current_resume_point_replays_nothing(bus):
+    assert _replayed(bus, 3) == []
+
+
+class _Proxy:
+    """Accepts the resync's GetDesktopState and never answers."""
+
+    def GetDesktopState(self, **handlers):
+        pass
+
+
+@pytest.fixture
+def wired():
+    from daemon.dbus_client import AIBridgeClient
+
+    client = AIBridgeClient()
+    client._proxy = _Proxy()
+    bus = EventBus()
+    bus.attach(client)
+    return client, bus
+
+
+def _published(bus: EventBus):
+    return [(e["event"], e["data"].get("reason")) for e in bus._history]
+
+
+def test_delta_gap_publishes_resync(wired):
+    client, bus = wired
+    client._seq = 3
+    client._on_windows_delta(4, [], [], [], {"focused_window_id": 7})
+    client._on_windows_delta(9, [], [], [], {"focused_window_id": 8})
+    assert _published(bus) == [
+        ("focus", None),
+        ("resync", "delta gap (have 4, got 9)"),
+        ("focus", None),
+    ]
+
+
+def test_extension_restart_publishes_resync(wired):
+    client, bus = wired
+    client._on_name_owner_changed(":1.40")      # initial owner report
+    client._on_name_owner_changed("")
+    client._on_name_owner_changed(":1.52")
+    assert _published(bus) == [
+        ("resync", "extension went away"),
+        ("resync", "extension restarted"),
+    ]
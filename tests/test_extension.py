@@ -0,0 +1,90 @@
+"""Check the window struct of GetDesktopState against the extension source.
+
+gjs is not needed: the signature, the WINDOW_FIELD_TYPES table and the
+field order of _jsonToTuple are read from extension.js, and a sample
+window is packed and unpacked through the declared signature.  The
+benchmark's fake extension must declare the same struct.
+"""
+
+import os
+import re
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXTENSION_JS = os.path.join(REPO, "gnome_extension", "extension.js")
+FAKE_AIBRIDGE = os.path.join(REPO, "bench", "fake_aibridge.py")
+
+SAMPLE_WINDOW = {
+    "id": 2147483649, "xid": 0x3a00007, "title": "Terminal", "wm_class": "kgx",
+    "pid": 4242, "focused": True, "minimized": False, "maximized": True,
+    "workspace": 1, "x": -8, "y": 32, "width": 1280, "height": 800,
+}
+
+
+@pytest.fixture(scope="module")
+def source() -> str:
+    with open(EXTENSION_JS, encoding="utf-8") as f:
+        return f.read()
+
+
+def _struct_signatures(source: str):
+    declared = re.search(r"windows\s+a\((\w+)\)", source).group(1)
+    built = re.search(r"new GLib\.Variant\('a\((\w+)\)'", source).group(1)
+    return declared, built
+
+
+def _tuple_fields(source: str):
+    body = re.search(r"function _jsonToTuple\(j\) \{(.*?)\n\}", source, re.S).group(1)
+    return re.findall(r"\bj\.(\w+)", body)
+
+
+def _field_types(source: str):
+    body = re.search(r"const WINDOW_FIELD_TYPES = \{(.*?)\};", source, re.S).group(1)
+    return re.findall(r"(\w+): '(\w)'", body)
+
+
+def _check(code: str, value) -> bool:
+    if code == "b":
+        return isinstance(value, bool)
+    if code == "s":
+        return isinstance(value, str)
+    if isinstance(value, bool) or not isinstance(value, int):
+        return False
+    if code == "u":
+        return 0 <= value < 2 ** 32
+    if code == "i":
+        return -2 ** 31 <= value < 2 ** 31
+    raise AssertionError(f"unexpected type code {code!r}")
+
+
+def test_declared_and_built_signatures_match(source):
+    declared, built = _struct_signatures(source)
+    assert declared == built
+
+
+def test_window_struct_round_trips_through_signature(source):
+    signature, _ = _struct_signatures(source)
+    fields = _tuple_fields(source)
+    assert len(fields) == len(signature)
+
+    packed = [SAMPLE_WINDOW[name] for name in fields]
+    for name, code, value in zip(fields, signature, packed):
+        assert _check(code, value), f"{name}={value!r} does not fit {code!r}"
+    assert dict(zip(fields, packed)) == SAMPLE_WINDOW
+
+
+def test_struct_follows_window_field_types(source):
+    signature, _ = _struct_signatures(source)
+    assert _field_types(source) == list(zip(_tuple_fields(source), signature))
+
+
+def test_fake_extension_declares_the_same_struct(source):
+    signature, _ = _struct_signatures(source)
+    with open(FAKE_AIBRIDGE, encoding="utf-8") as f:
+        fake = f.read()
+    struct = re.search(r"def _window_struct.*?signature=\"(\w+)\"", fake, re.S).group(1)
+    array = re.search(r'"windows": dbus\.Array\(.*?signature="\((\w+)\)"', fake, re.S).group(1)
+    assert struct == array == signature
+    body = re.search(r"def _window_struct.*?\(\((.*?)\), signature", fake, re.S).group(1)
+    assert re.findall(r'w\["(\w+)"\]', body) == _tuple_fields(source)
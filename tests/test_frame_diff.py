@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from agent.frame_diff import ChangeDetector
+from agent.screen_capture import Frame
+
+
+def _frame(width: int, height: int, seq: int = 0, box=None) -> Frame:
+    px = np.full((height, width, 3), 40, dtype=np.uint8)
+    if box is not None:
+        x1, y1, x2, y2 = box
+        px[y1:y2, x1:x2] = 220
+    return Frame(seq=seq, timestamp=0.0, width=width, height=height, rgb=px.tobytes())
+
+
+@pytest.mark.parametrize("width,height", [
+    (1920, 1080), (2560, 1440), (1680, 1050), (2240, 1400), (1366, 768), (3000, 2000),
+])
+def test_any_resolution(width, height):
+    detector = ChangeDetector()
+    assert detector.update(_frame(width, height)).first
+
+    box = (width // 2, height // 2, width // 2 + width // 8, height // 2 + height // 8)
+    report = detector.update(_frame(width, height, 1, box))
+    assert not report.first
+    assert report.dirty_tiles > 0
+    # Boxes snap to tile edges; a sliver of the change may fall in a clean tile
+    x1, y1, x2, y2 = report.boxes[0]
+    ix = max(0, min(x2, box[2]) - max(x1, box[0]))
+    iy = max(0, min(y2, box[3]) - max(y1, box[1]))
+    assert ix * iy >= 0.9 * (box[2] - box[0]) * (box[3] - box[1])
+    assert x2 <= width and y2 <= height
+
+
+def test_unchanged_frame_is_clean():
+    detector = ChangeDetector()
+    detector.update(_frame(1680, 1050))
+    report = detector.update(_frame(1680, 1050, 1))
+    assert report.ratio == 0.0 and report.boxes == []
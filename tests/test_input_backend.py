@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+Xlib_error = pytest.importorskip("Xlib.error")
+
+from daemon.input_backend import XTestBackend  # noqa: E402
+
+
+class _Display:
+    def __init__(self, alive: bool = True):
+        self.alive = alive
+        self.closed = False
+
+    def sync(self):
+        if not self.alive:
+            raise Xlib_error.ConnectionClosedError("server")
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def xtest(monkeypatch):
+    """An XTestBackend on fake displays; the first one is already dead."""
+    displays = [_Display(alive=False)]
+
+    def open_display(self):
+        displays.append(_Display())
+        self._d = displays[-1]
+        self._scratch = None
+
+    backend = XTestBackend.__new__(XTestBackend)
+    backend._lock = threading.RLock()
+    backend._d = displays[0]
+    monkeypatch.setattr(XTestBackend, "_open", open_display)
+    monkeypatch.setattr(XTestBackend, "_op_mousemove",
+                        lambda self, x, y: self._d.sync() or True, raising=False)
+    return backend, displays
+
+
+def test_lost_connection_is_reopened_and_retried(xtest):
+    backend, displays = xtest
+    assert backend.run([("mousemove", 10, 20)])
+    assert displays[0].closed and len(displays) == 2
+    assert backend._d is displays[1]
+
+
+def test_retries_only_once(xtest, monkeypatch):
+    backend, displays = xtest
+
+    def dead(self):
+        displays.append(_Display(alive=False))
+        self._d = displays[-1]
+        self._scratch = None
+
+    monkeypatch.setattr(XTestBackend, "_open", dead)
+    assert not backend.run([("mousemove", 10, 20)])
+    assert len(displays) == 2
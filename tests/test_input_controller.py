@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("dbus")
+
+from daemon import input_controller as ic  # noqa: E402
+from daemon.config import settings  # noqa: E402
+
+TEXT = "x" * 64     # long enough for strategy=auto to paste
+
+
+class _Client:
+    """AIBridgeClient stand-in with a terminal and a browser window."""
+
+    clipboard_capable = True
+
+    def __init__(self, focused: int = 1, state_works: bool = True):
+        self.windows = [
+            {"id": 1, "xid": 0x3a00001, "wm_class": "gnome-terminal-server"},
+            {"id": 2, "xid": 0x3a00002, "wm_class": "firefox"},
+            {"id": 3, "xid": 0x3a00003, "wm_class": "XTerm"},
+        ]
+        self.focused = focused
+        self.state_works = state_works
+        self.clipboard = "previous"
+        self.clipboard_writes = []
+
+    async def get_desktop_state_async(self):
+        if not self.state_works:
+            raise RuntimeError("GetDesktopState failed")
+        return {"windows": self.windows, "focused_window_id": self.focused}
+
+    async def get_windows_async(self):
+        return self.windows
+
+    async def get_focused_window_async(self):
+        return self.focused
+
+    async def get_clipboard_async(self):
+        return self.clipboard
+
+    async def set_clipboard_async(self, text):
+        self.clipboard = text
+        self.clipboard_writes.append(text)
+        return True
+
+
+@pytest.fixture(autouse=True)
+def _no_restore_delay(monkeypatch):
+    monkeypatch.setattr(settings, "clipboard_restore_delay", 0.0)
+    monkeypatch.setattr(ic, "_paste_lock", None)
+
+
+def _factory(client: _Client):
+    async def factory() -> _Client:
+        return client
+    return factory
+
+
+def _enter(client: _Client, **kw) -> bool:
+    return asyncio.run(ic.enter_text_async(_factory(client), TEXT, **kw))
+
+
+@pytest.mark.parametrize("focused,chord", [(1, "ctrl+shift+v"), (2, "ctrl+v")])
+def test_paste_sends_the_chord_for_the_focused_window(backend, focused, chord):
+    client = _Client(focused)
+    assert _enter(client)
+    assert backend.calls == [[("key", (chord,))]]
+    assert client.clipboard_writes == [TEXT]
+
+
+@pytest.mark.parametrize("focused,chord", [(1, "ctrl+shift+v"), (2, "ctrl+v")])
+def test_paste_still_pastes_when_desktop_state_fails(backend, focused, chord):
+    client = _Client(focused, state_works=False)
+    assert _enter(client)
+    assert backend.calls == [[("key", (chord,))]]
+
+
+def test_paste_into_window_by_xid(backend):
+    client = _Client(focused=1, state_works=False)
+    assert _enter(client, xid=0x3a00002)
+    assert backend.calls == [[("windowfocus", 0x3a00002), ("key", ("ctrl+v",))]]
+
+
+def test_primary_only_terminal_is_typed(backend):
+    client = _Client(focused=3)
+    assert _enter(client, delay_ms=5)
+    assert backend.calls == [[("type", TEXT, 5)]]
+    assert client.clipboard_writes == []
+
+
+def test_short_ascii_text_is_typed(backend):
+    client = _Client()
+    assert asyncio.run(ic.enter_text_async(_factory(client), "ls"))
+    assert backend.calls == [[("type", "ls", 12)]]
+
+
+@pytest.mark.parametrize("previous,writes", [
+    ("previous", [TEXT, "previous"]),
+    ("", [TEXT]),       # empty, or an image: nothing text-shaped to restore
+])
+def test_clipboard_is_restored_only_when_it_held_text(backend, monkeypatch,
+                                                       previous, writes):
+    monkeypatch.setattr(settings, "clipboard_restore_delay", 0.01)
+    client = _Client(focused=2)
+    client.clipboard = previous
+
+    async def paste_and_restore():
+        assert await ic.enter_text_async(_factory(client), TEXT)
+        await asyncio.gather(*ic._restores)
+
+    asyncio.run(paste_and_restore())
+    assert client.clipboard_writes == writes